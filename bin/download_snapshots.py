@@ -16,6 +16,8 @@
 
 import os
 import re
+import json
+import fnmatch
 import argparse
 import logging
 
@@ -25,8 +27,11 @@ from django.conf import settings
 from django.db import transaction
 from pyquery import PyQuery as pq
 
-from iris.etl.url import URL
+from iris.etl.url import URL, WORKERS, unordered, listdirs
 from iris.etl import snapshot
+from iris.core import keycache
+from iris.core.profiling import PhaseProfiler
+from iris.packagedb.exports import export_all
 
 
 NAME_AND_LAST_MODIFIED = re.compile(
@@ -52,6 +57,13 @@ def save_lastid(filename, lastid):
         writer.write(lastid)
 
 
+def timestamp_file(workdir, pname):
+    """
+    Path of the file keeping timestamp of the last imported snapshot
+    """
+    return os.path.join(workdir, '%s.latest.timestamp' % pname)
+
+
 def each(data, element, name):
     """
     Get attributes of emelent from PyQuery data
@@ -64,7 +76,7 @@ def guess_latest(baseurl):
     Guess the real path of latest from last modified info.
     """
     url = baseurl.join('..')
-    page = url.asdir().fetch()
+    page = url.listing()
     idx = {}
     latest_mod = None
     for _quote, name, lastmod in NAME_AND_LAST_MODIFIED.findall(page):
@@ -77,17 +89,84 @@ def guess_latest(baseurl):
     raise Exception("Can't find latest snapshot in:%s" % url)
 
 
-def import_snapshot(product, snapshot_path):
+def download(workdir, pname, baseurl):
+    """
+    Download snapshot data of the latest snapshot of a product.
+    Returns (directory of the data, snapshot id) or None if the product
+    has no update since the last download.
+    """
+    latesturl = guess_latest(baseurl)
+    pdir = os.path.join(workdir, latesturl.href.split('//')[1])
+
+    buildurl = latesturl.join('build.xml')
+    text = pq(buildurl.fetch())
+
+    newid = text('id').text()
+    lastid = get_lastid(timestamp_file(workdir, pname))
+
+    if lastid and newid <= lastid:
+        print "%s has no update yet!" % pname
+        print "Last download timestamp: %s" % lastid
+        return
+
+    buildurl.download(workdir)
+
+    targets = each(text, 'buildtarget', 'name')
+    for target in targets:
+        # Image
+        image_path = os.path.join(
+            'builddata', 'images', target, 'images.xml')
+        imgxmlurl = latesturl.join(image_path)
+        imgxmlurl.download(workdir)
+
+    # Packages repodata of all targets and manifest directory are listed
+    # concurrently
+    pkg_urls = [latesturl.join('repos', target, 'packages', 'repodata')
+                for target in targets]
+    manifest_url = latesturl.join('builddata', 'manifest')
+    listed = listdirs(pkg_urls + [manifest_url])
+    for urls in listed[:-1]:
+        for url in urls:
+            if fnmatch.fnmatch(url.href, '*-primary.xml.gz'):
+                url.download(workdir)
+
+    # Manifest
+    for url in listed[-1]:
+        url.download(workdir)
+
+    return pdir, newid
+
+
+def import_snapshot(product, snapshot_path, profiler=None, incremental=True):
     print('Starting snapshot data update...')
     transaction.set_autocommit(False)
-    snapshot.from_dir(product, snapshot_path)
+    try:
+        imported = snapshot.from_dir(product, snapshot_path, profiler,
+                                     incremental)
+        if not imported:
+            print('Snapshot data of %s is unchanged, skipped' % product)
+    except Exception:
+        transaction.rollback()
+        raise
     transaction.commit()
+    return imported
 
 
 def parse_args():
     desc = "Download Tizen snapshots to the given workdir on your file system."
     parser = argparse.ArgumentParser(description=desc)
     parser.add_argument('workdir', type=str, help='Use for saving Snapshots')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='write JSON report of each import phase')
+    parser.add_argument('--force', action='store_true',
+                        help='import all data even if files are unchanged '
+                        'since the last import')
+    parser.add_argument('--jobs', type=int, default=WORKERS,
+                        help='number of products downloaded at the same '
+                        'time, default is %(default)s. Downloaded products '
+                        'are imported one by one while others are still '
+                        'downloading. 1 means download and import each '
+                        'product in turn')
     return parser.parse_args()
 
 
@@ -101,45 +180,48 @@ def main():
     if not os.path.exists(workdir):
         os.makedirs(workdir)
 
-    for pname, urlstring in settings.IRIS_PRODUCT_MAPPING:
-        baseurl = URL(urlstring)
-        latesturl = guess_latest(baseurl)
-        pdir = os.path.join(workdir, latesturl.href.split('//')[1])
-
-        buildurl = latesturl.join('build.xml')
-        text = pq(buildurl.fetch())
-
-        idfile = os.path.join(workdir, '%s.latest.timestamp' % pname)
-        newid = text('id').text()
-        lastid = get_lastid(idfile)
-
-        if lastid and newid <= lastid:
-            print "%s has no update yet!" % pname
-            print "Last download timestamp: %s" % lastid
+    reports = {}
+    failed = []
+    imported = False
+    products = [(pname, URL(urlstring))
+                for pname, urlstring in settings.IRIS_PRODUCT_MAPPING]
+    # Products are downloaded by worker threads, and imported by this
+    # thread only, in the order their downloads finish
+    downloads = unordered(lambda product: download(workdir, *product),
+                          products, args.jobs)
+    for (pname, _baseurl), downloaded, err in downloads:
+        if err:
+            logger.error('Failed to download %s: %s', pname, err)
+            failed.append(pname)
             continue
+        if not downloaded:
+            continue
+        pdir, newid = downloaded
+
+        profiler = PhaseProfiler(enabled=bool(args.profile))
+        try:
+            imported = import_snapshot(
+                pname, pdir, profiler, not args.force) or imported
+        except Exception as error:  # pylint: disable=broad-except
+            logger.exception('Failed to import %s: %s', pname, error)
+            failed.append(pname)
+            continue
+        reports[pname] = profiler.report()
 
-        buildurl.download(workdir)
-
-        for target in each(text, 'buildtarget', 'name'):
-            # Image
-            image_path = os.path.join(
-                'builddata', 'images', target, 'images.xml')
-            imgxmlurl = latesturl.join(image_path)
-            imgxmlurl.download(workdir)
-
-            # Packages
-            pkg_path = os.path.join('repos', target, 'packages', 'repodata')
-            for url in latesturl.join(pkg_path).glob('*-primary.xml.gz'):
-                url.download(workdir)
+        # only written after the import succeeds, so that a failed
+        # product is downloaded and imported again by the next run
+        save_lastid(timestamp_file(workdir, pname), newid)
 
-        # Manifest
-        manifest_path = os.path.join('builddata', 'manifest')
-        for url in latesturl.join(manifest_path).listdir():
-            url.download(workdir)
+    if imported:
+        keycache.invalidate()
+        export_all()
 
-        import_snapshot(pname, pdir)
+    if args.profile:
+        with open(args.profile, 'w') as writer:
+            json.dump({'products': reports}, writer, indent=2)
 
-        save_lastid(idfile, newid)
+    if failed:
+        raise Exception('Failed products: %s' % ', '.join(failed))
 
 
 if __name__ == '__main__':
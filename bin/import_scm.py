@@ -17,6 +17,7 @@ Data is available from:
 
 import os
 import sys
+import json
 import argparse
 
 from django.db import transaction
@@ -34,6 +35,9 @@ os.environ['DJANGO_SETTINGS_MODULE'] = 'iris.core.settings'
 from django.core.cache import cache
 
 from iris.etl import scm
+from iris.core import keycache
+from iris.core.profiling import PhaseProfiler
+from iris.packagedb.exports import export_all
 
 def main():
     """
@@ -42,15 +46,53 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('domain', type=file, help='domain data file')
     parser.add_argument('gittree', type=file, help='git tree data file')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='write JSON report of each import phase')
+    parser.add_argument('--chunk-size', type=int, metavar='N',
+                        help='commit changes in transactions of N rows, '
+                        'instead of one transaction for the whole import, '
+                        'so that events are not blocked for long')
+    parser.add_argument('--staging', action='store_true', default=None,
+                        help='load data by set-based sql through staging '
+                        'tables, can not be used with --chunk-size')
+    parser.add_argument('--force', action='store_true',
+                        help='import all data even if it is unchanged '
+                        'since the last import')
     args = parser.parse_args()
+    if args.staging and args.chunk_size:
+        parser.error('--staging can not be used with --chunk-size')
 
+    profiler = PhaseProfiler(enabled=bool(args.profile))
     print('Starting package data update...')
-    transaction.set_autocommit(False)
-    scm.from_file(args.domain, args.gittree)
-    # note: cache.clear() must located in transaction, because without commit,
-    # the clear method doesn't work for database backend
-    cache.clear()
-    transaction.commit()
+    incremental = not args.force
+    if args.chunk_size:
+        imported = scm.from_file(args.domain, args.gittree, profiler,
+                                 args.chunk_size, incremental=incremental)
+        if imported:
+            cache.clear()
+        else:
+            print('Package data is unchanged, skipped')
+    else:
+        transaction.set_autocommit(False)
+        imported = scm.from_file(args.domain, args.gittree, profiler,
+                                 staging=args.staging,
+                                 incremental=incremental)
+        if not imported:
+            print('Package data is unchanged, skipped')
+        # note: cache.clear() must located in transaction, because without
+        # commit, the clear method doesn't work for database backend
+        cache.clear()
+        with profiler.phase('commit'):
+            transaction.commit()
+
+    if imported:
+        keycache.invalidate()
+        with profiler.phase('export'):
+            export_all()
+
+    if args.profile:
+        with open(args.profile, 'w') as writer:
+            json.dump(profiler.report(), writer, indent=2)
 
 if __name__ == '__main__':
     main()
@@ -35,17 +35,20 @@ def main():
     logger.debug('Starting check git scm data...')
     res = file_import(args.domain, args.gittree)
     if res:
+        for err in res:
+            print unicode(err).encode('utf8')
         logger.warn('Check complete. %s failures found.', len(res))
-    else:
-        logger.debug('Check complete. OK')
-    return res
+        return 1
+    logger.debug('Check complete. OK')
+    return 0
 
 
 def file_import(domain_file, gittree_file):
     """
     read domain and git-tree file.
     """
-    res = check_scm(domain_file.read(), gittree_file.read())
+    res = check_scm(domain_file.read().decode('utf8'),
+                    gittree_file.read().decode('utf8'))
     return res
 
 
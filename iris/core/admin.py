@@ -22,6 +22,7 @@ from iris.core.models import (
     Domain, SubDomain, License, GitTree, Package, Product, Image,
     PackageBuild, ImageBuild, Submission,
     UserProfile, UserParty, DomainRole, SubDomainRole, GitTreeRole)
+from iris.etl.digest import forget_edited
 
 
 class UserProfileInline(admin.StackedInline):
@@ -42,19 +43,39 @@ class UserAdmin(UserAdmin):
     inlines = (UserProfileInline, )
 
 
+class ImportedAdmin(admin.ModelAdmin):
+    """
+    Admin of objects loaded by scm imports. Digests of the imports are
+    forgotten when objects are added, changed or deleted, so that the
+    next import overwrites the edits.
+    """
+
+    def log_addition(self, request, obj):
+        forget_edited(obj)
+        super(ImportedAdmin, self).log_addition(request, obj)
+
+    def log_change(self, request, obj, message):
+        forget_edited(obj)
+        super(ImportedAdmin, self).log_change(request, obj, message)
+
+    def log_deletion(self, request, obj, object_repr):
+        forget_edited(obj)
+        super(ImportedAdmin, self).log_deletion(request, obj, object_repr)
+
+
 # Registering user under the user admin view requires deregistering
 # the default view to avoid duplication in the admin site controls
 admin.site.unregister(User)
 
 admin.site.register(User, UserAdmin)
 admin.site.register(UserParty)
-admin.site.register(DomainRole)
-admin.site.register(SubDomainRole)
-admin.site.register(GitTreeRole)
-admin.site.register(Domain)
-admin.site.register(SubDomain)
-admin.site.register(License)
-admin.site.register(GitTree)
+admin.site.register(DomainRole, ImportedAdmin)
+admin.site.register(SubDomainRole, ImportedAdmin)
+admin.site.register(GitTreeRole, ImportedAdmin)
+admin.site.register(Domain, ImportedAdmin)
+admin.site.register(SubDomain, ImportedAdmin)
+admin.site.register(License, ImportedAdmin)
+admin.site.register(GitTree, ImportedAdmin)
 admin.site.register(Package)
 admin.site.register(Product)
 admin.site.register(Image)
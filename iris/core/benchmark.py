@@ -0,0 +1,209 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+"""
+Benchmark of pages and APIs which read lots of data.
+
+generate() fills database with a large synthetic data set, run() gets
+each page with Django test client and measures it, compare() finds
+regressions against a report saved before.
+"""
+import urllib
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+from django.test.client import Client
+from django.contrib.auth.models import User
+
+from iris.core.models import (
+    Domain, SubDomain, GitTree, Package, Product, Snapshot, Submission,
+    BuildGroup, SubmissionBuild, PackageBuild, ImageBuild)
+from iris.core.profiling import Measure
+
+PRODUCTS = ('Bench:IVI', 'Bench:Common')
+
+
+def generate(submissions=50000, gittrees=5000, snapshots=500, builds=2,
+             users=200):
+    """
+    Create a data set of given size. Every two submissions share a tag,
+    and every tag has a pre-release project in each product, 70% of
+    which are accepted into snapshots, 10% rejected and the rest opened.
+    """
+    def ids(model, field, prefix=''):
+        return dict(model.objects.filter(
+            **{'%s__startswith' % field: prefix}).values_list(field, 'id'))
+
+    User.objects.bulk_create([
+        User(username='bench%d' % i, email='bench%d@localhost' % i)
+        for i in range(users)])
+    owners = ids(User, 'username', 'bench').values()
+
+    subdomains = max(1, gittrees // 50)
+    Domain.objects.bulk_create([
+        Domain(name='Bench%d' % i) for i in range(max(1, subdomains // 10))])
+    domains = ids(Domain, 'name', 'Bench')
+    SubDomain.objects.bulk_create([
+        SubDomain(name='Sub%d' % i, domain_id=domains['Bench%d' % (i // 10)])
+        for i in range(subdomains)])
+    subdomain_ids = sorted(SubDomain.objects.filter(
+        domain__name__startswith='Bench').values_list('id', flat=True))
+
+    GitTree.objects.bulk_create([
+        GitTree(gitpath='bench/tree%d' % i,
+                subdomain_id=subdomain_ids[i % subdomains])
+        for i in range(gittrees)])
+    trees = ids(GitTree, 'gitpath', 'bench/')
+    Package.objects.bulk_create([
+        Package(name='bench-tree%d' % i) for i in range(gittrees)])
+    packages = ids(Package, 'name', 'bench-')
+    GitTree.packages.through.objects.bulk_create([
+        GitTree.packages.through(gittree_id=trees['bench/tree%d' % i],
+                                 package_id=packages['bench-tree%d' % i])
+        for i in range(gittrees)])
+
+    products = [Product.objects.create(name=name, description=name)
+                for name in PRODUCTS]
+    Product.gittrees.through.objects.bulk_create([
+        Product.gittrees.through(product_id=product.id, gittree_id=tree)
+        for product in products for tree in trees.values()])
+
+    start = timezone.make_aware(datetime(2015, 1, 1), timezone.utc)
+    per_product = max(1, snapshots // len(products))
+    Snapshot.objects.bulk_create([
+        Snapshot(product=product,
+                 buildid='bench_%06d.1' % i,
+                 started_time=start + timedelta(hours=i),
+                 finished_time=start + timedelta(hours=i, minutes=30),
+                 url='http://bench.server/snapshots/bench_%06d.1/' % i)
+        for product in products for i in range(per_product)])
+    snapshot_ids = dict(((product_id, buildid), pk) for product_id, buildid, pk
+                        in Snapshot.objects.filter(
+                            product__in=products).values_list(
+                                'product_id', 'buildid', 'id'))
+
+    tags = (submissions + 1) // 2
+    statuses = ['33_ACCEPTED'] * 7 + [
+        '36_REJECTED', '10_PKGBUILDING', '20_IMGBUILDING']
+
+    def group_name(product, tag):
+        return 'home:prerelease:%s:submit:trunk:%06d' % (product.name, tag)
+
+    BuildGroup.objects.bulk_create([
+        BuildGroup(
+            name=group_name(product, tag),
+            status=statuses[tag % 10],
+            operator='bench0@localhost',
+            operated_on=start + timedelta(hours=tag * per_product // tags),
+            snapshot_id=snapshot_ids[
+                (product.id, 'bench_%06d.1' % (tag * per_product // tags))]
+            if statuses[tag % 10] == '33_ACCEPTED' else None,
+            succeeded_packages=builds,
+            succeeded_images=1)
+        for product in products for tag in range(tags)])
+    groups = ids(BuildGroup, 'name', 'home:prerelease:Bench')
+
+    Submission.objects.bulk_create([
+        Submission(
+            name='submit/trunk/20150101.%06d' % (i // 2),
+            status=statuses[(i // 2) % 10],
+            owner_id=owners[i % len(owners)],
+            gittree_id=trees['bench/tree%d' % (i % gittrees)],
+            commit='%040x' % i)
+        for i in range(submissions)])
+    subs = Submission.objects.filter(
+        name__startswith='submit/trunk/20150101.').values_list('id', 'name')
+    SubmissionBuild.objects.bulk_create([
+        SubmissionBuild(
+            submission_id=pk, product_id=product.id,
+            group_id=groups[group_name(product, int(name.split('.')[-1]))])
+        for pk, name in subs for product in products])
+
+    package_ids = packages.values()
+    PackageBuild.objects.bulk_create([
+        PackageBuild(package_id=package_ids[(group + i) % len(package_ids)],
+                     status='SUCCESS', repo='standard', arch='arch%d' % i,
+                     group_id=group, url='http://bench.server/repo',
+                     log='http://bench.server/log')
+        for group in groups.values() for i in range(builds)])
+    ImageBuild.objects.bulk_create([
+        ImageBuild(name='bench-image', repo='standard', status='SUCCESS',
+                   group_id=group,
+                   url='http://bench.server/images/bench.raw',
+                   log='http://bench.server/images/bench.log')
+        for group in groups.values()])
+
+
+def endpoints():
+    """
+    List of (name, url) of pages to be measured, built from database
+    """
+    sub = Submission.objects.select_related('gittree').order_by('-id')[0]
+    product = Product.objects.order_by('id')[0]
+    return [
+        ('opened', '/app/submissions/opened/'),
+        ('accepted', '/app/submissions/accepted/'),
+        ('search', '/app/submissions/search/?kw=%s' % urllib.quote(
+            'status:accepted gittree:%s' % sub.gittree.gitpath)),
+        ('detail', '/app/submissions/%s/' % sub.name),
+        ('snapshot_by_product',
+         '/app/submissions/snapshots/product/%d/' % product.id),
+        ('api_submissions', '/api/submissions/'),
+        ('api_gittrees', '/api/packagedb/gittrees/'),
+        ]
+
+
+def run(repeat=3, names=None):
+    """
+    Get each page `repeat` times, returns report dict which maps name of
+    page to median of seconds and sql_seconds, number of queries, growth
+    of peak RSS in bytes and response status.
+    """
+    client = Client()
+    report = {}
+    for name, url in endpoints():
+        if names and name not in names:
+            continue
+        measures = []
+        for _ in range(repeat):
+            with Measure() as measure:
+                response = client.get(url)
+            measures.append(measure)
+
+        def median(field):
+            values = sorted(getattr(i, field) for i in measures)
+            return values[len(values) // 2]
+
+        report[name] = {
+            'url': url,
+            'status': response.status_code,
+            'seconds': median('seconds'),
+            'sql_seconds': median('sql_seconds'),
+            'queries': measures[-1].queries,
+            'rss_growth': max(i.rss_growth for i in measures),
+            }
+    return report
+
+
+def compare(report, baseline, tolerance=0.2):
+    """
+    Returns list of regressions of `report` against `baseline`: pages
+    which are slower by more than `tolerance` or run more queries.
+    """
+    regressions = []
+    for name, item in sorted(report.items()):
+        base = baseline.get(name)
+        if not base:
+            continue
+        if item['seconds'] > base['seconds'] * (1 + tolerance):
+            regressions.append('%s: %.3fs, was %.3fs' % (
+                name, item['seconds'], base['seconds']))
+        if item['queries'] > base['queries']:
+            regressions.append('%s: %d queries, was %d' % (
+                name, item['queries'], base['queries']))
+    return regressions
@@ -0,0 +1,184 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+"""
+Caches of natural key -> pk lookups for frequently referred models.
+
+Events keep referring to the same packages, products, git trees and
+pre-release projects, so their pks are cached in a bounded LRU mapping.
+Entries are dropped when the object is saved or deleted in this process.
+Imports call invalidate() after committing, which bumps a generation in
+Django cache that all processes check every IRIS_KEY_CACHE_CHECK seconds.
+Entries expire after IRIS_KEY_CACHE_TTL seconds in any case.
+"""
+import time
+import uuid
+import weakref
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_save, post_delete
+
+from iris.core.models import Package, Product, GitTree, BuildGroup
+
+
+class KeyCache(object):
+    """
+    Thread-safe LRU cache mapping value of a unique field of `model`
+    to pk of the object
+    """
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self._lock = threading.Lock()
+        self._pks = OrderedDict()   # value -> (pk, expires)
+        self._values = {}           # pk -> value
+        self.hits = self.misses = 0
+        self._generation = None
+        self._checked = 0
+        _caches.add(self)
+        # one receiver for each model, whatever the number of caches
+        post_save.connect(_saved, sender=model,
+                          dispatch_uid='keycache_saved_%s' % model.__name__)
+        post_delete.connect(
+            _deleted, sender=model,
+            dispatch_uid='keycache_deleted_%s' % model.__name__)
+
+    def get_pk(self, value, create=False, defaults=None):
+        """
+        Returns pk of the object whose field equals `value`, the object
+        is created by `defaults` if `create` is set and it doesn't exist.
+        Raises model.DoesNotExist otherwise.
+        """
+        pk = self._get(value)
+        if pk is None:
+            pk = self.get(value, create, defaults).pk
+        return pk
+
+    def get(self, value, create=False, defaults=None):
+        """
+        Returns the object whose field equals `value`, like get_pk().
+
+        When cached, the object only has pk and the key field loaded
+        without querying database. It's good enough to be used as a
+        foreign key, but must not be saved without update_fields.
+        """
+        pk = self._get(value)
+        if pk is not None:
+            return self.model(pk=pk, **{self.field: value})
+
+        lookup = {self.field: value}
+        if create:
+            obj, created = self.model.objects.get_or_create(
+                defaults=defaults or {}, **lookup)
+        else:
+            obj, created = self.model.objects.get(**lookup), False
+        # Objects created in current transaction could be rolled back
+        if not created:
+            self._set(value, obj.pk)
+        return obj
+
+    def clear(self):
+        with self._lock:
+            self._pks.clear()
+            self._values.clear()
+
+    def _check(self):
+        """
+        Clear the cache if another process invalidated it
+        """
+        now = time.time()
+        if now < self._checked + settings.IRIS_KEY_CACHE_CHECK:
+            return
+        self._checked = now
+        generation = cache.get(GENERATION_KEY)
+        if generation != self._generation:
+            self._generation = generation
+            self.clear()
+
+    def _get(self, value):
+        self._check()
+        with self._lock:
+            item = self._pks.pop(value, None)
+            if item is None or item[1] < time.time():
+                if item is not None:
+                    del self._values[item[0]]
+                self.misses += 1
+                return None
+            self._pks[value] = item
+            self.hits += 1
+            return item[0]
+
+    def _set(self, value, pk):
+        size = settings.IRIS_KEY_CACHE_SIZE
+        if size <= 0:
+            return
+        with self._lock:
+            self._drop(pk)
+            old = self._pks.pop(value, None)
+            if old is not None:
+                del self._values[old[0]]
+            self._pks[value] = (pk, time.time() + settings.IRIS_KEY_CACHE_TTL)
+            self._values[pk] = value
+            while len(self._pks) > size:
+                _value, (old, _expires) = self._pks.popitem(last=False)
+                del self._values[old]
+
+    def _drop(self, pk):
+        value = self._values.pop(pk, None)
+        if value is not None:
+            del self._pks[value]
+
+    def saved(self, instance, update_fields=None):
+        # Saving other fields, such as counters of BuildGroup, won't
+        # change the mapping
+        if update_fields is not None and self.field not in update_fields:
+            return
+        with self._lock:
+            self._drop(instance.pk)
+
+    def deleted(self, instance):
+        with self._lock:
+            self._drop(instance.pk)
+
+
+GENERATION_KEY = 'iris.core.keycache.generation'
+
+# all key caches of this process
+_caches = weakref.WeakSet()
+
+
+def _saved(sender, instance, update_fields=None, **kwargs):
+    for keycache in list(_caches):
+        if keycache.model is sender:
+            keycache.saved(instance, update_fields)
+
+
+def _deleted(sender, instance, **kwargs):
+    for keycache in list(_caches):
+        if keycache.model is sender:
+            keycache.deleted(instance)
+
+
+def invalidate():
+    """
+    Clear key caches of all processes sharing Django cache, it should be
+    called after changes of import are committed
+    """
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, None)
+    for keycache in list(_caches):
+        keycache.clear()
+
+
+PACKAGES = KeyCache(Package, 'name')
+PRODUCTS = KeyCache(Product, 'name')
+GITTREES = KeyCache(GitTree, 'gitpath')
+BUILD_GROUPS = KeyCache(BuildGroup, 'name')
@@ -0,0 +1,79 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+"""
+Benchmark pages and APIs which read lots of data.
+
+By default a large data set is generated in a test database, which is
+destroyed afterwards. With --current-db the configured database (e.g.
+a copy of production) is measured as it is.
+"""
+
+import json
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from iris.core import benchmark
+from iris.core.profiling import scratch_database
+
+
+class Command(BaseCommand):
+    """
+    Benchmark read pages
+    """
+    help = 'Measure wall time, SQL and memory of summary, detail, ' \
+        'snapshot and API pages'
+    option_list = BaseCommand.option_list + (
+        make_option('--submissions', type='int', default=50000),
+        make_option('--gittrees', type='int', default=5000),
+        make_option('--snapshots', type='int', default=500),
+        make_option('--builds', type='int', default=2,
+                    help='Package builds of each pre-release project'),
+        make_option('--current-db', action='store_true', default=False,
+                    help='Measure configured database without generating'),
+        make_option('--repeat', type='int', default=3,
+                    help='Times to get each page, median is reported'),
+        make_option('--page', action='append', dest='pages',
+                    help='Only measure the page, could be repeated'),
+        make_option('--save', metavar='FILE',
+                    help='Save report as JSON to be used as baseline'),
+        make_option('--baseline', metavar='FILE',
+                    help='Compare with report saved before'),
+        make_option('--tolerance', type='float', default=0.2,
+                    help='Allowed slowdown against baseline'),
+        )
+
+    def handle(self, *args, **options):
+        if options['current_db']:
+            report = benchmark.run(options['repeat'], options['pages'])
+        else:
+            with scratch_database():
+                benchmark.generate(
+                    options['submissions'], options['gittrees'],
+                    options['snapshots'], options['builds'])
+                report = benchmark.run(options['repeat'], options['pages'])
+
+        self.stdout.write('%-20s %6s %9s %8s %9s %9s' % (
+            'page', 'status', 'seconds', 'queries', 'sql secs', 'RSS +MB'))
+        for name, item in sorted(report.items()):
+            self.stdout.write('%-20s %6d %9.3f %8d %9.3f %9.1f' % (
+                name, item['status'], item['seconds'], item['queries'],
+                item['sql_seconds'], (item['rss_growth'] or 0) / 1048576.0))
+
+        if options['save']:
+            with open(options['save'], 'w') as writer:
+                json.dump(report, writer, indent=2, sort_keys=True)
+        if options['baseline']:
+            with open(options['baseline']) as reader:
+                regressions = benchmark.compare(
+                    report, json.load(reader), options['tolerance'])
+            if regressions:
+                raise CommandError('Regressions found:\n%s'
+                                   % '\n'.join(regressions))
+            self.stdout.write('No regressions against baseline')
@@ -0,0 +1,59 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+"""
+Benchmark memory of transformed scm data.
+
+Synthetic scm text is generated unless domain and tree files are given,
+nothing is written to database.
+"""
+
+import json
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from iris.etl import benchmark
+
+
+class Command(BaseCommand):
+    """
+    Benchmark memory of scm import
+    """
+    args = '[domains_file trees_file]'
+    help = 'Measure memory of rows transformed from scm data, as ' \
+        'records and as dicts'
+    option_list = BaseCommand.option_list + (
+        make_option('--domains', type='int', default=50),
+        make_option('--subdomains', type='int', default=10,
+                    help='Subdomains of each domain'),
+        make_option('--gittrees', type='int', default=5000),
+        make_option('--users', type='int', default=300),
+        make_option('--json', action='store_true', default=False,
+                    help='Print report as JSON'),
+        )
+
+    def handle(self, *args, **options):
+        if args:
+            content = u'\n'.join(open(i).read().decode('utf8') for i in args)
+        else:
+            content = benchmark.generate(
+                options['domains'], options['subdomains'],
+                options['gittrees'], options['users'])
+        report = benchmark.run(content)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+            return
+        self.stdout.write(
+            '%(rows)d rows transformed in %(seconds).2fs' % report)
+        self.stdout.write('%-8s %10s' % ('rows as', 'MB'))
+        for name in ('dicts', 'records'):
+            self.stdout.write('%-8s %10.1f' % (name, report[name] / 1048576.0))
+        self.stdout.write('records take %.0f%% of dicts' % (
+            100.0 * report['records'] / report['dicts']))
@@ -0,0 +1,113 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+"""
+Middleware to log sql queries info of sampled requests in production,
+like utils/panel.LogSQLPanel but without django debug toolbar.
+
+An example of configuration is listed below:
+
+1. Add SQLProfilingMiddleware to MIDDLEWARE_CLASSES, and set the fraction
+of requests to be profiled:
+
+MIDDLEWARE_CLASSES += ('iris.core.middleware.SQLProfilingMiddleware',)
+IRIS_SQL_PROFILING_RATE = 0.01
+
+2. It logs one INFO level message of JSON for each sampled request, e.g.
+
+{"path": "/app/submissions/opened/", "view": "...read.opened",
+ "queries": 46, "sql_time": 0.04, "top": [[12, "SELECT ... = ?"], ...]}
+
+where "top" lists the most duplicated query shapes (literals replaced
+by "?"), which often reveals N+1 queries. Configure LOGGING to write
+them into a rotating log:
+
+LOGGING['handlers']['sql_profiling'] = {
+    'level': 'INFO',
+    'class': 'logging.handlers.RotatingFileHandler',
+    'filename': 'yourpath/sql.log',
+    'maxBytes': 10485760,
+    'backupCount': 5,
+}
+LOGGING['loggers']['iris.core.middleware'] = {
+    'handlers': ['sql_profiling'],
+    'level': 'INFO',
+    'propagate': False,
+}
+"""
+
+import re
+import json
+import random
+import logging
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+# pylint: disable=invalid-name,no-self-use
+# C: 15, 0: Invalid constant name "logger" (invalid-name)
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'IN \((?:\?, )*\?\)')
+
+
+def query_shape(sql):
+    """
+    Replace literals in sql with "?", so that queries only differ
+    in parameters have the same shape
+    """
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class SQLProfilingMiddleware(object):
+    """
+    Log number, time and most duplicated shapes of sql queries for a
+    sampled fraction (IRIS_SQL_PROFILING_RATE) of requests
+    """
+
+    def process_request(self, request):
+        if random.random() >= settings.IRIS_SQL_PROFILING_RATE:
+            return
+        request.sql_profiling = {
+            'debug_cursor': connection.use_debug_cursor,
+            'start': len(connection.queries),
+            }
+        connection.use_debug_cursor = True
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, 'sql_profiling'):
+            request.sql_profiling['view'] = '%s.%s' % (
+                view_func.__module__, getattr(view_func, '__name__', ''))
+
+    def process_response(self, request, response):
+        profiling = getattr(request, 'sql_profiling', None)
+        if profiling is None:
+            return response
+        connection.use_debug_cursor = profiling['debug_cursor']
+        queries = connection.queries[profiling['start']:]
+
+        shapes = Counter(query_shape(query['sql']) for query in queries)
+        top = [[count, shape] for shape, count in shapes.most_common(
+            settings.IRIS_SQL_PROFILING_TOP) if count > 1]
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': profiling.get('view'),
+            'status': response.status_code,
+            'queries': len(queries),
+            'sql_time': round(sum(float(query['time'])
+                                  for query in queries), 4),
+            'top': top,
+            }))
+        return response
@@ -28,17 +28,19 @@ __all__ = []
 
 # Package Database related model imports:
 from iris.core.models.packagedb import (Domain, SubDomain, License,
-    GitTree, Package, Product, Image, role_users)
+    GitTree, Package, Product, ProductGraph, Image, ImportDigest, role_users)
 from iris.core.models.submissions import (
     PackageBuild, ImageBuild, Submission, SubmissionBuild, BuildGroup,
-    SubmissionGroup, Snapshot, DISPLAY_STATUS)
+    SubmissionGroup, Snapshot, QueuedEvent, DISPLAY_STATUS)
 from iris.core.models.user import (UserProfile, UserParty,
     DomainRole, SubDomainRole, GitTreeRole)
 
 
 __all__.extend(['Domain', 'SubDomain', 'License', 'GitTree', 'Package',
-                'Product', 'Image', 'role_users'])
+                'Product', 'ProductGraph', 'Image', 'ImportDigest',
+                'role_users'])
 __all__.extend(['PackageBuild', 'ImageBuild', 'Submission', 'SubmissionBuild',
-                'BuildGroup', 'SubmissionGroup', 'Snapshot', 'DISPLAY_STATUS'])
+                'BuildGroup', 'SubmissionGroup', 'Snapshot', 'QueuedEvent',
+                'DISPLAY_STATUS'])
 __all__.extend(['UserProfile', 'UserParty',
                 'DomainRole', 'SubDomainRole', 'GitTreeRole', ])
@@ -24,7 +24,12 @@ Models related to packaging and version control go here.
 # Required for splitting up the applications to multiple files.
 APP_LABEL = 'core'
 
-from django.db import models
+import json
+from collections import defaultdict
+
+from django.db import models, transaction, IntegrityError
+from django.db.models import Count, F
+from django.utils import timezone
 
 
 def role_users(roles_set, *args):
@@ -85,6 +90,14 @@ class SubDomainManager(models.Manager):
     def get_by_natural_key(self, dname, sname):
         return self.get(name=sname, domain__name=dname)
 
+    def package_counts(self):
+        """
+        Subdomains annotated with `package_count`, the number of packages
+        built from their git trees
+        """
+        return self.annotate(
+            package_count=Count('gittree__packages', distinct=True))
+
 
 class SubDomain(models.Model):
     """
@@ -110,9 +123,7 @@ class SubDomain(models.Model):
         return ' / '.join((self.domain.name, self.name))
 
     def get_packages(self):
-        return {package
-        for gittree in self.gittree_set.all()
-        for package in gittree.packages.all()}
+        return Package.objects.in_subdomain(self)
 
 
 class License(models.Model):
@@ -163,6 +174,32 @@ class PackageManager(models.Manager):
     def get_by_natural_key(self, name):
         return self.get(name=name)
 
+    def in_subdomain(self, subdomain):
+        """
+        Packages built from git trees of `subdomain`
+        """
+        return self.filter(gittree__subdomain=subdomain).distinct()
+
+    def with_license(self, lic):
+        """
+        Packages built from git trees with license `lic`
+        """
+        return self.filter(gittree__licenses=lic).distinct()
+
+    def by_subdomain(self):
+        """
+        Returns dict of subdomain id to the list of its packages sorted
+        by name, read by one query. The packages only have id and name.
+        """
+        rows = GitTree.packages.through.objects.values_list(
+            'gittree__subdomain', 'package', 'package__name').distinct()
+        packages = defaultdict(list)
+        for subdomain, pkid, name in rows:
+            packages[subdomain].append(self.model(id=pkid, name=name))
+        for value in packages.itervalues():
+            value.sort(key=lambda package: package.name.lower())
+        return packages
+
 
 class Package(models.Model):
     """
@@ -190,6 +227,18 @@ class ProductManager(models.Manager):
         return self.get(name=name)
 
 
+def newest_snapshots(snapshots):
+    """
+    Returns dict of Product.LATEST pointers to the newest of `snapshots`,
+    None for pointers none of them has
+    """
+    latest = {}
+    for field, key in Product.LATEST:
+        newest = snapshots.exclude(**{key: None}).order_by('-' + key)[:1]
+        latest[field] = newest[0] if newest else None
+    return latest
+
+
 class Product(models.Model):
     """
     A class defining a single product, e.g. Tizen IVI.
@@ -200,34 +249,178 @@ class Product(models.Model):
     description = models.TextField()
     gittrees = models.ManyToManyField(GitTree, blank=True)
 
+    # newest snapshots of this product, kept by update_latest() and
+    # refresh_latest() when snapshots are deleted
+    latest_snapshot = models.ForeignKey(
+        'Snapshot', blank=True, null=True, related_name='+',
+        on_delete=models.SET_NULL)
+    latest_daily = models.ForeignKey(
+        'Snapshot', blank=True, null=True, related_name='+',
+        on_delete=models.SET_NULL)
+    latest_weekly = models.ForeignKey(
+        'Snapshot', blank=True, null=True, related_name='+',
+        on_delete=models.SET_NULL)
+
+    # (pointer, snapshot field ordering snapshots of the pointer)
+    LATEST = (
+        ('latest_snapshot', 'buildid'),
+        ('latest_daily', 'daily_url'),
+        ('latest_weekly', 'weekly_url'),
+        )
+
     def __unicode__(self):
         return self.name
 
-    @property
-    def latest_snapshot(self):
-        snapshots = self.snapshot_set.order_by('-buildid')
-        if snapshots:
-            return snapshots[0]
+    def update_latest(self, snapshot):
+        """
+        Point latest_* to `snapshot` if it is newer than the current ones
+        """
+        fields = [field for field, _ in self.LATEST]
+        current = Product.objects.select_for_update().select_related(
+            *fields).get(pk=self.pk)
+        changed = {}
+        for field, key in self.LATEST:
+            value = getattr(snapshot, key)
+            latest = getattr(current, field)
+            if value is not None and (
+                    latest is None or getattr(latest, key) < value):
+                changed[field] = snapshot
+        if changed:
+            Product.objects.filter(pk=self.pk).update(**changed)
+        for field in fields:
+            setattr(self, field, changed.get(field, getattr(current, field)))
+
+    def refresh_latest(self):
+        """
+        Point latest_* to the newest snapshots searched from all snapshots
+        """
+        latest = newest_snapshots(self.snapshot_set.all())
+        for field, snapshot in latest.iteritems():
+            setattr(self, field, snapshot)
+        Product.objects.filter(pk=self.pk).update(**latest)
 
-    @property
-    def latest_daily(self):
-        snapshots = self.snapshot_set.exclude(
-                        daily_url=None
-                        ).order_by(
-                        '-daily_url'
-                        )
-        if snapshots:
-            return snapshots[0]
+    class Meta:
+        app_label = APP_LABEL
 
-    @property
-    def latest_weekly(self):
-        snapshots = self.snapshot_set.exclude(
-                        weekly_url=None
-                        ).order_by(
-                        '-weekly_url'
-                        )
-        if snapshots:
-            return snapshots[0]
+
+class ProductGraphManager(models.Manager):
+
+    def build(self, product):
+        """
+        Returns graph of git trees of `product` and packages built from
+        them, trees are sorted by domain, subdomain and path
+        """
+        packages = defaultdict(list)
+        for tree, pkid, name in GitTree.packages.through.objects.filter(
+                gittree__in=product.gittrees.all()).values_list(
+                    'gittree', 'package', 'package__name'):
+            packages[tree].append({'id': pkid, 'name': name})
+        trees = []
+        for tree in product.gittrees.select_related('subdomain__domain'):
+            subdomain, domain = tree.subdomain, tree.subdomain.domain
+            trees.append({
+                'id': tree.id,
+                'gitpath': tree.gitpath,
+                'subdomain': {
+                    'id': subdomain.id,
+                    'name': subdomain.name,
+                    'domain': {'id': domain.id, 'name': domain.name},
+                    },
+                'packages': sorted(packages[tree.id],
+                                   key=lambda package: package['name']),
+                })
+        trees.sort(key=lambda tree: (tree['subdomain']['domain']['name'],
+                                     tree['subdomain']['name'],
+                                     tree['gitpath']))
+        return {'format': ProductGraph.FORMAT, 'gittrees': trees}
+
+    def rebuild(self, product):
+        """
+        Build graph of `product` and store it as a new version, returns
+        the graph
+        """
+        data = self.build(product)
+        text = json.dumps(data, separators=(',', ':'))
+        now = timezone.now()
+        if self.filter(product=product).update(
+                data=text, version=F('version') + 1, built_time=now):
+            return data
+        try:
+            with transaction.atomic():
+                self.create(product=product, data=text, built_time=now)
+        except IntegrityError:
+            # created meanwhile by another request, e.g. two first loads
+            self.filter(product=product).update(
+                data=text, version=F('version') + 1, built_time=now)
+        return data
+
+    # lookups from products to objects shown in their graphs
+    RELATED = {
+        'Product': 'pk',
+        'GitTree': 'gittrees',
+        'SubDomain': 'gittrees__subdomain',
+        'Domain': 'gittrees__subdomain__domain',
+        'Package': 'gittrees__packages',
+        }
+
+    def related(self, obj):
+        """
+        Returns products whose graphs show `obj`
+        """
+        lookup = self.RELATED.get(obj._meta.object_name)
+        if not lookup:
+            return Product.objects.none()
+        return Product.objects.filter(**{lookup: obj.pk}).distinct()
+
+    def rebuild_related(self, obj):
+        """
+        Rebuild graphs of products showing `obj` after it's changed
+        """
+        for product in self.related(obj):
+            self.rebuild(product)
+
+    def rebuild_all(self):
+        """
+        Build graphs of all products
+        """
+        for product in Product.objects.all():
+            self.rebuild(product)
+
+    def load(self, product):
+        """
+        Returns stored graph of `product`, it's built if there isn't one
+        or it was stored in another format
+        """
+        text = self.filter(product=product).values_list('data', flat=True)
+        data = json.loads(text[0]) if text else None
+        if not data or data.get('format') != ProductGraph.FORMAT:
+            data = self.rebuild(product)
+        return data
+
+
+class ProductGraph(models.Model):
+    """
+    Git trees of a product and packages built from them, precomputed so
+    that they can be read without joining many to many tables.
+
+    It's rebuilt at the end of each scm and snapshot import and when the
+    product or objects shown in it are changed by packagedb forms and
+    deleted by packagedb views. `version` counts the rebuilds.
+    """
+    # version of the structure of data, older ones are rebuilt on load
+    FORMAT = 1
+
+    objects = ProductGraphManager()
+
+    product = models.OneToOneField(Product, primary_key=True,
+                                   related_name='graph')
+    version = models.PositiveIntegerField(default=1)
+    built_time = models.DateTimeField()
+    # JSON of ProductGraphManager.build()
+    data = models.TextField()
+
+    def __unicode__(self):
+        return u'%s: %s' % (self.product, self.version)
 
     class Meta:
         app_label = APP_LABEL
@@ -250,3 +443,23 @@ class Image(models.Model):
     class Meta:
         app_label = APP_LABEL
         unique_together = ('name', 'target', 'product')
+
+
+class ImportDigest(models.Model):
+    """
+    Class storing digest of a piece of imported data, e.g. a block of
+    scm data or repodata files of a snapshot target, so that unchanged
+    data can be skipped by the next import.
+    """
+
+    # 'scm' or 'snapshot:<product name>'
+    source = models.CharField(max_length=255, db_index=True)
+    # block or file of the source
+    key = models.CharField(max_length=512)
+    digest = models.CharField(max_length=40)
+
+    def __unicode__(self):
+        return u'%s: %s' % (self.source, self.key)
+
+    class Meta:
+        app_label = APP_LABEL
@@ -24,7 +24,11 @@ from collections import defaultdict
 APP_LABEL = 'core'
 
 from django.db import models
+from django.db.models.signals import post_delete
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from iris.core.models.packagedb import Product
 
 
 DISPLAY_STATUS = {
@@ -73,6 +77,8 @@ class PackageBuild(models.Model):
     class Meta:
         app_label = APP_LABEL
         unique_together = ('package', 'repo', 'arch', 'group')
+        # builds of a group by status
+        index_together = (('group', 'status'),)
 
 
 class ImageBuild(models.Model):
@@ -149,6 +155,22 @@ class BuildGroup(models.Model):
     operate_reason = models.TextField()
     snapshot = models.ForeignKey('Snapshot', blank=True, null=True)
 
+    # number of package and image builds in each final status, they are
+    # kept by check_packages_status() and check_images_status()
+    succeeded_packages = models.PositiveIntegerField(default=0)
+    failed_packages = models.PositiveIntegerField(default=0)
+    succeeded_images = models.PositiveIntegerField(default=0)
+    failed_images = models.PositiveIntegerField(default=0)
+
+    PACKAGE_COUNTERS = {
+        'SUCCESS': 'succeeded_packages',
+        'FAILURE': 'failed_packages',
+        }
+    IMAGE_COUNTERS = {
+        'SUCCESS': 'succeeded_images',
+        'FAILURE': 'failed_images',
+        }
+
     def __unicode__(self):
         return self.name
 
@@ -161,18 +183,19 @@ class BuildGroup(models.Model):
         Check all packages building status
         Argument `packagebuild` is the newest comming package build
         """
-        sts = {pbuild.natural_key(): pbuild.status
-               for pbuild in self.packagebuild_set.select_related('package').all()}
-        sts[packagebuild.natural_key()] = packagebuild.status
-
-        if any([i == 'FAILURE' for i in sts.values()]):
+        self._lock_counters()
+        old = self.packagebuild_set.filter(
+            package=packagebuild.package,
+            repo=packagebuild.repo,
+            arch=packagebuild.arch).values_list('status', flat=True)
+        self._count(self.PACKAGE_COUNTERS,
+                    old[0] if old else None, packagebuild.status)
+
+        if self.failed_packages:
             final = '15_PKGFAILED'
         else:
             final = '10_PKGBUILDING'
-
-        if self.status != final:
-            self.status = final
-            self.save()
+        self._save_counters(self.PACKAGE_COUNTERS, final)
 
     @property
     def opened(self):
@@ -189,29 +212,77 @@ class BuildGroup(models.Model):
     def check_images_status(self, imagebuild):
         """
         Check all images building status
-        Argument `status` is the newest comming image status
+        Argument `imagebuild` is the newest comming image build
         """
-        sts = {ibuild.natural_key(): ibuild.status
-               for ibuild in self.imagebuild_set.all()}
-        sts[imagebuild.natural_key()] = imagebuild.status
+        self._lock_counters()
+        old = self.imagebuild_set.filter(
+            name=imagebuild.name).values_list('status', flat=True)
+        self._count(self.IMAGE_COUNTERS,
+                    old[0] if old else None, imagebuild.status)
 
-        if any([i == 'FAILURE' for i in sts.values()]):
+        if self.failed_images:
             final = '25_IMGFAILED'
         else:
             final = '20_IMGBUILDING'
+        self._save_counters(self.IMAGE_COUNTERS, final)
 
+    def _lock_counters(self):
+        """
+        Lock this group's row and reload its status and counters.
+
+        The row must be locked before reading or writing any build row of
+        this group, otherwise deadlock may be raised by the shared lock
+        which MySQL puts on it when inserting a build row referring to it.
+        refs: http://dev.mysql.com/doc/refman/5.5/en/innodb-foreign-key-constraints.html
+        """
+        fields = self.PACKAGE_COUNTERS.values() + self.IMAGE_COUNTERS.values()
+        row = BuildGroup.objects.select_for_update().filter(
+            pk=self.pk).values('status', *fields)[0]
+        for field, value in row.items():
+            setattr(self, field, value)
+
+    def _count(self, counters, old, new):
+        """
+        Move one build from status `old` to status `new` in `counters`
+        """
+        if old == new:
+            return
+        if old in counters:
+            field = counters[old]
+            setattr(self, field, max(getattr(self, field) - 1, 0))
+        if new in counters:
+            field = counters[new]
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _save_counters(self, counters, final):
+        """
+        Save `counters`, and status if it changes to `final`
+        """
+        fields = counters.values()
         if self.status != final:
             self.status = final
-            self.save()
+            fields.extend(['status', 'updated'])
+        self.save(update_fields=fields)
 
     def populate_status(self):
         """
-        Populate this BuildGroup's status to related Submissions
+        Populate this BuildGroup's status to related Submissions,
+        returns the number of submissions updated.
+
+        Submission ids are read first rather than using a subquery in the
+        UPDATE, since MySQL can't turn it into a semi-join and would scan
+        and lock all rows of core_submission. The UPDATE then locks rows by
+        primary key in ascending order, which is the same order for all
+        concurrent events, so they don't deadlock with each other.
         """
-        for sbuild in self.submissionbuild_set.all().order_by('id'):
-            if sbuild.submission.status != self.status:
-                sbuild.submission.status = self.status
-                sbuild.submission.save()
+        ids = sorted(self.submissionbuild_set.values_list(
+            'submission_id', flat=True))
+        if not ids:
+            return 0
+        # update() bypasses auto_now, so "updated" has to be set here
+        return Submission.objects.filter(id__in=ids).exclude(
+            status=self.status).update(
+                status=self.status, updated=timezone.now())
 
     @property
     def product(self):
@@ -246,6 +317,9 @@ class BuildGroup(models.Model):
 
     class Meta:
         app_label = APP_LABEL
+        # accepted groups not in any snapshot yet, see snapshot_finish.
+        # Columns compared by equality go before the range one.
+        index_together = (('status', 'snapshot', 'operated_on'),)
 
 
 class SubmissionManager(models.Manager):
@@ -340,6 +414,8 @@ class Submission(models.Model):
     class Meta:
         app_label = APP_LABEL
         unique_together = ('name', 'gittree')
+        # submissions of an owner, optionally by status
+        index_together = (('owner', 'status'),)
         permissions = (('publish_events', 'Can publish events'),)
 
 
@@ -467,6 +543,39 @@ class SubmissionGroup(object):
         return min([s.created for s in self.subs])
 
 
+class QueuedEvent(models.Model):
+    """
+    Class representing a submissions event waiting in queue to be handled
+    by the process_events command.
+    """
+
+    STATUS = {
+        'PENDING': 'Pending',
+        'DONE': 'Done',
+        'FAILED': 'Failed',
+        }
+
+    typ = models.CharField(max_length=64)
+    # pre-release project name, events of the same project are
+    # handled one by one in the order of id
+    project = models.CharField(max_length=255, blank=True, db_index=True)
+    # JSON encoded event parameters
+    data = models.TextField()
+
+    status = models.CharField(max_length=64, db_index=True,
+                              choices=STATUS.items(), default='PENDING')
+    detail = models.TextField(blank=True)
+
+    received = models.DateTimeField(auto_now_add=True)
+    handled = models.DateTimeField(blank=True, null=True)
+
+    def __unicode__(self):
+        return u'%s: %s' % (self.typ, self.status)
+
+    class Meta:
+        app_label = APP_LABEL
+
+
 class Snapshot(models.Model):
 
     product = models.ForeignKey('Product')
@@ -497,3 +606,17 @@ class Snapshot(models.Model):
     class Meta:
         app_label = APP_LABEL
         unique_together = ('product', 'buildid')
+        # finished snapshots of a product ordered by finished time
+        index_together = (('product', 'finished_time'),)
+
+
+def refresh_product_latest(sender, instance, **kwargs):
+    """
+    Post delete signal handler of snapshots: latest_* of the product fall
+    back to the newest remaining snapshots instead of being left empty.
+    """
+    for product in Product.objects.filter(pk=instance.product_id):
+        product.refresh_latest()
+
+post_delete.connect(refresh_product_latest, sender=Snapshot,
+                    dispatch_uid='refresh_product_latest')
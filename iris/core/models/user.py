@@ -34,6 +34,8 @@ class UserProfile(models.Model):
 
     User._meta.get_field("username").max_length = 225
     user = models.OneToOneField(User)
+    # email of which the scm user has been merged into this user
+    merged_email = models.EmailField(blank=True)
 
     def __unicode__(self):
         return self.user
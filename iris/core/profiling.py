@@ -0,0 +1,161 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+"""
+Helpers for measuring performance of views, handlers and imports.
+"""
+import math
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.test.utils import (
+    CaptureQueriesContext, setup_test_environment, teardown_test_environment)
+from south.management.commands import patch_for_test_db_setup
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of `values`, None if it's empty
+    """
+    if not values:
+        return None
+    values = sorted(values)
+    rank = int(math.ceil(percent / 100.0 * len(values)))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+def peak_rss():
+    """
+    Peak resident set size of current process in bytes, None if unknown
+    """
+    try:
+        with open('/proc/self/status') as reader:
+            for line in reader:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except IOError:
+        pass
+
+
+class Measure(object):
+    """
+    Context manager measuring a block of code, e.g.
+
+    with Measure() as measure:
+        do_something()
+    print measure.as_dict()
+
+    seconds -- wall time
+    queries -- number of SQL queries
+    sql_seconds -- time spent in SQL queries
+    rss_growth -- how many bytes peak RSS of the process grew during
+                  the block, None if it's unknown
+    """
+
+    def __init__(self):
+        self._capture = CaptureQueriesContext(connection)
+        self._started = self._peak_rss = None
+        self.seconds = self.sql_seconds = 0
+        self.queries = 0
+        self.rss_growth = None
+
+    def __enter__(self):
+        self._peak_rss = peak_rss()
+        self._capture.__enter__()
+        self._started = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.seconds = time.time() - self._started
+        self._capture.__exit__(exc_type, exc_value, traceback)
+        self.queries = len(self._capture.captured_queries)
+        self.sql_seconds = sum(float(query['time'])
+                               for query in self._capture.captured_queries)
+        peak = peak_rss()
+        if peak is not None and self._peak_rss is not None:
+            self.rss_growth = peak - self._peak_rss
+
+    def as_dict(self):
+        return {
+            'seconds': self.seconds,
+            'queries': self.queries,
+            'sql_seconds': self.sql_seconds,
+            'rss_growth': self.rss_growth,
+            }
+
+
+@contextmanager
+def scratch_database():
+    """
+    Run a block in a test database created from the configured one
+    (e.g. test_iris on MySQL), which is destroyed afterwards, so that
+    benchmarks never touch real data.
+    """
+    setup_test_environment()
+    # Create tables from models as tests do, history is not needed
+    settings.SOUTH_TESTS_MIGRATE = False
+    patch_for_test_db_setup()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+class PhaseProfiler(object):
+    """
+    Measure named phases of a job one after another, e.g.
+
+    profiler = PhaseProfiler()
+    with profiler.phase('parse'):
+        parse()
+    with profiler.phase('load', rows=lambda: loader.rows):
+        load()
+    json.dump(profiler.report(), writer)
+
+    `rows` is a callable returning a running counter of rows touched,
+    the phase records how much it grew. A disabled profiler measures
+    nothing, so callers don't need to check it.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name, rows=None):
+        if not self.enabled:
+            yield
+            return
+        before = rows() if rows else None
+        with Measure() as measure:
+            yield
+        item = dict(measure.as_dict(), name=name)
+        if rows:
+            item['rows'] = rows() - before
+        self.phases.append(item)
+
+    def report(self):
+        """
+        Returns dict of all phases and their total
+        """
+        return {
+            'phases': self.phases,
+            'total': {
+                'seconds': sum(i['seconds'] for i in self.phases),
+                'queries': sum(i['queries'] for i in self.phases),
+                'sql_seconds': sum(i['sql_seconds'] for i in self.phases),
+                'rows': sum(i.get('rows', 0) for i in self.phases),
+                'rss_growth': sum(i['rss_growth'] or 0
+                                  for i in self.phases),
+                },
+            }
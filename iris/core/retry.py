@@ -0,0 +1,123 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+"""
+Retrying transactions which fail because of lock contention.
+
+refs: http://dev.mysql.com/doc/refman/5.5/en/innodb-deadlocks.html
+Always be prepared to re-issue a transaction if it fails due to
+deadlock. Deadlocks are not dangerous. Just try again.
+"""
+import time
+import random
+import logging
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+logger = logging.getLogger(__name__)
+
+# MySQL error codes, same as MySQLdb.constants.ER
+LOCK_WAIT_TIMEOUT = 1205
+LOCK_DEADLOCK = 1213
+
+
+class RetryStats(object):
+    """
+    Counters of transactions run by retry_atomic, shared by threads
+
+    calls -- number of decorated calls
+    retries -- number of transactions issued again
+    failures -- number of calls which gave up retrying
+    """
+    NAMES = ('calls', 'retries', 'failures')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(self.NAMES, 0)
+
+    def incr(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def reset(self):
+        with self._lock:
+            self._counters = dict.fromkeys(self.NAMES, 0)
+
+    def as_dict(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+stats = RetryStats()
+
+
+def is_lock_error(err):
+    """
+    Whether `err` is caused by lock contention, which is worth retrying
+    """
+    if not isinstance(err, OperationalError):
+        return False
+    if err.args and err.args[0] in (LOCK_DEADLOCK, LOCK_WAIT_TIMEOUT):
+        return True
+    # sqlite3 doesn't have error codes
+    return 'database is locked' in str(err)
+
+
+def backoff_delay(attempt, backoff, max_backoff):
+    """
+    Seconds to sleep before the `attempt`th retry, with full jitter
+    """
+    return random.uniform(0, min(max_backoff, backoff * 2 ** (attempt - 1)))
+
+
+def retry_atomic(attempts=None, backoff=None, max_backoff=None):
+    """
+    Decorator which calls the function in a transaction, and issues the
+    transaction again if it fails because of deadlock or lock wait timeout.
+
+    Default values of arguments come from IRIS_TX_RETRY_* settings.
+    Only the outermost transaction is retried, because the database
+    has rolled back all of it. Inside an atomic block the function
+    just runs in a savepoint and errors are raised to the outer one.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if transaction.get_connection().in_atomic_block:
+                with transaction.atomic():
+                    return func(*args, **kwargs)
+
+            total = attempts or settings.IRIS_TX_RETRY_ATTEMPTS
+            base = settings.IRIS_TX_RETRY_BACKOFF \
+                if backoff is None else backoff
+            cap = settings.IRIS_TX_RETRY_MAX_BACKOFF \
+                if max_backoff is None else max_backoff
+            stats.incr('calls')
+            attempt = 1
+            while True:
+                try:
+                    with transaction.atomic():
+                        return func(*args, **kwargs)
+                except OperationalError as err:
+                    if not is_lock_error(err):
+                        raise
+                    if attempt >= total:
+                        stats.incr('failures')
+                        logger.error("%s failed after %d attempts: %s",
+                                     func.__name__, attempt, err)
+                        raise
+                    stats.incr('retries')
+                    logger.warn("Lock error in %s, try again: %s",
+                                func.__name__, err)
+                    time.sleep(backoff_delay(attempt, base, cap))
+                    attempt += 1
+        return wrapper
+    return decorator
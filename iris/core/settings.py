@@ -195,6 +195,61 @@ LOGGING = {
 UI_AVAILABLE = True
 REST_API_AVAILABLE = True
 
+# If IRIS_EVENTS_QUEUE is set, submissions events are only validated and
+# saved into a queue in the web request, and are handled later by the
+# process_events management command. Give it --purge-older-than to delete
+# handled events, otherwise the queue table keeps growing.
+
+IRIS_EVENTS_QUEUE = False
+
+# Transactions which fail because of deadlock or lock wait timeout are
+# retried up to IRIS_TX_RETRY_ATTEMPTS times in total. Before each retry
+# it sleeps for a random time up to IRIS_TX_RETRY_BACKOFF seconds,
+# which doubles on every retry and is capped by IRIS_TX_RETRY_MAX_BACKOFF.
+
+IRIS_TX_RETRY_ATTEMPTS = 3
+IRIS_TX_RETRY_BACKOFF = 0.05
+IRIS_TX_RETRY_MAX_BACKOFF = 1.0
+
+# Pks of packages, products, git trees and pre-release projects looked up
+# by events are cached, at most IRIS_KEY_CACHE_SIZE of each model for
+# IRIS_KEY_CACHE_TTL seconds. Set size to 0 to disable the cache. Imports
+# invalidate them through Django cache, which is checked every
+# IRIS_KEY_CACHE_CHECK seconds, so it must be shared by all processes.
+
+IRIS_KEY_CACHE_SIZE = 1024
+IRIS_KEY_CACHE_TTL = 300
+IRIS_KEY_CACHE_CHECK = 5
+
+# If IRIS_EVENTS_JOURNAL is set to a file path, each handled submissions
+# event is appended to it, which can be fed back by replay_events command.
+
+IRIS_EVENTS_JOURNAL = None
+
+# Fraction of requests whose sql queries are logged by
+# iris.core.middleware.SQLProfilingMiddleware if it's enabled, with
+# IRIS_SQL_PROFILING_TOP most duplicated query shapes.
+
+IRIS_SQL_PROFILING_RATE = 0.0
+IRIS_SQL_PROFILING_TOP = 5
+
+# Load scm data by set-based sql through staging tables instead of
+# comparing rows one by one, see iris.etl.staging.
+
+IRIS_SCM_STAGING = False
+
+# If IRIS_EXPORT_DIR is set, listings of packagedb APIs are exported into
+# gzipped JSON files there after each scm or snapshot import, and list
+# APIs serve them instead of querying database. Edits in packagedb pages
+# discard the exports they change until the next import. If the directory
+# is published by web server at IRIS_EXPORT_URL, e.g. '/exports/', list
+# APIs redirect to the files there. The web server must send them with
+# "Content-Encoding: gzip", e.g. by "AddEncoding gzip .gz" in Apache,
+# otherwise clients receive raw gzip instead of JSON.
+
+IRIS_EXPORT_DIR = None
+IRIS_EXPORT_URL = None
+
 # Secret key should be read from an external file for security reasons.
 # Please DO NOT expose this file to anybody after setting it in production.
 # Consult documentation for the proper secret key format.
@@ -270,6 +325,9 @@ if 'test' in argv:
         'NAME': ':memory:',
     }
 
+    # Rolling back test transactions doesn't invalidate cached pks
+    IRIS_KEY_CACHE_SIZE = 0
+
     INSTALLED_APPS += ('django_nose',)
 
     TEST_RUNNER = 'django_nose.NoseTestSuiteRunner'
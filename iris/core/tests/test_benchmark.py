@@ -0,0 +1,40 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+#pylint: disable=no-member,missing-docstring,invalid-name
+#C: 20, 4: Missing method docstring (missing-docstring)
+
+from django.test import TestCase
+
+from iris.core import benchmark
+from iris.core.models import Submission, SubmissionBuild, BuildGroup
+
+
+class PagesBenchmarkTest(TestCase):
+
+    def test_generate_and_run(self):
+        benchmark.generate(submissions=20, gittrees=10, snapshots=4,
+                           builds=1, users=3)
+        self.assertEquals(20, Submission.objects.count())
+        self.assertEquals(40, SubmissionBuild.objects.count())
+        self.assertEquals(14, BuildGroup.objects.filter(
+            status='33_ACCEPTED').exclude(snapshot=None).count())
+
+        report = benchmark.run(repeat=1)
+        self.assertEquals(
+            set(name for name, _url in benchmark.endpoints()), set(report))
+        for item in report.values():
+            self.assertEquals(200, item['status'])
+            self.assertTrue(item['queries'] > 0)
+
+    def test_compare(self):
+        baseline = {'opened': {'seconds': 1.0, 'queries': 10}}
+        self.assertEquals([], benchmark.compare(
+            {'opened': {'seconds': 1.1, 'queries': 10}}, baseline))
+        self.assertEquals(2, len(benchmark.compare(
+            {'opened': {'seconds': 1.5, 'queries': 11}}, baseline)))
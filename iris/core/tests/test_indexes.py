@@ -0,0 +1,107 @@
+# -*- encoding: utf-8 -*-
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+'''
+This module is used to test that hot queries are supported by indexes
+'''
+#pylint: disable=missing-docstring,invalid-name
+
+import re
+from datetime import datetime
+
+from django.db import connection
+from django.test import TestCase
+from django.contrib.auth.models import User
+
+from iris.core.models import (
+    Product, Package, Snapshot, BuildGroup, Submission, PackageBuild,
+    ImageBuild)
+
+
+def explain(queryset):
+    """
+    Returns (fully scanned tables, whether sorting is needed) when running
+    `queryset`, according to EXPLAIN of the database
+    """
+    sql, params = queryset.query.sql_with_params()
+    cursor = connection.cursor()
+    if connection.vendor == 'mysql':
+        # MySQL prefers scanning the few rows of test tables to using
+        # indexes, unless it's told that seeks by keys are cheap
+        cursor.execute('SET SESSION max_seeks_for_key = 1')
+        try:
+            cursor.execute('EXPLAIN ' + sql, params)
+            columns = [col[0] for col in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.execute('SET SESSION max_seeks_for_key = DEFAULT')
+        # tables scanned although an index could be used are fine as well
+        return ([row['table'] for row in rows
+                 if row['type'] == 'ALL' and not row['possible_keys']],
+                any('filesort' in (row['Extra'] or '') for row in rows))
+    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+    scans, sort = [], False
+    for row in cursor.fetchall():
+        # "SCAN TABLE core_snapshot" in old sqlite, "SCAN core_snapshot"
+        # in new one. Scans using any index are fine.
+        match = re.match(r'SCAN (?:TABLE )?(\w+)', row[-1])
+        if match and 'USING' not in row[-1]:
+            scans.append(match.group(1))
+        sort = sort or 'TEMP B-TREE FOR ORDER BY' in row[-1]
+    return scans, sort
+
+
+class IndexTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='alice')
+        self.product = Product.objects.create(name='Tizen:IVI')
+        self.group = BuildGroup.objects.create(name='home:prerelease:1')
+        self.snapshot = Snapshot.objects.create(
+            product=self.product, buildid='tizen-ivi_20150101.1',
+            started_time=datetime.now())
+
+    def assertNoFullScan(self, queryset, sort=False):
+        self.assertEquals(([], sort), explain(queryset), queryset.query)
+
+    def test_snapshot_finish_groups(self):
+        self.assertNoFullScan(BuildGroup.objects.filter(
+            status='33_ACCEPTED',
+            operated_on__lt=self.snapshot.started_time,
+            submissionbuild__product=self.product,
+            snapshot=None).distinct().values('id'))
+
+    def test_snapshots_with_same_product(self):
+        # ordered by the index too
+        self.assertNoFullScan(
+            Snapshot.snapshots_with_same_product(self.product))
+
+    def test_latest_snapshot(self):
+        self.assertNoFullScan(
+            self.product.snapshot_set.order_by('-buildid')[:1])
+
+    def test_submissions_of_owner(self):
+        self.assertNoFullScan(Submission.objects.filter(owner=self.user))
+        self.assertNoFullScan(Submission.objects.filter(
+            owner=self.user, status='SUBMITTED'))
+
+    def test_package_builds_of_group(self):
+        self.assertNoFullScan(PackageBuild.objects.filter(
+            group=self.group, status='FAILURE'))
+        self.assertNoFullScan(self.group.packagebuild_set.filter(
+            package=Package.objects.create(name='alsa'),
+            repo='standard', arch='i586'))
+
+    def test_image_builds_of_group(self):
+        self.assertNoFullScan(self.group.imagebuild_set.filter(
+            name='ivi-mbr-i586'))
+        self.assertNoFullScan(ImageBuild.objects.filter(group=self.group))
+
+    def test_full_scan_detected(self):
+        self.assertEquals((['core_snapshot'], True), explain(
+            Snapshot.objects.filter(buildid__contains='1').order_by('url')))
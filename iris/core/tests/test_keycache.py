@@ -0,0 +1,109 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+#pylint: disable=no-member,missing-docstring,invalid-name
+#C: 20, 4: Missing method docstring (missing-docstring)
+
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from iris.core.models import Package, BuildGroup
+from iris.core import keycache
+from iris.core.keycache import KeyCache
+
+
+@override_settings(IRIS_KEY_CACHE_SIZE=2, IRIS_KEY_CACHE_TTL=300,
+                   IRIS_KEY_CACHE_CHECK=0)
+class KeyCacheTest(TestCase):
+
+    def setUp(self):
+        self.cache = KeyCache(Package, 'name')
+        self.dlog = Package.objects.create(name='dlog')
+
+    def test_hit(self):
+        self.assertEquals(self.dlog, self.cache.get('dlog'))
+        with self.assertNumQueries(0):
+            self.assertEquals(self.dlog.pk, self.cache.get_pk('dlog'))
+            obj = self.cache.get('dlog')
+        self.assertEquals((self.dlog.pk, 'dlog'), (obj.pk, obj.name))
+
+    def test_does_not_exist(self):
+        self.assertRaises(Package.DoesNotExist, self.cache.get, 'nothing')
+
+    def test_created_not_cached(self):
+        obj = self.cache.get('new', create=True)
+        self.assertEquals('new', Package.objects.get(pk=obj.pk).name)
+        with self.assertNumQueries(1):
+            self.cache.get('new', create=True)
+
+    def test_lru(self):
+        Package.objects.create(name='a')
+        Package.objects.create(name='b')
+        self.cache.get('dlog')
+        self.cache.get('a')
+        self.cache.get('dlog')
+        self.cache.get('b')
+        with self.assertNumQueries(0):
+            self.cache.get('dlog')
+        with self.assertNumQueries(1):
+            self.cache.get('a')
+
+    def test_invalidated_by_rename(self):
+        self.cache.get('dlog')
+        self.dlog.name = 'dlog2'
+        self.dlog.save()
+        self.assertRaises(Package.DoesNotExist, self.cache.get, 'dlog')
+
+    def test_invalidated_by_delete(self):
+        self.cache.get('dlog')
+        self.dlog.delete()
+        self.assertRaises(Package.DoesNotExist, self.cache.get, 'dlog')
+
+    def test_other_fields_saved(self):
+        cache = KeyCache(BuildGroup, 'name')
+        group = BuildGroup.objects.create(name='home:prerelease:x',
+                                          status='10_PKGBUILDING')
+        cache.get(group.name)
+        group.failed_packages = 1
+        group.save(update_fields=['failed_packages'])
+        with self.assertNumQueries(0):
+            cache.get(group.name)
+
+    @override_settings(IRIS_KEY_CACHE_TTL=-1)
+    def test_expired(self):
+        self.cache.get('dlog')
+        with self.assertNumQueries(1):
+            self.cache.get('dlog')
+
+    @override_settings(IRIS_KEY_CACHE_SIZE=0)
+    def test_disabled(self):
+        self.cache.get('dlog')
+        with self.assertNumQueries(1):
+            self.cache.get('dlog')
+
+    def test_invalidated_by_other_process(self):
+        self.cache.get('dlog')
+        # an import in another process is committed
+        cache.set(keycache.GENERATION_KEY, 'imported')
+        with self.assertNumQueries(1):
+            self.cache.get('dlog')
+        with self.assertNumQueries(0):
+            self.cache.get('dlog')
+
+    def test_invalidate(self):
+        self.cache.get('dlog')
+        keycache.invalidate()
+        with self.assertNumQueries(1):
+            self.cache.get('dlog')
+
+    def test_one_receiver_for_model(self):
+        receivers = len(post_save.receivers)
+        KeyCache(Package, 'name')
+        self.assertEquals(receivers, len(post_save.receivers))
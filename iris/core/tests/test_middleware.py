@@ -0,0 +1,71 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+#pylint: disable=no-member,missing-docstring,invalid-name
+#C: 20, 4: Missing method docstring (missing-docstring)
+
+import json
+import logging
+
+from django.conf import settings
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from iris.core.middleware import query_shape, logger
+
+MIDDLEWARE = settings.MIDDLEWARE_CLASSES + (
+    'iris.core.middleware.SQLProfilingMiddleware',)
+
+
+class ListHandler(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+class SQLProfilingMiddlewareTest(TestCase):
+
+    fixtures = ['users', 'domains', 'subdomains', 'gittrees', 'products', 'submissions']
+
+    def setUp(self):
+        self.handler = ListHandler()
+        logger.addHandler(self.handler)
+        self.level = logger.level
+        logger.setLevel(logging.INFO)
+
+    def tearDown(self):
+        logger.removeHandler(self.handler)
+        logger.setLevel(self.level)
+
+    @override_settings(MIDDLEWARE_CLASSES=MIDDLEWARE,
+                       IRIS_SQL_PROFILING_RATE=1.0)
+    def test_sampled(self):
+        r = self.client.get('/app/submissions/opened/')
+        self.assertEquals(200, r.status_code)
+        [message] = self.handler.messages
+        profile = json.loads(message)
+        self.assertEquals('/app/submissions/opened/', profile['path'])
+        self.assertEquals('iris.submissions.views.read.opened',
+                          profile['view'])
+        self.assertTrue(profile['queries'] > 0)
+
+    @override_settings(MIDDLEWARE_CLASSES=MIDDLEWARE,
+                       IRIS_SQL_PROFILING_RATE=0.0)
+    def test_not_sampled(self):
+        self.client.get('/app/submissions/opened/')
+        self.assertEquals([], self.handler.messages)
+
+    def test_query_shape(self):
+        self.assertEquals(
+            'SELECT "a" FROM "t" WHERE "t"."id" IN (...) AND "name" = ?',
+            query_shape('SELECT "a" FROM "t" WHERE "t"."id" IN (1, 2, 3) '
+                        'AND "name" = \'it\'\'s\''))
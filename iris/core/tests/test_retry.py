@@ -0,0 +1,88 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+#pylint: disable=no-member,missing-docstring,invalid-name
+#C: 20, 4: Missing method docstring (missing-docstring)
+
+from django.db import OperationalError, transaction
+from django.test import TransactionTestCase
+from django.test.utils import override_settings
+
+from iris.core.models import Domain
+from iris.core.retry import (
+    retry_atomic, stats, LOCK_DEADLOCK, LOCK_WAIT_TIMEOUT)
+
+
+class Contention(object):
+    """
+    Creates a domain and then fails with lock errors the first few times
+    """
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def create(self, name):
+        self.calls += 1
+        Domain.objects.create(name='%s%d' % (name, self.calls))
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.calls
+
+
+@override_settings(IRIS_TX_RETRY_ATTEMPTS=3, IRIS_TX_RETRY_BACKOFF=0)
+class RetryAtomicTest(TransactionTestCase):
+
+    def setUp(self):
+        stats.reset()
+
+    def test_retry_deadlock_and_lock_wait_timeout(self):
+        func = retry_atomic()(Contention([
+            OperationalError(LOCK_DEADLOCK, 'Deadlock found'),
+            OperationalError(LOCK_WAIT_TIMEOUT, 'Lock wait timeout'),
+            ]).create)
+        self.assertEquals(3, func('d'))
+        # changes of failed attempts were rolled back
+        self.assertEquals(['d3'], [i.name for i in Domain.objects.all()])
+        self.assertEquals({'calls': 1, 'retries': 2, 'failures': 0},
+                          stats.as_dict())
+
+    def test_retry_sqlite_locked(self):
+        func = retry_atomic()(Contention([
+            OperationalError('database is locked')]).create)
+        self.assertEquals(2, func('d'))
+
+    def test_give_up(self):
+        contention = Contention([
+            OperationalError(LOCK_DEADLOCK, 'Deadlock found')] * 3)
+        func = retry_atomic()(contention.create)
+        self.assertRaises(OperationalError, func, 'd')
+        self.assertEquals(3, contention.calls)
+        self.assertFalse(Domain.objects.exists())
+        self.assertEquals({'calls': 1, 'retries': 2, 'failures': 1},
+                          stats.as_dict())
+
+    def test_attempts_argument(self):
+        contention = Contention([
+            OperationalError(LOCK_DEADLOCK, 'Deadlock found')] * 3)
+        self.assertEquals(4, retry_atomic(attempts=5)(contention.create)('d'))
+
+    def test_other_errors_not_retried(self):
+        contention = Contention([OperationalError(1146, 'No such table')])
+        func = retry_atomic()(contention.create)
+        self.assertRaises(OperationalError, func, 'd')
+        self.assertEquals(1, contention.calls)
+
+    def test_not_retried_in_outer_transaction(self):
+        contention = Contention([
+            OperationalError(LOCK_DEADLOCK, 'Deadlock found')])
+        func = retry_atomic()(contention.create)
+        with transaction.atomic():
+            self.assertRaises(OperationalError, func, 'd')
+        self.assertEquals(1, contention.calls)
+        self.assertEquals(0, stats.as_dict()['calls'])
@@ -84,7 +84,7 @@ def login_view(request):
 
         if user is not None and user.is_active:
             # merge LDAP user and scm user which with same email in database
-            merge_users(user.email)
+            merge_users(user.email, user)
 
             login(request, user)
             log.info('login|%s|%s', user.username, user.email)
@@ -0,0 +1,107 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+"""
+Memory benchmark of transformed scm data.
+
+generate() writes synthetic scm text, run() parses and transforms it
+and measures rows kept until they are loaded, both as records and as
+the dicts they used to be.
+"""
+import sys
+import time
+
+from iris.etl import scm
+from iris.etl.parser import parse_blocks
+
+
+def generate(domains=50, subdomains=10, gittrees=5000, users=300):
+    """
+    Returns scm text of `domains` with `subdomains` each and `gittrees`
+    spread over them. Every block has a few roles of `users`, and every
+    tree has a license.
+    """
+    def user(i):
+        i %= users
+        return u'User%d Bench <user%d@bench.localhost>' % (i, i)
+
+    lines = []
+    for i in range(domains):
+        lines += [u'D: Bench%d' % i, u'M: %s' % user(i), u'']
+        for j in range(subdomains):
+            lines += [u'D: Bench%d / Sub%d' % (i, j), u'N: Bench%d' % i,
+                      u'SL: %s' % user(i + j), u'']
+    for i in range(gittrees):
+        sub = i % (domains * subdomains)
+        lines += [u'T: bench/tree%d' % i,
+                  u'D: Bench%d / Sub%d' % (sub // subdomains,
+                                           sub % subdomains),
+                  u'M: %s' % user(i), u'R: %s' % user(i + 1),
+                  u'I: %s' % user(i + 2), u'L: GPL-2.0', u'']
+    return u'\n'.join(lines)
+
+
+def sizeof(obj, seen=None):
+    """
+    Bytes of `obj` and everything it refers to through lists, tuples and
+    dicts, objects referred to many times are counted once
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(sizeof(k, seen) + sizeof(v, seen)
+                    for k, v in obj.iteritems())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(sizeof(i, seen) for i in obj)
+    return size
+
+
+def as_dicts(data):
+    """
+    The same rows as dicts, key records shared by pairs stay shared
+    """
+    copies = {}
+
+    def copy(item):
+        """one dict for each record"""
+        if id(item) not in copies:
+            copies[id(item)] = (item, dict(item))
+        return copies[id(item)][1]
+
+    return [tuple(copy(i) for i in row) if isinstance(row, tuple) and
+            not hasattr(row, '_fields') else dict(row) for row in data]
+
+
+def transform(content):
+    """
+    Parse and transform scm text, returns lists of rows to be loaded
+    """
+    rawdata = parse_blocks(content, scm.MAPPING)
+    uc = scm.build_user_cache(rawdata)
+    return ([scm.transform_users(uc.all())] +
+            list(scm.transform_domains(rawdata, uc)) +
+            list(scm.transform_trees(rawdata, uc)))
+
+
+def run(content):
+    """
+    Returns report dict of transforming `content`: number of rows,
+    seconds, and bytes of rows as records and as dicts.
+    """
+    start = time.time()
+    data = transform(content)
+    seconds = time.time() - start
+    return {
+        'rows': sum(len(i) for i in data),
+        'seconds': seconds,
+        'records': sizeof(data),
+        'dicts': sizeof([as_dicts(i) for i in data]),
+        }
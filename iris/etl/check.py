@@ -9,148 +9,224 @@
 Module for checking git scm data.
 """
 import logging
+from collections import namedtuple
 
 from iris.etl.scm import MAPPING
 from iris.etl.scm import ROLES
-from iris.etl.parser import parse_blocks, parse_user
+from iris.etl.parser import iter_blocks, parse_user
 
-# pylint: disable=C0103,W0603
+# pylint: disable=C0103
 # C0103: 30,0: Invalid name "logger"
-# W0603: 39,4:error: Using the global statement
 
 logger = logging.getLogger(__name__)
 
-_message = []
+DOMAINS = 'DOMAINS'
+TREE = 'TREE'
 
 
-def error(*args, **kw):
-    "increase error count and log message"
-    _message.append(*args)
-    return logger.error(*args, **kw)
-
-
-def check_scm(domain_str, gittree_str):
+class Error(namedtuple('Error', 'source lineno message')):
     """
-    check domain and gittree file.
-    The return value: zero means everything is ok, non-zero means something
-    is wrong, and the number is the error num in total.
+    An error found in scm data, `source` is DOMAINS or TREE and `lineno`
+    is number of the line in that file, 0 if it's about the whole file.
     """
-    global _message
-    _message = []
 
-    try:
-        domains_data = parse_blocks(domain_str, MAPPING)
-        trees_data = parse_blocks(gittree_str, MAPPING)
-    except ValueError as err:
-        error(str(err))
-    else:
-        domains = check_domain(domains_data)
-        check_gittree(trees_data, domains)
+    def __unicode__(self):
+        if self.lineno:
+            return u'(%s): line %s: %s' % (
+                self.source, self.lineno, self.message)
+        return u'(%s): %s' % (self.source, self.message)
 
-    return _message
+    def __str__(self):
+        return unicode(self).encode('utf8')
 
+    def as_dict(self):
+        "Returns dict of fields, used by JSON response"
+        return dict(self._asdict())
 
-def check_domain(domains_data):
+
+class Linter(object):
     """
-    Check the content of domain file is valid or not for the following errors:
-
-    * Lack of Domain.
-    * Domain is not unique.
-    * Subdomain lack of parent.
-    * Domain and Parent do not match.
-    * Duplicated domain or subdomain name
-    * Unknown parent domain name
+    Check domain and git tree data.
+
+    Errors are kept by each linter, so different linters can be used by
+    different threads at the same time. User strings are validated only
+    once per linter however many times they appear.
     """
-    names = set()
-    for block_num, (_typ, block) in enumerate(domains_data):
-        domain = block.get("DOMAIN")
-        if domain is None:
-            error("(DOMAINS): Lack of DOMAIN in block %s" % block_num)
-            continue
-        elif len(domain) > 1:
-            error("(DOMAINS): Multi domain names: %s defined in a block" % domain)
-            continue
-
-        domain = domain[0]
-        if domain in names:
-            error("(DOMAINS): Duplicated domain name: %s" % domain)
-            continue
-        names.add(domain)
-
-        if '/' in domain:
-            if "PARENT" not in block:
-                error("(DOMAINS): Lack of parent for domain %s" % domain)
+
+    def __init__(self):
+        self.errors = []
+        self.blocks = []
+        self._users = {}
+
+    def error(self, source, lineno, message):
+        "Add an error and log it"
+        err = Error(source, lineno, message)
+        self.errors.append(err)
+        logger.error(unicode(err))
+
+    def check_scm(self, domain_str, gittree_str):
+        """
+        Check domain and git tree file, returns list of errors, which is
+        empty if everything is ok.
+
+        Parsed blocks of both files are kept in `blocks`, the same as
+        parse_blocks() of the two files joined, so that they can be
+        imported without parsing again.
+        """
+        self.errors, self.blocks = [], []
+        try:
+            domains_data = list(iter_blocks(domain_str, MAPPING))
+        except ValueError as err:
+            self.error(DOMAINS, getattr(err, 'lineno', 0), err.args[0])
+            domains_data = None
+        try:
+            trees_data = list(iter_blocks(gittree_str, MAPPING))
+        except ValueError as err:
+            self.error(TREE, getattr(err, 'lineno', 0), err.args[0])
+            trees_data = None
+
+        if domains_data is not None and trees_data is not None:
+            domains = self.check_domain(domains_data)
+            self.check_gittree(trees_data, domains)
+            self.blocks = [(typ, block)
+                           for _lines, typ, block in domains_data + trees_data]
+        return self.errors
+
+    def check_domain(self, domains_data):
+        """
+        Check the content of domain file is valid or not for the following
+        errors:
+
+        * Lack of Domain.
+        * Domain is not unique.
+        * Subdomain lack of parent.
+        * Domain and Parent do not match.
+        * Duplicated domain or subdomain name
+        * Unknown parent domain name
+        """
+        names = set()
+        for block_num, (lines, _typ, block) in enumerate(domains_data):
+            start = min(min(i) for i in lines.values())
+            domain = block.get("DOMAIN")
+            if domain is None:
+                self.error(DOMAINS, start,
+                           "Lack of DOMAIN in block %s" % block_num)
                 continue
-            else:
-                parent = block.get("PARENT")[0].strip()
+            elif len(domain) > 1:
+                self.error(DOMAINS, lines["DOMAIN"][1],
+                           "Multi domain names: %s defined in a block"
+                           % domain)
+                continue
+
+            domain = domain[0]
+            lineno = lines["DOMAIN"][0]
+            if domain in names:
+                self.error(DOMAINS, lineno,
+                           "Duplicated domain name: %s" % domain)
+                continue
+            names.add(domain)
+
+            if '/' in domain:
+                if "PARENT" not in block:
+                    self.error(DOMAINS, lineno,
+                               "Lack of parent for domain %s" % domain)
+                    continue
+                parent = block["PARENT"][0].strip()
                 domainname = domain.split('/')[0].strip()
                 if parent != domainname:
-                    error('(DOMAINS): DOMAIN "%s" and Parent "%s" do not match'
-                          % (domainname, parent))
+                    self.error(DOMAINS, lines["PARENT"][0],
+                               'DOMAIN "%s" and Parent "%s" do not match'
+                               % (domainname, parent))
                     continue
                 if parent not in names:
-                    error("(DOMAINS): Unknown parent domain name: %s" % parent)
+                    self.error(DOMAINS, lines["PARENT"][0],
+                               "Unknown parent domain name: %s" % parent)
                     continue
 
-        for role, val in block.items():
-            if role in ROLES:
-                for user in val:
-                    check_user(user, "DOMAINS")
-    return names
+            self.check_roles(DOMAINS, lines, block)
+        return names
+
+    def check_gittree(self, trees_data, domains):
+        """
+        Check the content of git-tree file is valid or not for the
+        following errors:
+
+        * Lack of Domain.
+        * Domain is not unique.
+        * Lack of Tree Path.
+        * Tree Path is not unique.
+        * Duplicated git path
+        * Unknown domain name
+        """
+        pathes = set()
+
+        for block_num, (lines, _typ, block) in enumerate(trees_data):
+            start = min(min(i) for i in lines.values())
+            tree = block.get("TREE")
+            if tree is None:
+                self.error(TREE, start,
+                           "Lack of TREE PATH in block %s" % block_num)
+                continue
+            elif len(tree) > 1:
+                self.error(TREE, lines["TREE"][1],
+                           "Multi tree pathes: %s defined in a block" % tree)
+                continue
+            tree = tree[0]
+            # Intentionally rejected, the old checker never recorded seen
+            # paths and let duplicated ones through
+            if tree in pathes:
+                self.error(TREE, lines["TREE"][0],
+                           "Duplicated git path: %s" % tree)
+                continue
+            pathes.add(tree)
 
+            domain = block.get("DOMAIN")
+            if domain is None:
+                self.error(TREE, start,
+                           "Lack of DOMAIN for git tree %s" % tree)
+                continue
+            elif len(domain) > 1:
+                self.error(TREE, lines["DOMAIN"][1],
+                           "Multi DOMAIN defined for git tree %s" % tree)
+                continue
+            domain = domain[0]
+            if domain not in domains:
+                self.error(TREE, lines["DOMAIN"][0],
+                           "Unknown domain name: %s" % domain)
+                continue
 
-def check_gittree(trees_data, domains):
-    """
-    Check the content of git-tree file is valid or not for the following errors:
-
-    * Lack of Domain.
-    * Domain is not unique.
-    * Lack of Tree Path.
-    * Tree Path is not unique.
-    * Duplicated git path
-    * Unknown domain name
-    """
-    pathes = set()
-
-    for block_num, (_typ, block) in enumerate(trees_data):
-        tree = block.get("TREE")
-        if tree is None:
-            error("(TREE): Lack of TREE PATH in block %s" % block_num)
-            continue
-        elif len(tree) > 1:
-            error("(TREE): Multi tree pathes: %s defined in a block" % tree)
-            continue
-        tree = tree[0]
-        if tree in pathes:
-            error("(TREE): Duplicated git path: %s" % tree)
-            continue
-
-        domain = block.get("DOMAIN")
-        if domain is None:
-            error("(TREE): Lack of DOMAIN for git tree %s" % tree)
-            continue
-        elif len(domain) > 1:
-            error("(TREE): Multi DOMAIN defined for git tree %s" % tree)
-            continue
-        domain = domain[0]
-        if domain not in domains:
-            error("(TREE): Unknown domain name: %s" % domain)
-            continue
+            self.check_roles(TREE, lines, block)
 
+    def check_roles(self, source, lines, block):
+        "Check users of all roles in a block"
         for role, val in block.iteritems():
             if role in ROLES:
-                for user in val:
-                    check_user(user, "TREE")
+                for lineno, user in zip(lines[role], val):
+                    self.check_user(user, source, lineno)
+
+    def check_user(self, ustring, source, lineno=0):
+        """
+        Check user string is valid or not.
+        ERROR: The email of user is blank or invalid.
+        Returns 1 if it's invalid, 0 otherwise.
+        """
+        if ustring not in self._users:
+            try:
+                parse_user(ustring, True)
+            except ValueError as err:
+                self._users[ustring] = err.args[0]
+            else:
+                self._users[ustring] = None
+        message = self._users[ustring]
+        if message:
+            self.error(source, lineno, message)
+            return 1
+        return 0
 
 
-def check_user(ustring, data_typ):
+def check_scm(domain_str, gittree_str):
     """
-    Check user string is valid or not.
-    ERROR: The email of user is blank or invalid.
+    check domain and gittree file.
+    Returns list of errors, empty list means everything is ok.
     """
-    try:
-        parse_user(ustring, True)
-    except ValueError as err:
-        error("(%s): %s" % (data_typ, err))
-        return 1
-    return 0
+    return Linter().check_scm(domain_str, gittree_str)
@@ -0,0 +1,110 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+"""
+Fingerprints of imported data.
+
+Digests of each piece of data (block of scm data, repodata of a target
+etc.) from the last import are stored in ImportDigest. Comparing them
+with digests of new data tells which pieces changed, so that import
+can be skipped or limited to the entities of the changed pieces.
+"""
+import os
+import hashlib
+
+from iris.core.models import ImportDigest
+
+# sources of digests stored by scm imports and snapshot imports of a product
+SCM = 'scm'
+SNAPSHOT = 'snapshot:%s'
+
+# models loaded by scm imports
+SCM_MODELS = ('Domain', 'SubDomain', 'GitTree', 'License',
+              'DomainRole', 'SubDomainRole', 'GitTreeRole')
+
+
+def fingerprint(*parts):
+    """
+    Returns sha1 hex digest of unicode or str `parts`
+    """
+    sha1 = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, unicode):
+            part = part.encode('utf8')
+        sha1.update(part)
+        sha1.update('\0')
+    return sha1.hexdigest()
+
+
+def file_digest(*paths):
+    """
+    Returns sha1 hex digest of contents of files in `paths`, files which
+    don't exist are skipped
+    """
+    sha1 = hashlib.sha1()
+    for path in paths:
+        if not os.path.isfile(path):
+            continue
+        sha1.update(os.path.basename(path))
+        with open(path, 'rb') as reader:
+            for chunk in iter(lambda: reader.read(65536), ''):
+                sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class Digests(object):
+    """
+    Digests stored by the last import of `source`
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.stored = dict(ImportDigest.objects.filter(
+            source=source).values_list('key', 'digest'))
+
+    def changed(self, digests):
+        """
+        Returns keys of added, removed and changed ones in `digests`
+        """
+        return {key for key in set(self.stored) | set(digests)
+                if self.stored.get(key) != digests.get(key)}
+
+    def save(self, digests):
+        """
+        Replace stored digests with new `digests`
+        """
+        changed = self.changed(digests)
+        if not changed:
+            return
+        changed = sorted(changed)
+        for i in range(0, len(changed), 500):
+            ImportDigest.objects.filter(
+                source=self.source, key__in=changed[i:i + 500]).delete()
+        ImportDigest.objects.bulk_create([
+            ImportDigest(source=self.source, key=key, digest=digests[key])
+            for key in changed if key in digests])
+        self.stored = dict(digests)
+
+
+def forget(source):
+    """
+    Forget stored digests of `source`, so that the next import loads
+    all data. It should be called when data is imported without digests.
+    """
+    ImportDigest.objects.filter(source=source).delete()
+
+
+def forget_edited(obj, products=()):
+    """
+    Forget digests of imports loading `obj` after it's edited outside
+    imports, so that the next import overwrites the edit as a full import
+    does. `products` are names of products whose snapshots load it.
+    """
+    if obj._meta.object_name in SCM_MODELS:
+        forget(SCM)
+    for product in products:
+        forget(SNAPSHOT % product)
@@ -13,10 +13,16 @@ many relationships into database.
 It will check if some entity or relationship exists in db, and
 call create/update/delete for entity and add/remove for relationship
 to make records in db are all the same as given data.
+
+Changes are made in the caller's transaction by default. If `chunk_size`
+is given, they are made in small transactions of that many changes in
+order of keys, so other writers never wait for the loader for long.
 """
 from collections import defaultdict
 import logging
 
+from django.db import transaction
+
 # pylint: disable=W0142,C0103,W0511,R0914,R0912
 # W0142: Used * or ** magic
 # C0103: Invalid name "x"
@@ -89,6 +95,11 @@ class Loader(object):
     PK = {}
     CKEY = {}
     NNM = defaultdict(dict)
+    # number of rows created, updated, deleted, added and removed
+    rows = 0
+
+    def __init__(self, chunk_size=None):
+        self.chunk_size = chunk_size
 
     def register_entity(self, model, ckey, pk='id'):
         """
@@ -107,17 +118,22 @@ class Loader(object):
         """
         self.NNM[mname(model1)][mname(model2)] = manager
 
-    def sync_entity(self, left, model):
+    def sync_entity(self, left, model, scope=None):
         """
         Sync entity of `model`
+
+        If `scope` is given, only entities for which it returns True
+        are synced, others in data and database are left alone.
         """
         ckey = self.CKEY[mname(model)]
         cols = left[0].keys() if left else ckey
         ukey = tuple(set(cols) - set(ckey) - {'pk'})
 
+        left = [i for i in left if scope(i)] if scope else left
         left.sort(key=lambda x: getk(x, ckey))
         # FIXME: select_related
-        right = list(model.objects.all().values('pk', *cols))
+        right = [i for i in model.objects.all().values('pk', *cols)
+                 if not scope or scope(i)]
         # must using python's sort not sql's order_by here, since order
         # of UPPER and lower letters may be differnet in python and sql
         right.sort(key=lambda x: getk(x, ckey))
@@ -126,26 +142,22 @@ class Loader(object):
         log.info('Sync {:>20} +{:<5} -{:<5} U{:<5}'.format(
                  model.__name__, len(lonly), len(ronly), len(diff)))
 
-        for i in self._shrink(lonly):
-            model(**i).save()
-        for i in self._shrink(diff):
-            model(**i).save()
+        def save(item):
+            """create or update an entity"""
+            model(**item).save()
 
-        def delete():
-            """
-            Since Django provide casacading deletion. For example, if delete
-            a subdomain entity here, all its gittrees, packages and roles
-            will all be deleted automatically. However sometimes it will have
-            side-effect, if we rename a subdomain'name, its gittrees don't
-            need to be deleted, just need to be updated. So we returns the
-            delete function to caller to decide when to invoke.
-            """
-            model.objects.filter(pk__in=[i['pk'] for i in ronly]).delete()
-        return delete
+        self._apply(self._shrink(lonly), save)
+        self._apply(self._shrink(diff), save)
+        self.rows += len(lonly) + len(diff)
 
-    def sync_nnr(self, data, model1, model2, remove=True):
+        return self._deleter(model, [i['pk'] for i in ronly])
+
+    def sync_nnr(self, data, model1, model2, remove=True, scope=None):
         """
         Sync many to many relationship between `model1` and `model2`
+
+        If `scope` is given, only relationships of `model1` entities for
+        which it returns True are synced.
         """
         ckey1, ckey2 = self.CKEY[mname(model1)], self.CKEY[mname(model2)]
         if data:
@@ -155,11 +167,12 @@ class Loader(object):
         ckey = ckey1 + ckey2
         nnm_name = self.NNM[mname(model1)][mname(model2)]
 
-        left = [dict(i, **j) for i, j in data]
+        left = [dict(i, **j) for i, j in data if not scope or scope(i)]
         left.sort(key=lambda x: getk(x, ckey))
 
         right = [dict(i, **j)
                  for i in model1.objects.all().values('pk', *cols1)
+                 if not scope or scope(i)
                  for j in getattr(model1.objects.get(pk=i.pop('pk')),
                                   nnm_name).all().values(*cols2)]
         right.sort(key=lambda x: getk(x, ckey))
@@ -194,11 +207,61 @@ class Loader(object):
             if pk1 and pk2:
                 todel[pk1].append(pk2)
 
-        for pk1, pk2s in toadd.items():
-            getattr(model1(pk=pk1), nnm_name).add(*pk2s)
+        def add(item):
+            """add relationships of one entity"""
+            pk1, pk2s = item
+            getattr(model1(pk=pk1), nnm_name).add(*sorted(pk2s))
+
+        def delete(item):
+            """remove relationships of one entity"""
+            pk1, pk2s = item
+            getattr(model1(pk=pk1), nnm_name).remove(*sorted(pk2s))
+
+        self._apply(sorted(toadd.items()), add)
+        self.rows += sum(len(i) for i in toadd.values())
         if remove:
-            for pk1, pk2s in todel.items():
-                getattr(model1(pk=pk1), nnm_name).remove(*pk2s)
+            self._apply(sorted(todel.items()), delete)
+            self.rows += sum(len(i) for i in todel.values())
+
+    def _deleter(self, model, pks):
+        """
+        Since Django provide casacading deletion. For example, if delete
+        a subdomain entity here, all its gittrees, packages and roles
+        will all be deleted automatically. However sometimes it will have
+        side-effect, if we rename a subdomain'name, its gittrees don't
+        need to be deleted, just need to be updated. So we returns the
+        delete function to caller to decide when to invoke.
+        """
+        pks = sorted(pks)
+
+        def delete():
+            """delete entities of `pks`"""
+            if self.chunk_size:
+                self._apply(
+                    [pks[i:i + self.chunk_size]
+                     for i in range(0, len(pks), self.chunk_size)],
+                    lambda chunk: model.objects.filter(pk__in=chunk).delete(),
+                    1)
+            else:
+                model.objects.filter(pk__in=pks).delete()
+            self.rows += len(pks)
+        return delete
+
+    def _apply(self, items, func, chunk_size=None):
+        """
+        Call `func` for each of `items`. If loader is chunked, they are
+        called in transactions of `chunk_size` (default self.chunk_size)
+        items each.
+        """
+        chunk_size = chunk_size or self.chunk_size
+        if not chunk_size:
+            for item in items:
+                func(item)
+            return
+        for start in range(0, len(items), chunk_size):
+            with transaction.atomic():
+                for item in items[start:start + chunk_size]:
+                    func(item)
 
     def _shrink_to_pk(self, data, cgroup=None, model=None):
         '''
@@ -249,9 +312,13 @@ class Loader(object):
         and this in the second step:
             gitpath, subdomain__pk
         then it can be used to save, since there isn't reference field.
+
+        Returns list of new dicts if items are records, which can't be
+        changed.
         """
         if not data:
             return data
+        data = [i if isinstance(i, dict) else dict(i) for i in data]
 
         def _group_columns(cols):
             """group cols by model name"""
@@ -277,14 +344,23 @@ class Loader(object):
         return data
 
 
-def get_default_loader():
-    """Get a default loader instance for IRIS models"""
+def get_default_loader(chunk_size=None, staging=False):
+    """
+    Get a default loader instance for IRIS models, StagingLoader is
+    used if `staging` is set, it can't be chunked.
+    """
     from django.contrib.auth.models import User
     from iris.core.models import (
         Domain, SubDomain, GitTree, Package, Product, Image, License,
         DomainRole, SubDomainRole, GitTreeRole,
         )
-    loader = Loader()
+    if staging:
+        if chunk_size:
+            raise ValueError('Staging loader can not be chunked')
+        from iris.etl.staging import StagingLoader
+        loader = StagingLoader()
+    else:
+        loader = Loader(chunk_size)
     loader.register_entity(User, 'email')
 
     loader.register_entity(Domain, 'name')
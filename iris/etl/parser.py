@@ -17,6 +17,8 @@ from xml.dom import minidom
 
 from django.core.validators import validate_email, ValidationError
 
+from iris.etl.records import Interner
+
 
 ADDRESS = re.compile(r'((.*?)<(.*?)>)|(.*@.*)')
 
@@ -146,42 +148,55 @@ def parse_blocks(content, mapping=()):
 'Parent': ['SCM']}), \
 ('Tree', {'Maintainer': ['Bob@a.com'], 'Domain': ['SCM / BB'], \
 'Tree': ['scm/meta/git']})]
+    """
+    return [(typ, item) for _lines, typ, item in iter_blocks(content, mapping)]
+
+
+class ParseError(ValueError):
+    """Error of scm text with number of the line where it's found"""
+    def __init__(self, lineno, message):
+        super(ParseError, self).__init__(message)
+        self.lineno = lineno
+
+
+def iter_blocks(content, mapping=()):
+    """
+    Generator yields (lines, type, block) for each block of scm text,
+    the same as parse_blocks(). `lines` maps each field of the block to
+    the numbers of lines where its values are, in the order of values.
+
+    Equal values, such as user strings of many blocks, are shared.
     """
     if not content.strip():
-        raise ValueError("Content must be not empty")
-    # add \n\n at the end to close the last block which simplify parsing code
-    content = ''.join([content, os.linesep, os.linesep])
+        raise ParseError(0, "Content must be not empty")
     mapping = dict(mapping or ())
+    intern_ = Interner()
 
-    def parse_kv(line):
+    def parse_kv(lineno, line):
         try:
             mark, val = line.split(':', 1)
         except ValueError:
-            raise ValueError("Can't find colon(:) at line: %s" % line)
+            raise ParseError(lineno, "Can't find colon(:) at line: %s" % line)
         mark, val = mark.strip(), val.strip()
-        field = mapping.get(mark, mark)
-        return field, val
+        field = mapping.get(mark) or intern_(mark)
+        return field, intern_(val)
 
-    res = []
-    state = 0
-    typ, item = None, None
-    for line in content.splitlines():
+    typ, item, lines = None, None, None
+    # an empty line at the end closes the last block
+    for lineno, line in enumerate(content.splitlines() + [''], 1):
         line = line.rstrip()
-        if state == 0 and line:
-            state = 1
-            field, val = parse_kv(line)
+        if line and item is None:
+            field, val = parse_kv(lineno, line)
             typ = field
             item = {field: [val]}
-        elif state == 1 and line:
-            field, val = parse_kv(line)
-            if field in item:
-                item[field].append(val)
-            else:
-                item[field] = [val]
-        elif state == 1 and not line:
-            state = 0
-            res.append((typ, item))
-    return res
+            lines = {field: [lineno]}
+        elif line:
+            field, val = parse_kv(lineno, line)
+            item.setdefault(field, []).append(val)
+            lines.setdefault(field, []).append(lineno)
+        elif item is not None:
+            yield lines, typ, item
+            typ, item, lines = None, None, None
 
 
 def parse_xml(file_path, node):
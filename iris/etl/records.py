@@ -0,0 +1,75 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+"""
+Compact rows of transformed scm data.
+
+A full import has hundreds of thousands of rows. Each of them as a dict
+of long keys such as 'subdomain__domain__name' costs several hundred
+bytes, a record is a tuple of references to shared, interned strings.
+Records can be read like dicts, so Loader handles both.
+"""
+from collections import namedtuple
+
+# pylint: disable=W0232,E1101,C0103
+# W0232: Class has no __init__ method
+# E1101: Instance of 'Record' has no '_fields' member
+# C0103: Invalid name of record class
+
+
+def record(name, fields):
+    """
+    Returns a namedtuple class whose instances can also be read like
+    dicts of `fields`: item['name'], item.keys() and dict(item) work.
+    """
+    base = namedtuple(name, fields)
+
+    class Record(base):
+        "namedtuple readable as dict"
+        __slots__ = ()
+
+        def keys(self):
+            "names of fields"
+            return list(self._fields)
+
+        def __getitem__(self, key):
+            if isinstance(key, basestring):
+                return getattr(self, key)
+            return base.__getitem__(self, key)
+
+    Record.__name__ = name
+    return Record
+
+
+class Interner(dict):
+    """
+    Returns one shared copy of equal strings.
+
+    Builtin intern() only accepts str, this works for unicode too. Each
+    import uses its own interner, so nothing is kept after it's done.
+    """
+
+    def __call__(self, value):
+        return self.setdefault(value, value)
+
+
+Domain = record('Domain', 'name')
+SubDomain = record('SubDomain', 'name domain__name')
+GitTree = record('GitTree', 'gitpath subdomain__name subdomain__domain__name')
+GitTreeKey = record('GitTreeKey', 'gitpath')
+License = record('License', 'shortname')
+User = record('User', 'email first_name last_name username')
+UserKey = record('UserKey', 'email')
+
+DomainRole = record('DomainRole', 'role domain__name name')
+DomainRoleKey = record('DomainRoleKey', 'role domain__name')
+SubDomainRole = record(
+    'SubDomainRole', 'role subdomain__name subdomain__domain__name name')
+SubDomainRoleKey = record(
+    'SubDomainRoleKey', 'role subdomain__name subdomain__domain__name')
+GitTreeRole = record('GitTreeRole', 'role gittree__gitpath name')
+GitTreeRoleKey = record('GitTreeRoleKey', 'role gittree__gitpath')
@@ -20,16 +20,29 @@ Data is available from:
 # C0103: Invalid name "uc"
 # W0142: Used * or ** magic
 import os
+import json
+import logging
+from collections import defaultdict
+
+from django.conf import settings
+from django.db.models import Q
 from django.contrib.auth.models import User
 
 from iris.core.models import (
-    Domain, SubDomain, GitTree, License,
+    Domain, SubDomain, GitTree, License, ProductGraph,
     DomainRole, SubDomainRole, GitTreeRole)
 from iris.core.models.user import roles as role_choices
-from iris.core.injectors import inject_user_getters
+from iris.core.models.user import UserProfile
+from iris.core.profiling import PhaseProfiler
+from iris.core.retry import retry_atomic
 
+from iris.etl import records
 from iris.etl.parser import parse_blocks, UserCache
+from iris.etl.records import Interner
 from iris.etl.loader import get_default_loader
+from iris.etl.digest import Digests, fingerprint, forget, SCM
+
+log = logging.getLogger(__name__)
 
 
 MAPPING = {
@@ -51,6 +64,10 @@ ROLES = {i for i, _ in role_choices()}
 
 NONAME = 'Uncategorized'
 
+# source of stored digests, and key of the digest of whole data
+DIGESTS = SCM
+WHOLE = ''
+
 
 def parse_name(name):
     """parse domain name and subdomain name from the given name
@@ -63,6 +80,52 @@ def parse_name(name):
     return parts
 
 
+def tree_domain(data):
+    """get domain name and subdomain name of a tree item
+    """
+    no_domain = ' / '.join([NONAME, NONAME])
+    # if DOMAIN exists it must only have one value
+    name = data.get('DOMAIN', [no_domain])[0] or no_domain
+    if ' / ' not in name:
+        name = ' / '.join([name, NONAME])
+    return name.split(' / ', 1)
+
+
+def block_digests(rawdata):
+    """
+    Fingerprint scm data by domain and tree, blocks of a domain and
+    its subdomains are fingerprinted together
+    """
+    blocks = defaultdict(list)
+    for typ, data in rawdata:
+        if typ == 'DOMAIN':
+            name = data['DOMAIN'][0]
+            if 'PARENT' in data:
+                name = parse_name(name)[0]
+            key = u'DOMAIN:%s' % name
+        elif typ == 'TREE':
+            key = u'TREE:%s' % data['TREE'][0]
+        else:
+            continue
+        blocks[key].append(json.dumps(data, sort_keys=True))
+    return {key: fingerprint(*parts) for key, parts in blocks.items()}
+
+
+def changed_names(rawdata, changed):
+    """
+    Get names of domains and paths of trees of changed blocks, trees
+    belonging to changed domains are included
+    """
+    domains, trees = set(), set()
+    for key in changed:
+        typ, name = key.split(':', 1)
+        (domains if typ == 'DOMAIN' else trees).add(name)
+    for typ, data in rawdata:
+        if typ == 'TREE' and tree_domain(data)[0] in domains:
+            trees.add(data['TREE'][0])
+    return domains, trees
+
+
 def build_user_cache(rawdata):
     """
     Go over all scm data to build a full UserCache
@@ -87,41 +150,63 @@ def subrolename(role, dname, sname):
     return '%s: %s-%s' % (role, dname, sname)
 
 
+def user_keys(uc):
+    """
+    Returns function getting the shared key record of a user string,
+    None if it's not a valid user
+    """
+    keys = {}
+
+    def get(ustring):
+        """key record of user string"""
+        user = uc.get(ustring)
+        if not user:
+            return None
+        email = user['email']
+        if email not in keys:
+            keys[email] = records.UserKey(email)
+        return keys[email]
+    return get
+
+
 def transform_domains(rawdata, uc):
     """
     Transform to Domain, SubDomain,
     DomainRole, SubDomainRole,
     DomainRole.user_set and SubDomainRole.user_set
+
+    Rows are records of iris.etl.records, a role and its users share one
+    key record, and names split from the same string are shared.
     """
-    domains, subdomains = [{'name': NONAME}], []
+    intern_ = Interner()
+    user_key = user_keys(uc)
+    domains, subdomains = [records.Domain(NONAME)], []
     domainroles, subdomainroles = [], []
     domainrole_users, subdomainrole_users = [], []
 
     def _trans_subdomain(data):
         """transform subdomain item"""
-        dname, sname = parse_name(data['DOMAIN'][0])
-        subdomains.append({'name': sname, 'domain__name': dname})
+        dname, sname = [intern_(i) for i in parse_name(data['DOMAIN'][0])]
+        subdomains.append(records.SubDomain(sname, dname))
         for role in ROLES & set(data.keys()):
-            sr = {'role': role,
-                  'subdomain__name': sname,
-                  'subdomain__domain__name': dname}
-            subdomainroles.append(
-                dict(sr, name=subrolename(role, dname, sname)))
+            sr = records.SubDomainRoleKey(role, sname, dname)
+            subdomainroles.append(records.SubDomainRole(
+                role, sname, dname, subrolename(role, dname, sname)))
             for ustring in data[role]:
-                user = uc.get(ustring)
+                user = user_key(ustring)
                 if user:
                     subdomainrole_users.append((sr, user))
 
     def _trans_domain(data):
         """transform domain item"""
-        name = data['DOMAIN'][0]
-        domains.append({'name': name})
+        name = intern_(data['DOMAIN'][0])
+        domains.append(records.Domain(name))
         for role in ROLES & set(data.keys()):
-            dr = {'role': role,
-                  'domain__name': name}
-            domainroles.append(dict(dr, name=rolename(role, name)))
+            dr = records.DomainRoleKey(role, name)
+            domainroles.append(
+                records.DomainRole(role, name, rolename(role, name)))
             for ustring in data[role]:
-                user = uc.get(ustring)
+                user = user_key(ustring)
                 if user:
                     domainrole_users.append((dr, user))
 
@@ -136,7 +221,7 @@ def transform_domains(rawdata, uc):
 
     # Uncategorized Subdomain
     for domain in domains:
-        subdomains.append({'name': NONAME, 'domain__name': domain['name']})
+        subdomains.append(records.SubDomain(NONAME, domain.name))
     return (domains, subdomains,
             domainroles, subdomainroles,
             domainrole_users, subdomainrole_users)
@@ -147,31 +232,31 @@ def transform_trees(rawdata, uc):
     Transform to GitTree, GitTree.licenses
     GitTreeRole, GitTreeRole.user_set
     """
+    intern_ = Interner()
+    user_key = user_keys(uc)
+    licenses = {}
     trees, tree_licenses = [], []
     treeroles, treerole_users = [], []
-    no_domain = ' / '.join([NONAME, NONAME])
     for typ, data in rawdata:
         if typ != 'TREE':
             continue
         path = data['TREE'][0]
-        # if DOMAIN exists it must only have one value
-        name = data.get('DOMAIN', [no_domain])[0] or no_domain
-        if ' / ' not in name:
-            name = ' / '.join([name, NONAME])
-        dname, sname = name.split(' / ', 1)
-        trees.append({'gitpath': path,
-                      'subdomain__name': sname,
-                      'subdomain__domain__name': dname})
-
-        for licen in data.get('LICENSES', ()):
-            tree_licenses.append(({'gitpath': path}, {'shortname': licen}))
+        dname, sname = [intern_(i) for i in tree_domain(data)]
+        trees.append(records.GitTree(path, sname, dname))
+
+        if 'LICENSES' in data:
+            tree = records.GitTreeKey(path)
+            for licen in data['LICENSES']:
+                if licen not in licenses:
+                    licenses[licen] = records.License(licen)
+                tree_licenses.append((tree, licenses[licen]))
 
         for role in ROLES & set(data.keys()):
-            tr = {'role': role,
-                  'gittree__gitpath': path}
-            treeroles.append(dict(tr, name=rolename(role, path)))
+            tr = records.GitTreeRoleKey(role, path)
+            treeroles.append(
+                records.GitTreeRole(role, path, rolename(role, path)))
             for ustring in data[role]:
-                user = uc.get(ustring)
+                user = user_key(ustring)
                 if user:
                     treerole_users.append((tr, user))
     return (trees, tree_licenses,
@@ -186,10 +271,11 @@ def transform_users(ucusers):
     correct value of this field is stored in LDAP server, we can't
     get it here, so we use email as username when importing data.
     """
-    return [dict(username=i['email'], **i) for i in ucusers]
+    return [records.User(username=i['email'], **i) for i in ucusers]
 
 
-def from_string(scm_str, coding='utf8'):
+def from_string(scm_str, coding='utf8', profiler=None, chunk_size=None,
+                staging=None, incremental=False):
     """
     Import scm data from string.
 
@@ -197,47 +283,130 @@ def from_string(scm_str, coding='utf8'):
     """
     if isinstance(scm_str, str):
         scm_str = scm_str.decode(coding)
-    return from_unicode(scm_str)
+    return from_unicode(scm_str, profiler, chunk_size, staging, incremental)
 
 
-def from_unicode(scm_unicode):
+def from_unicode(scm_unicode, profiler=None, chunk_size=None, staging=None,
+                 incremental=False, rawdata=None):
     """
     Import scm data from unicode string.
 
     Strings return from Django model are all unicode. So it will be much
     easier to only deal with unicode string.
+
+    Each phase is measured if a PhaseProfiler is given. If `chunk_size`
+    is given, changes are committed in chunks of that size instead of
+    in caller's transaction. If `staging` is set, data are loaded by
+    set-based sql through staging tables, it defaults to setting
+    IRIS_SCM_STAGING.
+
+    If `incremental` is set, digests of data blocks are compared with the
+    ones stored by the last incremental import. Nothing is done if data
+    doesn't change, otherwise only entities of changed blocks are synced.
+    Returns False if import is skipped, otherwise True.
+
+    `rawdata` is parse_blocks() result of `scm_unicode` if it has been
+    parsed already, e.g. by check.Linter.
     """
+    profiler = profiler or PhaseProfiler(enabled=False)
+    phase = profiler.phase
+
+    if incremental:
+        digests = Digests(DIGESTS)
+        whole = fingerprint(scm_unicode)
+        if digests.stored and digests.stored.get(WHOLE) == whole:
+            log.info('Skip unchanged scm data')
+            return False
+    else:
+        forget(DIGESTS)
+
     # 1.parse
-    rawdata = parse_blocks(scm_unicode, MAPPING)
+    if rawdata is None:
+        with phase('parse'):
+            rawdata = parse_blocks(scm_unicode, MAPPING)
+
+    scoped, dnames, paths = False, set(), set()
+    if incremental:
+        with phase('digest'):
+            blocks = block_digests(rawdata)
+            blocks[WHOLE] = whole
+            changed = digests.changed(blocks) - {WHOLE}
+        if digests.stored and not changed:
+            digests.save(blocks)
+            log.info('Skip unchanged scm blocks')
+            return False
+        # the first incremental import syncs everything
+        scoped = bool(digests.stored)
+        if scoped:
+            dnames, paths = changed_names(rawdata, changed)
+            log.info('Sync changed domains: %s, trees: %s',
+                     len(dnames), len(paths))
+
+    def within(key, names):
+        """entities whose `key` is in `names`"""
+        if not scoped:
+            return None
+        return lambda item: item[key] in names
 
     # 2.extract and transform
-    uc = build_user_cache(rawdata)
-    users = transform_users(uc.all())
+    with phase('user cache'):
+        uc = build_user_cache(rawdata)
+    with phase('transform'):
+        users = transform_users(uc.all())
 
-    (domains, subdomains,
-     domainroles, subdomainroles,
-     domainrole_users, subdomainrole_users,
-     ) = transform_domains(rawdata, uc)
+        (domains, subdomains,
+         domainroles, subdomainroles,
+         domainrole_users, subdomainrole_users,
+         ) = transform_domains(rawdata, uc)
 
-    (trees, tree_licenses,
-     treeroles, treerole_users,
-     ) = transform_trees(rawdata, uc)
+        (trees, tree_licenses,
+         treeroles, treerole_users,
+         ) = transform_trees(rawdata, uc)
 
 
     # 3.load
-    loader = get_default_loader()
-    loader.sync_entity(users, User)
-    delete_domains = loader.sync_entity(domains, Domain)
-    delete_subdomains = loader.sync_entity(subdomains, SubDomain)
-    delete_domainroles = loader.sync_entity(domainroles, DomainRole)
-    delete_subdomainroles = loader.sync_entity(subdomainroles, SubDomainRole)
-    delete_trees = loader.sync_entity(trees, GitTree)
-    delete_treeroles = loader.sync_entity(treeroles, GitTreeRole)
-
-    loader.sync_nnr(domainrole_users, DomainRole, User)
-    loader.sync_nnr(subdomainrole_users, SubDomainRole, User)
-    loader.sync_nnr(tree_licenses, GitTree, License)
-    loader.sync_nnr(treerole_users, GitTreeRole, User)
+    if staging is None:
+        staging = settings.IRIS_SCM_STAGING
+    loader = get_default_loader(chunk_size, staging)
+    rows = lambda: loader.rows
+
+    def sync_entity(data, model, scope=None):
+        with phase('sync_entity %s' % model.__name__, rows):
+            delete = loader.sync_entity(data, model, scope)
+
+        def _delete():
+            with phase('delete %s' % model.__name__, rows):
+                delete()
+        return _delete
+
+    def sync_nnr(data, model1, model2, scope=None):
+        with phase('sync_nnr %s-%s' % (model1.__name__, model2.__name__),
+                   rows):
+            loader.sync_nnr(data, model1, model2, scope=scope)
+
+    sync_entity(users, User)
+    delete_domains = sync_entity(
+        domains, Domain, within('name', dnames))
+    delete_subdomains = sync_entity(
+        subdomains, SubDomain, within('domain__name', dnames))
+    delete_domainroles = sync_entity(
+        domainroles, DomainRole, within('domain__name', dnames))
+    delete_subdomainroles = sync_entity(
+        subdomainroles, SubDomainRole,
+        within('subdomain__domain__name', dnames))
+    delete_trees = sync_entity(
+        trees, GitTree, within('gitpath', paths))
+    delete_treeroles = sync_entity(
+        treeroles, GitTreeRole, within('gittree__gitpath', paths))
+
+    sync_nnr(domainrole_users, DomainRole, User,
+             within('domain__name', dnames))
+    sync_nnr(subdomainrole_users, SubDomainRole, User,
+             within('subdomain__domain__name', dnames))
+    sync_nnr(tree_licenses, GitTree, License,
+             within('gitpath', paths))
+    sync_nnr(treerole_users, GitTreeRole, User,
+             within('gittree__gitpath', paths))
 
     delete_treeroles()
     delete_subdomainroles()
@@ -246,47 +415,73 @@ def from_unicode(scm_unicode):
     delete_subdomains()
     delete_domains()
 
+    # trees of products may be moved, renamed or deleted
+    with phase('product graphs'):
+        ProductGraph.objects.rebuild_all()
+
+    if incremental:
+        digests.save(blocks)
+    return True
+
 
-def from_file(dfile, tfile):
+def from_file(dfile, tfile, profiler=None, chunk_size=None, staging=None,
+              incremental=False):
     """
     import scm data from file.
     `dfile` and `tfile` should be file objects not file names.
     """
     return from_string(''.join([dfile.read(),
                                 os.linesep, os.linesep,
-                                tfile.read()]))
+                                tfile.read()]),
+                       profiler=profiler, chunk_size=chunk_size,
+                       staging=staging, incremental=incremental)
 
 
-def merge_users(email):
+def merge_users(email, user=None):
     """merge the scm user into ldap user
+
+    Roles and submissions of the scm user are moved to the ldap user by
+    a few bulk updates. If the ldap `user` is given, it's marked as merged
+    for this email in its profile, and it won't be checked again.
     """
     if not email:
         return
 
+    mark = user is not None
+    if mark and UserProfile.objects.filter(
+            user=user, merged_email=email).exists():
+        return
+    _merge_users(email, mark)
+
+
+@retry_atomic()
+def _merge_users(email, mark):
+    """merge the scm user into ldap user in a transaction
+    """
     # get the user which is from LDAP
     users = User.objects.filter(email=email).exclude(username=email)
-
-    def updata_role(role, old, new):
-        role.user_set.remove(old)
-        role.user_set.add(new)
-
-    if len(users) == 1:
-        user = users[0]
-        # get the user which is from scm
-        try:
-            ur = User.objects.get(username=email)
-        except User.DoesNotExist:
-            return
-
-        if user.username != ur.email:
-            # merge it into ldap user then delete it
-            ogetter = inject_user_getters(ur)
-            for role in ogetter.get_domainroles():
-                updata_role(role, ur, user)
-            for role in ogetter.get_subdomainroles():
-                updata_role(role, ur, user)
-            for role in ogetter.get_gittreeroles():
-                updata_role(role, ur, user)
-            # merge submissions to ladp user
-            ur.submission_set.update(owner=user)
-            ur.delete()
+    if len(users) != 1:
+        return
+    user = users[0]
+
+    # get the user which is from scm
+    try:
+        ur = User.objects.get(username=email)
+    except User.DoesNotExist:
+        ur = None
+
+    if ur is not None:
+        # merge it into ldap user then delete it
+        through = User.groups.through
+        joined = list(through.objects.filter(
+            user=user).values_list('group_id', flat=True))
+        through.objects.filter(user=ur).filter(
+            Q(group__domainrole__isnull=False) |
+            Q(group__subdomainrole__isnull=False) |
+            Q(group__gittreerole__isnull=False)).exclude(
+                group__in=joined).update(user=user)
+        # merge submissions to ladp user
+        ur.submission_set.update(owner=user)
+        ur.delete()
+    if mark:
+        UserProfile.objects.filter(user=user).update(merged_email=email)
@@ -10,10 +10,13 @@
 Module for importing Product, Package, Image data into IRIS.
 """
 import os
+import glob
 import logging
 
-from iris.core.models import GitTree, Product, Package, Image
+from iris.core.models import GitTree, Product, ProductGraph, Package, Image
+from iris.core.profiling import PhaseProfiler
 from iris.etl.loader import get_default_loader
+from iris.etl.digest import Digests, file_digest, forget, SNAPSHOT
 from iris.etl.parser import (
     parse_buildxml, parse_trees_of_prod, parse_packages, parse_images
     )
@@ -28,10 +31,16 @@ from iris.etl.parser import (
 logger = logging.getLogger(__name__)
 
 
-def transform(prod, prod_path):
+BUILD_FILE = 'build.xml'
+REPO_DIR = 'repos/%s/packages/repodata/'
+IMAGE_FILE = 'builddata/images/%s/images.xml'
+TREE_DIR = 'builddata/manifest'
+
+
+def transform(prod, prod_path, changed=None):
     """transform data
     """
-    trees, pkgs, imgs = get_prod_data(prod_path)
+    trees, pkgs, imgs = get_prod_data(prod_path, changed)
 
     product_trees = [({'name': prod}, {'gitpath': gitpath})
                      for gitpath in trees]
@@ -51,40 +60,103 @@ def transform(prod, prod_path):
     return product_trees, packages, trees_packages, images
 
 
-def get_prod_data(prod_path):
+def get_prod_data(prod_path, changed=None):
     """get all prod data, include trees, images, packages
+
+    If `changed` is given, only files of keys in it are parsed.
     """
     packages = []
     images = []
-    build_file = os.path.join(prod_path, 'build.xml')
-    repo_file = os.path.join(prod_path, 'repos/%s/packages/repodata/')
-    image_file = os.path.join(prod_path, 'builddata/images/%s/images.xml')
-    tree_dir = os.path.join(prod_path, 'builddata/manifest')
+    trees = []
+    build_file = os.path.join(prod_path, BUILD_FILE)
+    repo_file = os.path.join(prod_path, REPO_DIR)
+    image_file = os.path.join(prod_path, IMAGE_FILE)
+    tree_dir = os.path.join(prod_path, TREE_DIR)
+    wanted = lambda key: changed is None or key in changed
 
     targets = parse_buildxml(build_file)
-    trees = parse_trees_of_prod(tree_dir)
+    if wanted(TREE_DIR):
+        trees = parse_trees_of_prod(tree_dir)
 
     for target in targets:
-        packages.extend(parse_packages(repo_file % target))
-        images.extend(parse_images(image_file % target, target))
+        if wanted(REPO_DIR % target):
+            packages.extend(parse_packages(repo_file % target))
+        if wanted(IMAGE_FILE % target):
+            images.extend(parse_images(image_file % target, target))
 
     return trees, packages, images
 
 
-def from_dir(prod, prod_path):
+def file_digests(prod_path):
+    """fingerprint manifest, and repodata and images of each target
+    """
+    digests = {}
+    tree_dir = os.path.join(prod_path, TREE_DIR)
+    digests[TREE_DIR] = file_digest(*sorted(
+        os.path.join(tree_dir, name) for name in os.listdir(tree_dir)))
+
+    for target in parse_buildxml(os.path.join(prod_path, BUILD_FILE)):
+        digests[REPO_DIR % target] = file_digest(*sorted(glob.glob(
+            os.path.join(prod_path, REPO_DIR % target, '*-primary.xml.gz'))))
+        digests[IMAGE_FILE % target] = file_digest(
+            os.path.join(prod_path, IMAGE_FILE % target))
+    return digests
+
+
+def from_dir(prod, prod_path, profiler=None, incremental=False):
     """
     Load snapshot related data into database, which includes project-trees
     relationship, trees-packages relationship and images.
+
+    Each phase is measured if a PhaseProfiler is given. ProductGraph of
+    the product is rebuilt at the end.
+
+    If `incremental` is set, only manifest, repodata and images files
+    which changed since the last incremental import are loaded, and
+    nothing is done if none changed. Returns False if import is skipped,
+    otherwise True.
     """
+    profiler = profiler or PhaseProfiler(enabled=False)
+    phase = profiler.phase
+
+    source = SNAPSHOT % prod
+    changed = None
+    if incremental:
+        digests = Digests(source)
+        with phase('digest'):
+            files = file_digests(prod_path)
+            changed = digests.changed(files)
+        if not changed:
+            logger.info('Skip unchanged snapshot of %s', prod)
+            return False
+        # the first incremental import loads everything
+        if not digests.stored:
+            changed = None
+    else:
+        forget(source)
+
     # 1.transform
-    (products_trees,
-     packages, trees_packages,
-     images) = transform(prod, prod_path)
+    with phase('parse and transform'):
+        (products_trees,
+         packages, trees_packages,
+         images) = transform(prod, prod_path, changed)
 
     # 2.load
     loader = get_default_loader()
-    loader.sync_entity(packages, Package)
-    loader.sync_entity(images, Image)
-
-    loader.sync_nnr(products_trees, Product, GitTree, remove=False)
-    loader.sync_nnr(trees_packages, GitTree, Package, remove=False)
+    rows = lambda: loader.rows
+    with phase('sync_entity Package', rows):
+        loader.sync_entity(packages, Package)
+    with phase('sync_entity Image', rows):
+        loader.sync_entity(images, Image)
+
+    with phase('sync_nnr Product-GitTree', rows):
+        loader.sync_nnr(products_trees, Product, GitTree, remove=False)
+    with phase('sync_nnr GitTree-Package', rows):
+        loader.sync_nnr(trees_packages, GitTree, Package, remove=False)
+    with phase('product graph'):
+        for product in Product.objects.filter(name=prod):
+            ProductGraph.objects.rebuild(product)
+
+    if incremental:
+        digests.save(files)
+    return True
@@ -0,0 +1,340 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+"""
+This module contains StagingLoader, a load strategy which has the same
+interface and result as Loader, but works with sets instead of rows.
+
+Given data are bulk inserted into a temporary staging table by multi-row
+INSERT, then entities or relationships to create, update and delete are
+found by joining the staging table with the target table, and applied
+by a few INSERT ... SELECT, UPDATE and DELETE statements.
+
+Foreign keys of given data are still resolved by Loader._shrink(), and
+entities are still deleted by queryset to keep Django's cascading
+deletion. post_save signals are sent for created and updated entities
+if there are receivers, e.g. profiles of new users are created.
+"""
+import logging
+
+from django.db import connection
+from django.db.models import AutoField
+from django.db.models.signals import post_save
+
+from iris.etl.loader import Loader, mname, getk
+
+# pylint: disable=W0142,C0103,W0212,R0914
+# W0142: Used * or ** magic
+# C0103: Invalid name "qn"
+# W0212: Access to a protected member _meta of a client class
+# R0914: StagingLoader.sync_entity: Too many local variables (25/15)
+
+log = logging.getLogger(__name__)
+
+qn = connection.ops.quote_name
+
+
+def _batches(items, size):
+    """split `items` into lists of `size`"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _fetch(sql, params=()):
+    """returns the first column of all rows selected by sql"""
+    cursor = connection.cursor()
+    cursor.execute(sql, params)
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _execute(sql, params=()):
+    """execute sql, returns number of affected rows"""
+    cursor = connection.cursor()
+    cursor.execute(sql, params)
+    return cursor.rowcount
+
+
+class Staging(object):
+    """
+    Temporary table of `fields`, whose columns are named and typed as the
+    fields, filled with `rows` which are tuples of values of the fields.
+    It's dropped when leaving the with block.
+    """
+
+    def __init__(self, name, fields, rows, key=None):
+        self.name = name
+        self.fields = fields
+        self.size = len(rows)
+        columns = ['%s %s' % (qn(f.column), f.db_type(connection))
+                   for f in fields]
+        index = key and (qn('%s_key' % name),
+                         ', '.join(qn(f.column) for f in key))
+        # CREATE INDEX commits implicitly in mysql even on temporary
+        # tables, so the index is declared inline there
+        if index and connection.vendor == 'mysql':
+            columns.append('INDEX %s (%s)' % index)
+        _execute('CREATE TEMPORARY TABLE %s (%s)' % (
+            qn(name), ', '.join(columns)))
+        if index and connection.vendor != 'mysql':
+            _execute('CREATE INDEX %s ON %s (%s)' % (
+                index[0], qn(name), index[1]))
+
+        size = connection.ops.bulk_batch_size(fields, rows) or 1
+        for batch in _batches(rows, size):
+            _execute('INSERT INTO %s (%s) %s' % (
+                qn(name), ', '.join(qn(f.column) for f in fields),
+                connection.ops.bulk_insert_sql(fields, len(batch))),
+                     [f.get_db_prep_save(value, connection)
+                      for row in batch for f, value in zip(fields, row)])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        _execute('DROP %sTABLE %s' % (
+            'TEMPORARY ' if connection.vendor == 'mysql' else '',
+            qn(self.name)))
+
+
+class StagingLoader(Loader):
+    """
+    Loader to sync data into database by set-based sql
+    """
+
+    def sync_entity(self, left, model, scope=None):
+        """
+        Sync entity of `model`, scoped sync is done by Loader since it
+        often touches only a few entities
+        """
+        if scope:
+            return super(StagingLoader, self).sync_entity(left, model, scope)
+        opts = model._meta
+        ckey = self.CKEY[mname(model)]
+        # foreign keys come to their attname after shrinking, such as
+        # subdomain__name, subdomain__domain__name => subdomain_id
+        kcols = []
+        for c in ckey:
+            col = opts.get_field(c.split('__')[0]).attname
+            if col not in kcols:
+                kcols.append(col)
+        left = self._shrink(left)
+        cols = left[0].keys() if left else kcols
+        ucols = sorted(set(cols) - set(kcols) - {'pk'})
+
+        fields = dict((f.attname, f) for f in opts.fields)
+        kfields = [fields[c] for c in kcols]
+        ufields = [fields[c] for c in ucols]
+        assert all(f.model is model for f in kfields), \
+            'candidate key must be in table of %s' % model.__name__
+
+        with Staging('staging_%s' % opts.db_table, kfields + ufields,
+                     [[item[c] for c in kcols + ucols] for item in left],
+                     kfields) as staging:
+            ronly, lonly, diff = self._sync(model, staging, kfields,
+                                            ufields)
+        log.info('Sync {:>20} +{:<5} -{:<5} U{:<5}'.format(
+                 model.__name__, lonly, len(ronly), len(diff)))
+        self.rows += lonly + len(diff)
+        return self._deleter(model, ronly)
+
+    def _sync(self, model, staging, kfields, ufields):
+        """
+        Create and update entities by staging, returns pks of entities to
+        delete, number of created entities and pks of updated entities.
+        """
+        opts = model._meta
+        # parent table of multi-table inheritance, such as auth_group of
+        # DomainRole, their pks are the same
+        parents = dict((parent._meta.db_table, link)
+                       for parent, link in opts.parents.items())
+        alias = lambda f: ('t' if f.model is model
+                           else qn(f.model._meta.db_table))
+        pk = 't.%s' % qn(opts.pk.column)
+        match = lambda t: ' AND '.join(
+            's.%s = %s.%s' % (qn(f.column), t, qn(f.column)) for f in kfields)
+        joined = '%s s INNER JOIN %s t ON %s' % (
+            qn(staging.name), qn(opts.db_table), match('t'))
+
+        ronly = _fetch('SELECT %s FROM %s t LEFT OUTER JOIN %s s ON %s '
+                       'WHERE s.%s IS NULL' % (
+                           pk, qn(opts.db_table), qn(staging.name),
+                           match('t'), qn(kfields[0].column)))
+        diff = _fetch('SELECT %s FROM %s%s WHERE %s' % (
+            pk, joined, ''.join(
+                ' INNER JOIN %s ON %s.%s = t.%s' % (
+                    qn(table), qn(table),
+                    qn(link.rel.to._meta.pk.column), qn(link.column))
+                for table, link in parents.items()),
+            ' OR '.join('NOT (s.{0} = {1}.{0} OR s.{0} IS NULL AND '
+                        '{1}.{0} IS NULL)'.format(
+                            qn(f.column), alias(f)) for f in ufields)
+            )) if ufields else []
+        listened = post_save.has_listeners(model)
+        if listened:
+            exist = set(_fetch('SELECT %s FROM %s' % (pk, joined)))
+
+        lonly = self._insert(model, staging, match('t'))
+        self._update(model, staging, diff, match, ufields)
+
+        if listened and (lonly or diff):
+            created = set(_fetch('SELECT %s FROM %s' % (pk, joined))) - exist
+            for pks in _batches(sorted(created | set(diff)), 500):
+                for obj in model.objects.filter(pk__in=pks):
+                    post_save.send(sender=model, instance=obj,
+                                   created=obj.pk in created, raw=False,
+                                   using=connection.alias,
+                                   update_fields=None)
+        return ronly, lonly, diff
+
+    @staticmethod
+    def _insert(model, staging, match):
+        """
+        Insert entities only in staging, rows of parent table come first
+        and are found by an unique column. Returns number of entities.
+        """
+        if not staging.size:
+            return 0
+        opts = model._meta
+        obj = model()
+        source = '%s s LEFT OUTER JOIN %s t ON %s' % (
+            qn(staging.name), qn(opts.db_table), match)
+
+        def insert(table, fields, selects, source):
+            """insert `selects` columns and defaults of other `fields`"""
+            cols = [col for col, _ in selects]
+            params = []
+            for f in fields:
+                if f.column in cols or isinstance(f, AutoField):
+                    continue
+                selects.append((f.column, '%s'))
+                params.append(f.get_db_prep_save(f.pre_save(obj, True),
+                                                 connection))
+            return _execute('INSERT INTO %s (%s) SELECT %s FROM %s WHERE '
+                            't.%s IS NULL' % (
+                                qn(table),
+                                ', '.join(qn(col) for col, _ in selects),
+                                ', '.join(expr for _, expr in selects),
+                                source, qn(opts.pk.column)),
+                            params)
+
+        def staged(fields):
+            """columns of `fields` selected from staging"""
+            return [(f.column, 's.%s' % qn(f.column))
+                    for f in fields if f in staging.fields]
+
+        selects = []
+        for parent, link in opts.parents.items():
+            popts = parent._meta
+            unique = [f for f in popts.local_fields
+                      if f.unique and f in staging.fields]
+            assert unique, 'no unique column to insert %s' % model.__name__
+            insert(popts.db_table, popts.local_fields,
+                   staged(popts.local_fields), source)
+            source = '%s INNER JOIN %s p ON p.%s = s.%s' % (
+                source, qn(popts.db_table), qn(unique[0].column),
+                qn(unique[0].column))
+            selects.append((link.column, 'p.%s' % qn(popts.pk.column)))
+        return insert(opts.db_table, opts.local_fields,
+                      selects + staged(opts.local_fields), source)
+
+    @staticmethod
+    def _update(model, staging, pks, match, ufields):
+        """
+        Update columns of entities of `pks` to values in staging
+        """
+        opts = model._meta
+        tables = {}
+        for f in ufields:
+            tables.setdefault(f.model._meta.db_table, []).append(f)
+        for table, fields in sorted(tables.items()):
+            if table == opts.db_table:
+                # mysql can't select from the table being updated
+                join, where = '', match(qn(table))
+            else:
+                join = ' INNER JOIN %s t ON %s' % (
+                    qn(opts.db_table), match('t'))
+                where = 't.%s = %s.%s' % (
+                    qn(opts.pk.column), qn(table),
+                    qn(fields[0].model._meta.pk.column))
+            # mysql can't open a temporary table twice in one statement,
+            # so each column is updated by its own statement
+            for f in fields:
+                for batch in _batches(pks, 500):
+                    _execute(
+                        'UPDATE %s SET %s = (SELECT s.%s FROM %s s%s '
+                        'WHERE %s) WHERE %s IN (%s)' % (
+                            qn(table), qn(f.column), qn(f.column),
+                            qn(staging.name), join, where,
+                            qn(f.model._meta.pk.column),
+                            ', '.join(['%s'] * len(batch))), batch)
+
+    def sync_nnr(self, data, model1, model2, remove=True, scope=None):
+        """
+        Sync many to many relationship between `model1` and `model2`
+        """
+        if scope:
+            return super(StagingLoader, self).sync_nnr(
+                data, model1, model2, remove, scope)
+        ckey1, ckey2 = self.CKEY[mname(model1)], self.CKEY[mname(model2)]
+        nnm_name = self.NNM[mname(model1)][mname(model2)]
+        descriptor = getattr(model1, nnm_name)
+        if hasattr(descriptor, 'field'):
+            field = descriptor.field
+            src, dst = field.m2m_field_name(), field.m2m_reverse_field_name()
+        else:
+            field = descriptor.related.field
+            src, dst = field.m2m_reverse_field_name(), field.m2m_field_name()
+        through = field.rel.through._meta
+        src, dst = through.get_field(src), through.get_field(dst)
+
+        idx1 = {getk(x, ckey1): x['pk']
+                for x in model1.objects.all().values('pk', *ckey1)}
+        idx2 = {getk(x, ckey2): x['pk']
+                for x in model2.objects.all().values('pk', *ckey2)}
+        pairs = set()
+        for item1, item2 in data:
+            key1, key2 = getk(item1, ckey1), getk(item2, ckey2)
+            pk1, pk2 = idx1.get(key1), idx2.get(key2)
+            if pk1 is None:
+                log.warn("%s(%s) doesn't exist", model1.__name__, key1)
+            if pk2 is None:
+                log.warn("%s(%s) doesn't exist", model2.__name__, key2)
+            if pk1 and pk2:
+                pairs.add((pk1, pk2))
+
+        with Staging('staging_%s' % through.db_table, [src, dst],
+                     sorted(pairs), [src, dst]) as staging:
+            added, removed = self._sync_through(model1, staging, remove)
+        log.info('Sync {:>20} +{:<5} -{:<5}'.format(
+                 ','.join([model1.__name__, model2.__name__]),
+                 added, removed))
+        self.rows += added + removed
+
+    @staticmethod
+    def _sync_through(model1, staging, remove):
+        """
+        Add and remove relationships in through table by staging, returns
+        number of them.
+        """
+        src, dst = staging.fields
+        through = src.model._meta
+        match = lambda t: 's.{0} = {2}.{0} AND s.{1} = {2}.{1}'.format(
+            qn(src.column), qn(dst.column), t)
+        added = _execute(
+            'INSERT INTO {0} ({1}, {2}) SELECT s.{1}, s.{2} FROM {3} s '
+            'LEFT OUTER JOIN {0} t ON {4} WHERE t.{5} IS NULL'.format(
+                qn(through.db_table), qn(src.column), qn(dst.column),
+                qn(staging.name), match('t'), qn(through.pk.column)))
+        removed = 0
+        if remove:
+            removed = _execute(
+                'DELETE FROM {0} WHERE {1} IN (SELECT {2} FROM {3}) AND NOT '
+                'EXISTS (SELECT 1 FROM {4} s WHERE {5})'.format(
+                    qn(through.db_table), qn(src.column),
+                    qn(model1._meta.pk.column), qn(model1._meta.db_table),
+                    qn(staging.name),
+                    match(qn(through.db_table))))
+        return added, removed
@@ -0,0 +1,159 @@
+# -*- encoding: utf-8 -*-
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+'''
+This module is used to test skipping unchanged data by digests
+'''
+#pylint: disable=missing-docstring,invalid-name
+
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+
+from django.contrib.auth.models import User
+
+from iris.core.models import (
+    Domain, GitTree, Product, ProductGraph, Package, Image, ImportDigest)
+from iris.etl import scm, snapshot
+
+DATA = u'''
+D: System
+M: Mike <mike@i.com>
+
+D: Multimedia
+
+T: adaptation/face-engine
+D: System
+
+T: dapt/alsa
+D: Multimedia
+M: Lily <lily@i.com>
+'''
+
+
+class ScmDigestTest(unittest.TestCase):
+
+    def tearDown(self):
+        Domain.objects.all().delete()
+        User.objects.all().delete()
+        ImportDigest.objects.all().delete()
+
+    def test_skip_unchanged(self):
+        self.assertTrue(scm.from_unicode(DATA, incremental=True))
+        self.assertEquals(2, GitTree.objects.count())
+        self.assertFalse(scm.from_unicode(DATA, incremental=True))
+        # blank lines don't change any block
+        self.assertFalse(scm.from_unicode(DATA + u'\n\n', incremental=True))
+
+    def test_only_changed_blocks_synced(self):
+        scm.from_unicode(DATA, incremental=True)
+        # out of band changes of unchanged blocks are left alone
+        GitTree.objects.get(gitpath='adaptation/face-engine').delete()
+
+        scm.from_unicode(DATA.replace(u'M: Lily', u'R: Lily'),
+                         incremental=True)
+        self.assertEquals(['dapt/alsa'], [
+            t.gitpath for t in GitTree.objects.all()])
+        self.assertEquals(['REVIEWER'], [
+            r.role for r in GitTree.objects.get(
+                gitpath='dapt/alsa').role_set.all()])
+
+    def test_removed_block_deleted(self):
+        scm.from_unicode(DATA, incremental=True)
+        scm.from_unicode(DATA.split(u'T: dapt/alsa')[0], incremental=True)
+        self.assertEquals(['adaptation/face-engine'], [
+            t.gitpath for t in GitTree.objects.all()])
+
+    def test_full_import_forgets_digests(self):
+        scm.from_unicode(DATA, incremental=True)
+        scm.from_unicode(DATA)
+        self.assertEquals(0, ImportDigest.objects.count())
+        GitTree.objects.get(gitpath='adaptation/face-engine').delete()
+        self.assertTrue(scm.from_unicode(DATA, incremental=True))
+        self.assertEquals(2, GitTree.objects.count())
+
+
+BUILD = '<build><buildtargets>%s</buildtargets></build>'
+MANIFEST = '<manifest><project path="%s"/></manifest>'
+PRIMARY = '''<metadata>
+<package><name>%s</name><version vcs="%s#1"/></package>
+</metadata>'''
+IMAGES = '<images><config><name>%s.ks</name><arch>ia32</arch></config>' \
+    '</images>'
+
+
+class SnapshotDigestTest(unittest.TestCase):
+
+    def setUp(self):
+        scm.from_unicode(DATA)
+        Product.objects.create(name='Tizen:IVI', description='IVI')
+        self.path = tempfile.mkdtemp()
+        self.write('build.xml', BUILD % ''.join(
+            '<buildtarget name="%s"/>' % t for t in ('x86', 'arm')))
+        self.write('builddata/manifest/x86.xml',
+                   MANIFEST % 'adaptation/face-engine')
+        for target in ('x86', 'arm'):
+            self.repo(target, 'alsa-%s' % target, 'dapt/alsa')
+            self.write('builddata/images/%s/images.xml' % target,
+                       IMAGES % ('ivi-%s' % target))
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+        Product.objects.all().delete()
+        Package.objects.all().delete()
+        Domain.objects.all().delete()
+        User.objects.all().delete()
+        ImportDigest.objects.all().delete()
+
+    def write(self, name, content, opener=open):
+        path = os.path.join(self.path, name)
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with opener(path, 'w') as writer:
+            writer.write(content)
+
+    def repo(self, target, package, tree):
+        self.write('repos/%s/packages/repodata/abc-primary.xml.gz' % target,
+                   PRIMARY % (package, tree), gzip.open)
+
+    def from_dir(self):
+        return snapshot.from_dir('Tizen:IVI', self.path, incremental=True)
+
+    def test_skip_unchanged(self):
+        self.assertTrue(self.from_dir())
+        self.assertEquals(['alsa-arm', 'alsa-x86'], sorted(
+            Package.objects.values_list('name', flat=True)))
+        self.assertEquals(2, Image.objects.count())
+        self.assertFalse(self.from_dir())
+
+    def test_only_changed_target_loaded(self):
+        self.from_dir()
+        Image.objects.all().delete()
+        self.repo('arm', 'pulseaudio', 'dapt/alsa')
+        self.assertTrue(self.from_dir())
+        self.assertEquals(['alsa-arm', 'alsa-x86', 'pulseaudio'], sorted(
+            Package.objects.values_list('name', flat=True)))
+        # images are unchanged, so they are not loaded again
+        self.assertEquals(0, Image.objects.count())
+
+    def test_graph_rebuilt(self):
+        product = Product.objects.get(name='Tizen:IVI')
+        self.write('builddata/manifest/arm.xml', MANIFEST % 'dapt/alsa')
+        self.from_dir()
+        self.assertEquals(
+            {'adaptation/face-engine': [],
+             'dapt/alsa': ['alsa-arm', 'alsa-x86']},
+            {tree['gitpath']: [i['name'] for i in tree['packages']]
+             for tree in ProductGraph.objects.load(product)['gittrees']})
+        self.repo('arm', 'pulseaudio', 'dapt/alsa')
+        self.from_dir()
+        graph = ProductGraph.objects.get(product=product)
+        self.assertEquals(2, graph.version)
+        self.assertIn('pulseaudio', graph.data)
@@ -0,0 +1,65 @@
+# -*- encoding: utf-8 -*-
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+'''
+This module is used to test profiling of scm data import
+'''
+#pylint: disable=missing-docstring,invalid-name
+
+import unittest
+
+from django.contrib.auth.models import User
+
+from iris.core.models import Domain
+from iris.core.profiling import Measure, PhaseProfiler, peak_rss
+from iris.etl.scm import from_string
+
+
+class ImportProfilingTest(unittest.TestCase):
+
+    def tearDown(self):
+        Domain.objects.all().delete()
+        User.objects.all().delete()
+
+    def test_phases(self):
+        profiler = PhaseProfiler()
+        from_string('''
+            D: System
+            M: Mike <mike@i.com>
+            ''', profiler=profiler)
+        report = profiler.report()
+        names = [i['name'] for i in report['phases']]
+        self.assertEquals(
+            ['parse', 'user cache', 'transform', 'sync_entity User'],
+            names[:4])
+        self.assertIn('sync_nnr DomainRole-User', names)
+        self.assertEquals(['delete Domain', 'product graphs'], names[-2:])
+
+        phases = dict((i['name'], i) for i in report['phases'])
+        # Uncategorized and System
+        self.assertEquals(2, phases['sync_entity Domain']['rows'])
+        self.assertEquals(1, phases['sync_nnr DomainRole-User']['rows'])
+        self.assertTrue(phases['sync_entity Domain']['queries'] > 0)
+        self.assertEquals(
+            sum(i['queries'] for i in report['phases']),
+            report['total']['queries'])
+        self.assertEquals(
+            sum(i['rss_growth'] or 0 for i in report['phases']),
+            report['total']['rss_growth'])
+
+    def test_rss_growth(self):
+        with Measure() as measure:
+            data = ['x' * 1024 for _ in range(1024)]
+        self.assertTrue(data)
+        if peak_rss() is not None:
+            self.assertTrue(measure.rss_growth >= 0)
+
+    def test_disabled(self):
+        profiler = PhaseProfiler(enabled=False)
+        from_string('D: System', profiler=profiler)
+        self.assertEquals([], profiler.report()['phases'])
@@ -0,0 +1,100 @@
+# -*- encoding: utf-8 -*-
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+'''
+This module is used to test scm data import committed in chunks
+'''
+#pylint: disable=missing-docstring,invalid-name
+
+import unittest
+
+from django.contrib.auth.models import User
+
+from iris.core.models import (
+    Domain, SubDomain, GitTree, DomainRole, GitTreeRole)
+from iris.etl.scm import from_string
+
+DOMAINS = '''
+D: System
+M: Mike <mike@i.com>
+
+D: Multimedia
+M: Lily <lily@i.com>
+R: Tom <tom@i.com>
+
+D: Multimedia / Audio
+N: Multimedia
+M: Lucy <lucy@i.com>
+'''
+
+TREES = '''
+T: dapt/alsa
+D: Multimedia / Audio
+R: Tom <tom@i.com>
+
+T: adaptation/face-engine
+D: System
+M: Mike <mike@i.com>
+'''
+
+
+def snapshot():
+    return {
+        'domains': sorted(Domain.objects.values_list('name', flat=True)),
+        'subdomains': sorted(SubDomain.objects.values_list(
+            'domain__name', 'name')),
+        'trees': sorted(GitTree.objects.values_list(
+            'gitpath', 'subdomain__name')),
+        'users': sorted(User.objects.values_list('email', flat=True)),
+        'domainroles': sorted(
+            (r.domain.name, r.role, e) for r in DomainRole.objects.all()
+            for e in r.user_set.values_list('email', flat=True)),
+        'treeroles': sorted(
+            (r.gittree.gitpath, r.role, e)
+            for r in GitTreeRole.objects.all()
+            for e in r.user_set.values_list('email', flat=True)),
+        }
+
+
+class ChunkedImportTest(unittest.TestCase):
+
+    def tearDown(self):
+        Domain.objects.all().delete()
+        User.objects.all().delete()
+
+    def import_twice(self, chunk_size):
+        from_string(DOMAINS + TREES, chunk_size=chunk_size)
+        first = snapshot()
+        # rename, delete and change roles
+        from_string('''
+            D: System
+            M: Lily <lily@i.com>
+
+            D: Multimedia
+            M: Lily <lily@i.com>
+
+            D: Multimedia / Video
+            N: Multimedia
+            M: Lucy <lucy@i.com>
+
+            T: dapt/alsa
+            D: Multimedia / Video
+            ''', chunk_size=chunk_size)
+        return first, snapshot()
+
+    def test_same_as_single_transaction(self):
+        expected = self.import_twice(None)
+        self.tearDown()
+        self.assertEquals(expected, self.import_twice(1))
+
+    def test_chunk_bigger_than_data(self):
+        from_string(DOMAINS + TREES, chunk_size=1000)
+        self.assertEquals(
+            [('dapt/alsa', 'Audio'), ('adaptation/face-engine', 'Uncategorized')],
+            sorted(GitTree.objects.values_list('gitpath', 'subdomain__name'),
+                   reverse=True))
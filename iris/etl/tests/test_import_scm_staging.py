@@ -0,0 +1,95 @@
+# -*- encoding: utf-8 -*-
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+'''
+This module runs all scm import tests again with the staging loader,
+to make sure it produces the same result as the default loader
+'''
+#pylint: disable=missing-docstring,invalid-name
+
+from django.db import connection
+from django.contrib.auth.models import User
+from django.test.utils import override_settings, CaptureQueriesContext
+
+from iris.core.models import UserProfile
+from iris.etl.scm import from_string
+from iris.etl.tests import (
+    test_import_scm_domain as domain,
+    test_import_scm_subdomain as subdomain,
+    test_import_scm_gittree as gittree,
+    )
+
+
+class StagingMixin(object):
+
+    def setUp(self):
+        self.staging = override_settings(IRIS_SCM_STAGING=True)
+        self.staging.enable()
+        super(StagingMixin, self).setUp()
+
+    def tearDown(self):
+        super(StagingMixin, self).tearDown()
+        self.staging.disable()
+
+
+class DomainTest(StagingMixin, domain.DomainTest):
+
+    def test_user_profile_created(self):
+        from_string('''
+            D: System
+            M: Mike <mike@i.com>
+            ''')
+        self.assertEquals(
+            ['mike@i.com'],
+            [p.user.email for p in UserProfile.objects.all()])
+        User.objects.all().delete()
+
+    def test_update_several_fields(self):
+        from_string('''
+            D: System
+            M: Mike Smith <mike@i.com>
+            ''')
+        with CaptureQueriesContext(connection) as queries:
+            from_string('''
+                D: System
+                M: Michael Jordan <mike@i.com>
+                ''')
+        user = User.objects.get(email='mike@i.com')
+        self.assertEquals(('Michael', 'Jordan'),
+                          (user.first_name, user.last_name))
+        # mysql can't open a temporary table twice in one statement
+        updates = [i['sql'] for i in queries.captured_queries
+                   if 'UPDATE ' in i['sql']]
+        self.assertEquals(3, len(updates))
+        for sql in updates:
+            self.assertTrue(sql.count('staging_') <= 1, sql)
+        User.objects.all().delete()
+
+
+class TestDomainRole(StagingMixin, domain.TestDomainRole):
+    pass
+
+
+class SubDomainTest(StagingMixin, subdomain.SubDomainTest):
+    pass
+
+
+class TestSubDomainRole(StagingMixin, subdomain.TestSubDomainRole):
+    pass
+
+
+class GitTreeTest(StagingMixin, gittree.GitTreeTest):
+    pass
+
+
+class TestGitTreeRole(StagingMixin, gittree.TestGitTreeRole):
+    pass
+
+
+class GitTreeLicenseTest(StagingMixin, gittree.GitTreeLicenseTest):
+    pass
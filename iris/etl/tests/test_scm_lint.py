@@ -0,0 +1,114 @@
+# -*- encoding: utf-8 -*-
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+'''
+This module is used to test checking scm data by Linter
+'''
+#pylint: disable=missing-docstring,invalid-name
+
+import threading
+import unittest
+
+from iris.etl import check
+from iris.etl.check import Linter, Error, check_scm
+from iris.etl.parser import parse_blocks
+from iris.etl.scm import MAPPING
+
+DOMAINS = u'''D: System
+M: Mike <mike@i.com>
+
+D: Multimedia
+M: Mike <mike@i.com>
+R: Bad <bad@>
+
+D: Multimedia
+'''
+
+TREES = u'''T: dapt/alsa
+D: Multimedia
+M: Mike <mike@i.com>
+
+T: dapt/alsa
+D: System
+
+T: adaptation/face-engine
+D: Graphics
+'''
+
+
+class LinterTest(unittest.TestCase):
+
+    def test_errors_with_line_numbers(self):
+        self.assertEquals([
+            Error('DOMAINS', 6, 'Invalid email "bad@" for user "Bad <bad@>"'),
+            Error('DOMAINS', 8, 'Duplicated domain name: Multimedia'),
+            Error('TREE', 5, 'Duplicated git path: dapt/alsa'),
+            Error('TREE', 9, 'Unknown domain name: Graphics'),
+            ], check_scm(DOMAINS, TREES))
+
+    def test_error_string(self):
+        self.assertEquals('(TREE): line 9: Unknown domain name: Graphics',
+                          str(Error('TREE', 9,
+                                    'Unknown domain name: Graphics')))
+        self.assertEquals(
+            {'source': 'DOMAINS', 'lineno': 0, 'message': 'empty'},
+            Error('DOMAINS', 0, 'empty').as_dict())
+
+    def test_syntax_error_line(self):
+        self.assertEquals(
+            [Error('TREE', 3, "Can't find colon(:) at line: dapt/alsa")],
+            check_scm(u'D: System', u'T: a\n\ndapt/alsa\nD: System'))
+
+    def test_non_ascii(self):
+        errors = check_scm(u'D: System\nM: Jürgen <jürgen@>',
+                           u'T: a\nD: System')
+        self.assertEquals(2, errors[0].lineno)
+        self.assertIn(u'Jürgen', unicode(errors[0]))
+
+    def test_blocks_same_as_parsed(self):
+        linter = Linter()
+        domains, trees = u'D: System\nM: a@i.com\n', u'T: a\nD: System'
+        self.assertEquals([], linter.check_scm(domains, trees))
+        self.assertEquals(
+            parse_blocks(u'\n\n'.join([domains, trees]), MAPPING),
+            linter.blocks)
+
+    def test_user_validated_once(self):
+        calls = []
+        parse_user = check.parse_user
+
+        def counting(ustring, validate=False):
+            calls.append(ustring)
+            return parse_user(ustring, validate)
+
+        domains = u'\n\n'.join(u'D: D%d\nM: Mike <mike@i.com>\nR: Bad <bad@>'
+                               % i for i in range(50))
+        check.parse_user = counting
+        try:
+            errors = check_scm(domains, u'T: a\nD: D1')
+        finally:
+            check.parse_user = parse_user
+        self.assertEquals(2, len(calls))
+        # but each occurrence is reported
+        self.assertEquals(50, len(errors))
+
+    def test_threads(self):
+        results = {}
+
+        def lint(i):
+            domains = u'\n\n'.join([u'D: System'] * i)
+            results[i] = check_scm(domains, u'T: a\nD: System')
+
+        threads = [threading.Thread(target=lint, args=(i,))
+                   for i in range(1, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for i in range(1, 9):
+            self.assertEquals(i - 1, len(results[i]))
@@ -0,0 +1,81 @@
+# -*- encoding: utf-8 -*-
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+'''
+This module is used to test compact records of transformed scm data
+'''
+#pylint: disable=missing-docstring,invalid-name
+
+import sys
+import unittest
+
+from django.contrib.auth.models import User
+
+from iris.core.models import (
+    Domain, SubDomain, GitTree, License, GitTreeRole)
+from iris.etl import scm, benchmark
+from iris.etl.records import record, Interner, GitTree as GitTreeRow
+
+
+class RecordTest(unittest.TestCase):
+
+    def test_read_like_dict(self):
+        row = GitTreeRow(u'dapt/alsa', u'Audio', u'Multimedia')
+        self.assertEquals(u'Audio', row['subdomain__name'])
+        self.assertEquals(u'dapt/alsa', row[0])
+        self.assertEquals({'gitpath': u'dapt/alsa',
+                           'subdomain__name': u'Audio',
+                           'subdomain__domain__name': u'Multimedia'},
+                          dict(row))
+        self.assertEquals(dict(row, pk=1), dict(row, **{'pk': 1}))
+
+    def test_as_small_as_tuple(self):
+        Row = record('Row', 'name')
+        self.assertEquals(sys.getsizeof((u'a',)), sys.getsizeof(Row(u'a')))
+
+    def test_interner_shares_equal_strings(self):
+        intern_ = Interner()
+        first = intern_(u''.join([u'Multi', u'media']))
+        self.assertTrue(first is intern_(u''.join([u'Multim', u'edia'])))
+
+
+class TransformMemoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.content = benchmark.generate(
+            domains=2, subdomains=2, gittrees=20, users=5)
+
+    def tearDown(self):
+        Domain.objects.all().delete()
+        License.objects.all().delete()
+        User.objects.all().delete()
+
+    def test_records_smaller_than_dicts(self):
+        report = benchmark.run(self.content)
+        self.assertTrue(report['rows'] > 0)
+        self.assertTrue(report['records'] < report['dicts'] * 0.7, report)
+
+    def test_names_shared(self):
+        trees = benchmark.transform(self.content)[7]
+        same = [t for t in trees if t.subdomain__name == u'Sub0']
+        self.assertTrue(same[0].subdomain__name is same[1].subdomain__name)
+
+    def test_import_generated(self):
+        License.objects.create(shortname='GPL-2.0')
+        scm.from_unicode(self.content)
+        self.assertEquals(3, Domain.objects.count())
+        self.assertEquals(2 * 2 + 3, SubDomain.objects.count())
+        self.assertEquals(20, GitTree.objects.count())
+        tree = GitTree.objects.get(gitpath='bench/tree1')
+        self.assertEquals(['GPL-2.0'], [
+            i.shortname for i in tree.licenses.all()])
+        self.assertEquals(
+            ['user1@bench.localhost'],
+            [u.email for u in GitTreeRole.objects.get(
+                gittree=tree, role='MAINTAINER').user_set.all()])
+        self.assertEquals(5, User.objects.count())
@@ -10,11 +10,14 @@
 iris/packagedb/views/scm.py
 '''
 #pylint: disable=missing-docstring,invalid-name
+import json
 import StringIO
 
 from django.test import TestCase
 from django.core.urlresolvers import reverse
 
+from iris.core.models import GitTree
+
 
 class EventHandlerTest(TestCase):
 
@@ -111,3 +114,50 @@ class EventHandlerTest(TestCase):
         r = self.client.post(reverse('scm.update'), {
             'domains': domains_si, 'gittrees': gittrees_si})
         self.assertEquals(200, r.status_code)
+
+    def test_errors_with_line_numbers(self):
+        self.login()
+        domains_si = StringIO.StringIO('D: System\nM: Bad <bad@>\n')
+        domains_si.name = 'domains'
+        gittrees_si = StringIO.StringIO('T: a\nD: Graphics')
+        gittrees_si.name = 'gittrees'
+
+        r = self.client.post(reverse('scm.update'), {
+            'domains': domains_si, 'gittrees': gittrees_si})
+        self.assertEquals(406, r.status_code)
+        self.assertEquals([
+            {'source': 'DOMAINS', 'lineno': 2,
+             'message': 'Invalid email "bad@" for user "Bad <bad@>"'},
+            {'source': 'TREE', 'lineno': 2,
+             'message': 'Unknown domain name: Graphics'},
+            ], json.loads(r.content)['errors'])
+
+    def test_not_utf8(self):
+        self.login()
+        for name in ('scm.update', 'scm.check'):
+            domains_si = StringIO.StringIO(u'D: Système\n'.encode('latin1'))
+            domains_si.name = 'domains'
+            gittrees_si = StringIO.StringIO('T: a\nD: System')
+            gittrees_si.name = 'gittrees'
+            r = self.client.post(reverse(name), {
+                'domains': domains_si, 'gittrees': gittrees_si})
+            self.assertEquals(400, r.status_code)
+            self.assertIn('UTF-8', json.loads(r.content)['detail'])
+
+    def test_duplicated_gitpath_rejected(self):
+        # intentionally rejected, they were let through before Linter
+        self.login()
+        domains_si = StringIO.StringIO('D: System\n\nD: Graphics\n')
+        domains_si.name = 'domains'
+        gittrees_si = StringIO.StringIO(
+            'T: dapt/alsa\nD: System\n\nT: dapt/alsa\nD: Graphics\n')
+        gittrees_si.name = 'gittrees'
+
+        r = self.client.post(reverse('scm.update'), {
+            'domains': domains_si, 'gittrees': gittrees_si})
+        self.assertEquals(406, r.status_code)
+        self.assertEquals([
+            {'source': 'TREE', 'lineno': 4,
+             'message': 'Duplicated git path: dapt/alsa'},
+            ], json.loads(r.content)['errors'])
+        self.assertFalse(GitTree.objects.exists())
@@ -0,0 +1,198 @@
+# -*- encoding: utf-8 -*-
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+'''
+This module is used to test listing directories by URL
+'''
+#pylint: disable=missing-docstring,invalid-name
+
+import time
+import threading
+import unittest
+from SocketServer import ThreadingMixIn
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+from iris.etl.url import (
+    URL, LISTINGS, SharedSession, parallel, unordered, listdirs)
+
+
+def page(*names):
+    return ''.join('<a href="%s">%s</a>\n' % (name, name)
+                   for name in ('../',) + names)
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    "Serves `pages`, counting requests and 304 responses"
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), Handler)
+        self.pages = {}
+        self.headers = {}
+        self.delay = 0
+        self.lock = threading.Lock()
+        self.requests = []
+        self.not_modified = 0
+        self.active = self.max_active = 0
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(server.delay)
+            self.respond(server)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def respond(self, server):
+        if self.path not in server.pages:
+            self.send_error(404)
+            return
+        headers = server.headers.get(self.path, {})
+        if 'ETag' in headers and \
+                self.headers.get('If-None-Match') == headers['ETag'] or \
+                'Last-Modified' in headers and \
+                self.headers.get('If-Modified-Since') == \
+                headers['Last-Modified']:
+            with server.lock:
+                server.not_modified += 1
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = server.pages[self.path]
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class URLListingTest(unittest.TestCase):
+
+    def setUp(self):
+        LISTINGS.clear()
+        self.server = Server()
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.05,))
+        self.thread.daemon = True
+        self.thread.start()
+        self.base = URL('http://127.0.0.1:%d/' % self.server.server_port)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        LISTINGS.clear()
+
+    def test_listdir(self):
+        self.server.pages['/repodata/'] = page(
+            'abc-primary.xml.gz', 'abc-other.xml.gz')
+        url = self.base.join('repodata')
+        self.assertEquals(
+            [url.join('abc-primary.xml.gz'), url.join('abc-other.xml.gz')],
+            list(url.listdir()))
+        self.assertEquals([url.join('abc-primary.xml.gz')],
+                          url.glob('*-primary.xml.gz'))
+
+    def test_revalidate_by_etag(self):
+        self.server.pages['/a/'] = page('x86')
+        self.server.headers['/a/'] = {'ETag': '"1"'}
+        url = self.base.join('a')
+        self.assertEquals([url.join('x86')], list(url.listdir()))
+        self.assertEquals([url.join('x86')], list(url.listdir()))
+        self.assertEquals(1, self.server.not_modified)
+
+        # changed page is downloaded again
+        self.server.pages['/a/'] = page('x86', 'arm')
+        self.server.headers['/a/'] = {'ETag': '"2"'}
+        self.assertEquals([url.join('x86'), url.join('arm')],
+                          list(url.listdir()))
+        self.assertEquals(1, self.server.not_modified)
+        self.assertEquals(3, len(self.server.requests))
+
+    def test_revalidate_by_last_modified(self):
+        self.server.pages['/a/'] = page('x86')
+        self.server.headers['/a/'] = {
+            'Last-Modified': 'Thu, 01 Jan 2015 00:00:00 GMT'}
+        url = self.base.join('a')
+        list(url.listdir())
+        self.server.pages['/a/'] = page('arm')
+        # not modified by the server's word, so the cached page is used
+        self.assertEquals([url.join('x86')], list(url.listdir()))
+        self.assertEquals(1, self.server.not_modified)
+
+    def test_not_cached_without_validators(self):
+        self.server.pages['/a/'] = page('x86')
+        url = self.base.join('a')
+        list(url.listdir())
+        list(url.listdir())
+        self.assertEquals(0, self.server.not_modified)
+        self.assertEquals(2, len(self.server.requests))
+
+    def test_listdirs_concurrently(self):
+        self.server.delay = 0.2
+        urls = []
+        for i in range(4):
+            self.server.pages['/%d/' % i] = page('target%d' % i)
+            urls.append(self.base.join(str(i)))
+        self.assertEquals(
+            [[url.join('target%d' % i)] for i, url in enumerate(urls)],
+            listdirs(urls))
+        self.assertTrue(self.server.max_active > 1)
+
+    def test_parallel_keeps_order(self):
+        self.assertEquals([1, 4, 9], parallel(lambda i: i * i, [1, 2, 3]))
+        self.assertEquals([], parallel(lambda i: i, []))
+
+    def test_shared_session(self):
+        self.assertTrue(SharedSession.get() is SharedSession.get())
+
+
+class UnorderedTest(unittest.TestCase):
+
+    @staticmethod
+    def wait(seconds):
+        if seconds is None:
+            raise ValueError('no time')
+        time.sleep(seconds)
+        return seconds
+
+    def test_in_finished_order(self):
+        self.assertEquals([(0, 0, None), (0.3, 0.3, None)],
+                          list(unordered(self.wait, [0.3, 0])))
+
+    def test_error_doesnt_stop_others(self):
+        results = list(unordered(self.wait, [0.1, None, 0]))
+        self.assertEquals([(0, 0, None), (0.1, 0.1, None)],
+                          [i for i in results if i[0] is not None])
+        _item, result, err = [i for i in results if i[0] is None][0]
+        self.assertEquals(None, result)
+        self.assertTrue(isinstance(err, ValueError))
+
+    def test_one_worker_in_given_order(self):
+        self.assertEquals([(0.1, 0.1, None), (0, 0, None)],
+                          list(unordered(self.wait, [0.1, 0], workers=1)))
+
+    def test_consumer_overlaps_calls(self):
+        # while the first result is consumed, the other call goes on
+        start = time.time()
+        for _item, seconds, _err in unordered(self.wait, [0.2, 0.4]):
+            time.sleep(seconds)
+        # 1.2 seconds if they are run in turn
+        self.assertTrue(time.time() - start < 1.0)
@@ -11,11 +11,14 @@ import os
 import re
 import urllib
 import fnmatch
+import threading
 from subprocess import check_call, CalledProcessError
 from urlparse import urlsplit, urlunsplit
 from collections import namedtuple
+from multiprocessing.pool import ThreadPool
 
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
 # pylint: disable=E1101,W0232,E1002
@@ -23,7 +26,81 @@ from requests.auth import HTTPBasicAuth
 # W0232: 22,0:URL: Class has no __init__ method
 # E1002: 25,4:URL.__new__: Use of super on an old style class
 
-__ALL__ = ('URL', )
+__ALL__ = ('URL', 'parallel', 'unordered', 'listdirs')
+
+# number of concurrent requests made by parallel(), which is also the
+# number of connections kept to each host
+WORKERS = 8
+
+
+class SharedSession(object):
+    """
+    The requests session shared by all URLs, so that connections to the
+    same host are kept and reused by all threads
+    """
+    _lock = threading.Lock()
+    _session = None
+
+    @classmethod
+    def get(cls):
+        "Returns the shared session, creates it at first call"
+        with cls._lock:
+            if cls._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=WORKERS,
+                                      pool_maxsize=WORKERS)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                cls._session = session
+            return cls._session
+
+
+class Listings(object):
+    """
+    Cache of directory listing pages.
+
+    A cached page is revalidated by a conditional request with its ETag
+    or Last-Modified, so it's downloaded again only when it changes.
+    Pages are only kept in memory, so each run of download_snapshots
+    starts empty and saves downloads of pages listed again in that run,
+    such as the parent directory of latest snapshots shared by products.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pages = {}
+
+    def fetch(self, href, auth=None):
+        "Returns body of `href`, from cache if it's not modified"
+        key = (href, auth.username if auth else None)
+        with self._lock:
+            cached = self._pages.get(key)
+        headers = {}
+        if cached:
+            etag, modified, _text = cached
+            if etag:
+                headers['If-None-Match'] = etag
+            if modified:
+                headers['If-Modified-Since'] = modified
+        resp = SharedSession.get().get(href, auth=auth, headers=headers)
+        if cached and resp.status_code == 304:
+            return cached[2]
+        etag = resp.headers.get('etag')
+        modified = resp.headers.get('last-modified')
+        with self._lock:
+            if resp.status_code == 200 and (etag or modified):
+                self._pages[key] = (etag, modified, resp.text)
+            else:
+                self._pages.pop(key, None)
+        return resp.text
+
+    def clear(self):
+        "Forget all cached pages"
+        with self._lock:
+            self._pages.clear()
+
+
+LISTINGS = Listings()
 
 
 class URL(namedtuple("URL", "href user passwd full netloc path basename")):
@@ -62,13 +139,18 @@ class URL(namedtuple("URL", "href user passwd full netloc path basename")):
 
     def listdir(self):
         "Generator yields all children as URL classes"
-        for path in self._parse_dir(self.asdir().fetch()):
+        for path in self._parse_dir(self.listing()):
             if path not in ('..', '../'):
                 yield self.join(path)
 
     def fetch(self):
         "Returns HTTP response body"
-        return requests.get(self.href, auth=self._make_auth()).text
+        return SharedSession.get().get(
+            self.href, auth=self._make_auth()).text
+
+    def listing(self):
+        "Returns directory listing page, cached by LISTINGS"
+        return LISTINGS.fetch(self.asdir().href, self._make_auth())
 
     def glob(self, pattern):
         "find files matching a specify pattern"
@@ -155,3 +237,52 @@ def split_userpass(href):
     comps = list(parts)
     comps[1] = netloc
     return urlunsplit(comps), user, passwd
+
+
+def parallel(func, items, workers=WORKERS):
+    """
+    Returns list of func(item) for each of `items`, calls are run
+    concurrently by at most `workers` threads
+    """
+    items = list(items)
+    if len(items) < 2 or workers < 2:
+        return [func(item) for item in items]
+    pool = ThreadPool(min(workers, len(items)))
+    try:
+        return pool.map(func, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def unordered(func, items, workers=WORKERS):
+    """
+    Generator yields (item, result, error) for each of `items` in the
+    order func(item) finishes, calls are run concurrently by at most
+    `workers` threads. `error` is the exception raised by func(item),
+    so that a failed item doesn't stop the others.
+    """
+    def call(item):
+        "Catch error of one item"
+        try:
+            return item, func(item), None
+        except Exception as err:  # pylint: disable=broad-except
+            return item, None, err
+
+    items = list(items)
+    if len(items) < 2 or workers < 2:
+        for item in items:
+            yield call(item)
+        return
+    pool = ThreadPool(min(workers, len(items)))
+    try:
+        for result in pool.imap_unordered(call, items):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def listdirs(urls, workers=WORKERS):
+    "Returns list of children of each of `urls`, listed concurrently"
+    return parallel(lambda url: list(url.listdir()), urls, workers)
@@ -21,9 +21,23 @@ from rest_framework.viewsets import ReadOnlyModelViewSet, ViewSet
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 
-from iris.core.models import (SubDomain, GitTree, Package, Product)
-from iris.packagedb.serializers import (
-    DomainSerializer, GitTreeSerializer, PackageSerializer, ProductSerializer)
+from iris.core.models import SubDomain, Product, ProductGraph
+from iris.packagedb.exports import LISTINGS, exported
+from iris.packagedb.serializers import DomainSerializer
+
+
+class ExportedListMixin(object):
+    """
+    List is served from static export if there is one, see
+    iris.packagedb.exports
+    """
+    export = None
+
+    def list(self, request, *args, **kwargs):
+        response = exported(request, self.export)
+        if response is not None:
+            return response
+        return super(ExportedListMixin, self).list(request, *args, **kwargs)
 
 
 class DomainViewSet(ViewSet):
@@ -32,11 +46,10 @@ class DomainViewSet(ViewSet):
     """
 
     def list(self, request):
-        queryset = SubDomain.objects.prefetch_related(
-            'domain__role_set__user_set',
-            'subdomainrole_set__user_set'
-            ).order_by('domain__name', 'name')
-        serializer = DomainSerializer(queryset, many=True)
+        response = exported(request, 'domains')
+        if response is not None:
+            return response
+        serializer = DomainSerializer(LISTINGS['domains'][1].all(), many=True)
         return Response(serializer.data)
 
     def retrieve(self, request, name=None):
@@ -48,37 +61,41 @@ class DomainViewSet(ViewSet):
         return Response(serializer.data)
 
 
-class GitTreeViewSet(ReadOnlyModelViewSet):
+class GitTreeViewSet(ExportedListMixin, ReadOnlyModelViewSet):
     """
     View to the GitTrees provided by the API.
     """
 
-    queryset = GitTree.objects.select_related(
-        'subdomain__domain',
-        ).prefetch_related(
-            'packages',
-            'licenses',
-            'role_set__user_set'
-        ).order_by('gitpath')
-    serializer_class = GitTreeSerializer
+    export = 'gittrees'
+    serializer_class, queryset = LISTINGS['gittrees']
     lookup_field = 'gitpath'
 
 
-class PackageViewSet(ReadOnlyModelViewSet):
+class PackageViewSet(ExportedListMixin, ReadOnlyModelViewSet):
     """
     View to the Packages provided by the API.
     """
 
-    queryset = Package.objects.prefetch_related('gittree_set').order_by('name')
-    serializer_class = PackageSerializer
+    export = 'packages'
+    serializer_class, queryset = LISTINGS['packages']
     lookup_field = 'name'
 
 
-class ProductViewSet(ReadOnlyModelViewSet):
+class ProductViewSet(ExportedListMixin, ReadOnlyModelViewSet):
     """
     View to the Products provided by the API.
     """
 
-    queryset = Product.objects.prefetch_related('gittrees').order_by('name')
-    serializer_class = ProductSerializer
+    export = 'products'
+    serializer_class, queryset = LISTINGS['products']
     lookup_field = 'name'
+
+    def retrieve(self, request, name=None):
+        # git trees come from the graph instead of many to many table
+        product = get_object_or_404(Product, name=name)
+        graph = ProductGraph.objects.load(product)
+        return Response({
+            'name': product.name,
+            'description': product.description,
+            'gittrees': sorted(tree['gitpath'] for tree in graph['gittrees']),
+            })
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+"""
+Static JSON exports of packagedb listings.
+
+Listings of the REST API mostly change when scm data or snapshots are
+imported, so they are rendered once after each import into gzipped
+files under IRIS_EXPORT_DIR. List APIs redirect to them if they are
+published by the web server at IRIS_EXPORT_URL, or stream them.
+
+Objects changed in packagedb pages discard the exports showing them,
+those listings are queried from database until the next import.
+"""
+
+# pylint: disable=E1101
+
+import os
+import gzip
+import errno
+import logging
+import tempfile
+from urlparse import urljoin
+
+from django.conf import settings
+from django.core.servers.basehttp import FileWrapper
+from django.http import HttpResponseRedirect, StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from iris.core.models import SubDomain, GitTree, Package, Product
+from iris.packagedb.serializers import (
+    DomainSerializer, GitTreeSerializer, PackageSerializer, ProductSerializer)
+
+log = logging.getLogger(__name__)
+
+# name: (serializer class, queryset) of each list API
+LISTINGS = {
+    'domains': (
+        DomainSerializer,
+        SubDomain.objects.prefetch_related(
+            'domain__role_set__user_set',
+            'subdomainrole_set__user_set',
+            ).order_by('domain__name', 'name')),
+    'gittrees': (
+        GitTreeSerializer,
+        GitTree.objects.select_related(
+            'subdomain__domain',
+            ).prefetch_related(
+                'packages',
+                'licenses',
+                'role_set__user_set',
+            ).order_by('gitpath')),
+    'packages': (
+        PackageSerializer,
+        Package.objects.prefetch_related('gittree_set').order_by('name')),
+    'products': (
+        ProductSerializer,
+        Product.objects.prefetch_related('gittrees').order_by('name')),
+    }
+
+# listings showing objects of each model
+SHOWN_IN = {
+    'Domain': ('domains', 'gittrees'),
+    'SubDomain': ('domains', 'gittrees'),
+    'GitTree': ('gittrees', 'packages', 'products'),
+    'Package': ('gittrees', 'packages'),
+    'License': ('gittrees',),
+    'Product': ('products',),
+    }
+
+CHUNK = 65536
+
+
+def filename(name):
+    """
+    Name of the exported file of listing `name`
+    """
+    return '%s.json.gz' % name
+
+
+def render(name):
+    """
+    Returns JSON of listing `name`, the same as its list API
+    """
+    serializer, queryset = LISTINGS[name]
+    return JSONRenderer().render(serializer(queryset.all(), many=True).data)
+
+
+def export(name, directory):
+    """
+    Write gzipped JSON of listing `name` into `directory`. The file is
+    replaced at once, so readers never see a partial one.
+    """
+    content = render(name)
+    fd, tmp = tempfile.mkstemp(prefix='.%s.' % name, dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as writer:
+            with gzip.GzipFile(filename(name), 'wb', 9, writer) as zipper:
+                zipper.write(content)
+        os.chmod(tmp, 0644)
+        os.rename(tmp, os.path.join(directory, filename(name)))
+    except Exception:
+        os.remove(tmp)
+        raise
+    return len(content)
+
+
+def export_all(directory=None):
+    """
+    Export all listings into `directory`, IRIS_EXPORT_DIR by default.
+    Nothing is done if it's not set. It should be called after changes
+    of import are committed.
+    """
+    directory = directory or settings.IRIS_EXPORT_DIR
+    if not directory:
+        return
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    for name in sorted(LISTINGS):
+        size = export(name, directory)
+        log.info('Exported %s: %s bytes', name, size)
+
+
+def discard(obj):
+    """
+    Remove exports of listings showing `obj` after it's changed or
+    deleted outside imports, so that they aren't served out of date
+    """
+    directory = settings.IRIS_EXPORT_DIR
+    if not directory:
+        return
+    for name in SHOWN_IN.get(obj._meta.object_name, ()):
+        try:
+            os.remove(os.path.join(directory, filename(name)))
+        except OSError as err:
+            if err.errno != errno.ENOENT:
+                raise
+        else:
+            log.info('Discarded export of %s', name)
+
+
+def exported(request, name):
+    """
+    Returns response of exported listing `name` to JSON API request,
+    None if it's not exported or other format is wanted.
+
+    It redirects to IRIS_EXPORT_URL if that's set, the web server must
+    send the file with "Content-Encoding: gzip" there, or clients get
+    raw gzip. Otherwise the file is streamed as it is to clients
+    accepting gzip, and unzipped to others.
+    """
+    directory = settings.IRIS_EXPORT_DIR
+    if not directory or request.accepted_renderer.format != 'json':
+        return None
+    path = os.path.join(directory, filename(name))
+    if not os.path.isfile(path):
+        return None
+
+    if settings.IRIS_EXPORT_URL:
+        return HttpResponseRedirect(
+            urljoin(settings.IRIS_EXPORT_URL, filename(name)))
+    if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        response = StreamingHttpResponse(
+            FileWrapper(open(path, 'rb'), CHUNK),
+            content_type=JSONRenderer.media_type)
+        response['Content-Encoding'] = 'gzip'
+        response['Content-Length'] = os.path.getsize(path)
+    else:
+        reader = gzip.open(path, 'rb')
+        response = StreamingHttpResponse(
+            iter(lambda: reader.read(CHUNK), ''),
+            content_type=JSONRenderer.media_type)
+    response['Vary'] = 'Accept-Encoding'
+    return response
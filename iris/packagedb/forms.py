@@ -21,26 +21,53 @@ from django import forms
 
 from iris.core.forms import BaseForm, GroupedModelChoiceField
 from iris.core.models import (Domain, SubDomain,
-        License, GitTree, Package, Product, Image)
+        License, GitTree, Package, Product, ProductGraph, Image)
+from iris.etl.digest import forget_edited
+from iris.packagedb import exports
 
 MULTI_SELECT_HELP_TEXT = "Click items from left into right to select"
 
 
-class DomainForm(BaseForm):
+def imported_products(obj):
+    """
+    Returns names of products whose snapshot imports load `obj`
+    """
+    if isinstance(obj, Image):
+        return [obj.product.name]
+    return list(ProductGraph.objects.related(obj).values_list(
+        'name', flat=True))
+
+
+class ShownForm(BaseForm):
+    """
+    Rebuilds graphs of products and discards exported listings showing
+    the saved object. Digests of imports loading it are forgotten, so
+    that the next import overwrites the edit.
+    """
+    def save(self, commit=True):
+        obj = super(ShownForm, self).save(commit)
+        if commit:
+            ProductGraph.objects.rebuild_related(obj)
+            exports.discard(obj)
+            forget_edited(obj, imported_products(obj))
+        return obj
+
+
+class DomainForm(ShownForm):
     name = forms.CharField(label='Name for the domain')
 
     class Meta:
         model = Domain
 
 
-class SubDomainForm(BaseForm):
+class SubDomainForm(ShownForm):
     name = forms.CharField(label='Name for the subdomain')
 
     class Meta:
         model = SubDomain
 
 
-class LicenseForm(BaseForm):
+class LicenseForm(ShownForm):
     shortname = forms.CharField(label='Short name for the license')
     fullname = forms.CharField(label='Full name for the license')
 
@@ -48,7 +75,7 @@ class LicenseForm(BaseForm):
         model = License
 
 
-class GitTreeForm(BaseForm):
+class GitTreeForm(ShownForm):
     gitpath = forms.CharField(label='Git path for the tree')
     subdomain = GroupedModelChoiceField(queryset=SubDomain.objects.all(),
                                         group_by_field='domain')
@@ -60,14 +87,14 @@ class GitTreeForm(BaseForm):
         model = GitTree
 
 
-class PackageForm(BaseForm):
+class PackageForm(ShownForm):
     name = forms.CharField(label='Name for the package')
 
     class Meta:
         model = Package
 
 
-class ProductForm(BaseForm):
+class ProductForm(ShownForm):
     name = forms.CharField(label='Full name for the product')
     gittrees = forms.ModelMultipleChoiceField(
         label='Select associated git trees',
@@ -80,8 +107,9 @@ class ProductForm(BaseForm):
 
     class Meta:
         model = Product
+        exclude = ('latest_snapshot', 'latest_daily', 'latest_weekly')
 
 
-class ImageForm(BaseForm):
+class ImageForm(ShownForm):
     class Meta:
         model = Image
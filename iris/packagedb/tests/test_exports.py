@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+"""
+This is the test module for static JSON exports of packagedb listings.
+"""
+
+#pylint: disable=no-member,missing-docstring,invalid-name
+
+import os
+import gzip
+import json
+import shutil
+import tempfile
+from StringIO import StringIO
+
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from iris.core.models import Domain, SubDomain, GitTree, Package, Product
+from iris.packagedb import exports
+from iris.packagedb.tests import test_views
+
+
+class ExportsTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        domain = Domain.objects.create(name='Multimedia')
+        tree = GitTree.objects.create(
+            gitpath='dapt/alsa', subdomain=SubDomain.objects.create(
+                name='Audio', domain=domain))
+        tree.packages.add(Package.objects.create(name='alsa-utils'))
+        Product.objects.create(
+            name='Tizen:IVI', description='IVI').gittrees.add(tree)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def get(self, name, **extra):
+        return self.client.get('/api/packagedb/%s/' % name, **extra)
+
+    def test_export_all(self):
+        expected = {}
+        for name in exports.LISTINGS:
+            expected[name] = json.loads(self.get(name).content)
+        exports.export_all(self.directory)
+        self.assertEqual(
+            sorted(exports.filename(name) for name in exports.LISTINGS),
+            sorted(os.listdir(self.directory)))
+        for name in exports.LISTINGS:
+            with gzip.open(os.path.join(
+                    self.directory, exports.filename(name))) as reader:
+                self.assertEqual(expected[name], json.load(reader))
+
+    def test_nothing_exported_without_directory(self):
+        with override_settings(IRIS_EXPORT_DIR=None):
+            exports.export_all()
+        self.assertEqual([], os.listdir(self.directory))
+
+    def test_stream_exported(self):
+        exports.export_all(self.directory)
+        # changes after export show up after the next export
+        Package.objects.create(name='pulseaudio')
+        with override_settings(IRIS_EXPORT_DIR=self.directory):
+            response = self.get('packages', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual('gzip', response['Content-Encoding'])
+            content = ''.join(response.streaming_content)
+            data = json.load(gzip.GzipFile(fileobj=StringIO(content)))
+            self.assertEqual(['alsa-utils'], [i['name'] for i in data])
+
+            response = self.get('packages')
+            self.assertFalse(response.has_header('Content-Encoding'))
+            self.assertEqual('application/json', response['Content-Type'])
+            self.assertEqual(data, json.loads(
+                ''.join(response.streaming_content)))
+
+            # browsable api is rendered as before
+            response = self.get('packages', HTTP_ACCEPT='text/html')
+            self.assertContains(response, 'pulseaudio')
+
+    @override_settings(IRIS_EXPORT_URL='/exports/')
+    def test_redirect_to_exported(self):
+        with override_settings(IRIS_EXPORT_DIR=self.directory):
+            self.assertEqual(200, self.get('gittrees').status_code)
+            exports.export_all()
+            response = self.get('gittrees')
+        self.assertEqual(302, response.status_code)
+        self.assertTrue(
+            response['Location'].endswith('/exports/gittrees.json.gz'))
+
+    def test_discarded_after_edit(self):
+        test_views.create_test_user()
+        test_views.login(self.client, username='admin', password='admin')
+        package = Package.objects.get(name='alsa-utils')
+        with override_settings(IRIS_EXPORT_DIR=self.directory):
+            exports.export_all()
+            self.client.post(
+                test_views.synthesize_url('packages/%d/update/' % package.id),
+                {'name': 'alsa-tools'})
+            self.assertEqual(
+                ['domains.json.gz', 'products.json.gz'],
+                sorted(os.listdir(self.directory)))
+            self.assertEqual(['alsa-tools'], [
+                i['name'] for i in json.loads(self.get('packages').content)])
+
+            exports.export_all()
+            product = Product.objects.get(name='Tizen:IVI')
+            self.client.delete(test_views.synthesize_url(
+                'products/%d/delete/' % product.id))
+            self.assertEqual([], json.loads(self.get('products').content))
@@ -11,7 +11,8 @@
 
 from django.test import TestCase
 from django.contrib.auth.models import User
-from iris.core.models import Domain, DomainRole
+from iris.core.models import (
+    Domain, SubDomain, GitTree, DomainRole, GitTreeRole, UserProfile)
 
 from iris.etl.scm import merge_users
 
@@ -35,3 +36,32 @@ class MergeUsersTest(TestCase):
         self.assertEqual(User.objects.filter(username=self.mail, email=self.mail).exists(), False)
         self.assertTrue(self.user_b in self.domainrole.user_set.all(), True)
         self.assertTrue(len(self.domainrole.user_set.all()) == 1, True)
+
+    def test_merge_many_roles(self):
+        subdomain = SubDomain.objects.create(
+            name='sub', domain=self.domainrole.domain)
+        roles = []
+        for i in range(20):
+            tree = GitTree.objects.create(gitpath='tree%d' % i,
+                                          subdomain=subdomain)
+            role = GitTreeRole.objects.create(
+                role='MAINTAINER', gittree=tree, name='MAINTAINER: %d' % i)
+            role.user_set.add(self.user_a)
+            roles.append(role)
+        # already joined by both
+        roles[0].user_set.add(self.user_b)
+        # queries don't grow with number of roles
+        with self.assertNumQueries(15):
+            merge_users(self.mail, self.user_b)
+
+        self.assertEqual(
+            sorted(r.pk for r in roles + [self.domainrole]),
+            sorted(self.user_b.groups.values_list('pk', flat=True)))
+        self.assertFalse(User.objects.filter(username=self.mail).exists())
+
+    def test_skip_merged_user(self):
+        merge_users(self.mail, self.user_b)
+        self.assertEqual(self.mail, UserProfile.objects.get(
+            user=self.user_b).merged_email)
+        with self.assertNumQueries(1):
+            merge_users(self.mail, self.user_b)
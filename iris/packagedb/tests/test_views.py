@@ -16,11 +16,17 @@ indeed work correctly with legal input and produce a HTTP response code 200.
 #pylint: disable=no-member
 #E:203,23: Class 'License' has no 'objects' member (no-member)
 
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 from iris.core.models import (
-    Domain, SubDomain, License, GitTree, Package, Product, Image)
+    Domain, SubDomain, License, GitTree, Package, Product, ProductGraph,
+    Image, Snapshot)
+from iris.etl import scm
 from iris.packagedb.plugin import APPINFO
 
 
@@ -226,6 +232,34 @@ class LicenseTest(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
 
+    def test_read_license_packages(self):
+        """
+        Packages of a license are read by the same queries however many
+        git trees have it.
+        """
+        domain = Domain.objects.create(name='Multimedia')
+        subdomain = SubDomain.objects.create(name='Audio', domain=domain)
+
+        def add_tree(gitpath):
+            tree = GitTree.objects.create(gitpath=gitpath, subdomain=subdomain)
+            tree.licenses.add(self.license)
+            tree.packages.add(Package.objects.get_or_create(name='alsa')[0])
+            tree.packages.add(Package.objects.create(name=gitpath))
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(
+                    synthesize_url('licenses/%d/' % self.license.id))
+            self.assertContains(response, '>alsa</a>', 1)
+            return len(queries)
+
+        add_tree('dapt/alsa')
+        expected = count_queries()
+        add_tree('dapt/alsa-utils')
+        add_tree('dapt/alsa-plugins')
+        self.assertEqual(expected, count_queries())
+        self.assertEqual(4, Package.objects.with_license(self.license).count())
+
     def test_delete_license(self):
         """
         Deletes a single License object with DELETE.
@@ -338,6 +372,35 @@ class PackageTest(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
 
+    def test_read_packages_by_subdomain(self):
+        """
+        Packages of all subdomains are read by the same queries however
+        many subdomains there are.
+        """
+        def count_queries():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(synthesize_url('packages/'))
+            self.assertContains(response, 'Multimedia / SubMultimedia')
+            self.assertNotContains(response, 'Multimedia / Empty')
+            return len(queries)
+
+        SubDomain.objects.create(name='Empty', domain=self.domain)
+        expected = count_queries()
+        for name in ('Audio', 'Video'):
+            tree = GitTree.objects.create(
+                gitpath=name, subdomain=SubDomain.objects.create(
+                    name=name, domain=self.domain))
+            tree.packages.add(self.package, Package.objects.create(name=name))
+        self.assertEqual(expected, count_queries())
+
+        counts = dict((sub.name, sub.package_count)
+                      for sub in SubDomain.objects.package_counts())
+        self.assertEqual(
+            {'SubMultimedia': 1, 'Empty': 0, 'Audio': 2, 'Video': 2}, counts)
+        self.assertEqual(['Audio', 'Pulseaudio'], sorted(
+            p.name for p in SubDomain.objects.get(name='Audio').get_packages()))
+
     def test_read_package(self):
         """
         Reads a single Package object with GET.
@@ -394,6 +457,30 @@ class ProductTest(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
 
+    def test_read_products_latest_in_one_query(self):
+        """
+        Latest snapshots of all products are read with the products.
+        """
+        def count_queries():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(synthesize_url('products/'))
+            self.assertContains(response, 'weekly')
+            return len(queries)
+
+        def add_product(name):
+            product = Product.objects.create(name=name, description=name)
+            snapshot = Snapshot.objects.create(
+                product=product, buildid='%s_1' % name,
+                started_time=timezone.now(),
+                daily_url='http://daily/', weekly_url='http://weekly/')
+            product.update_latest(snapshot)
+
+        add_product('Tizen IVI')
+        expected = count_queries()
+        add_product('Tizen Mobile')
+        add_product('Tizen TV')
+        self.assertEqual(expected, count_queries())
+
     def test_read_product(self):
         """
         Reads a single Product object with GET.
@@ -402,6 +489,109 @@ class ProductTest(TestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
 
+    def test_read_product_from_graph(self):
+        """
+        Git trees and packages of a product are read from its graph.
+        """
+        domain = Domain.objects.create(name='Multimedia')
+        subdomain = SubDomain.objects.create(name='Audio', domain=domain)
+        alsa = GitTree.objects.create(gitpath='dapt/alsa',
+                                      subdomain=subdomain)
+        alsa.packages.add(Package.objects.create(name='alsa-utils'),
+                          Package.objects.create(name='alsa-lib'))
+        self.product.gittrees.add(alsa, GitTree.objects.create(
+            gitpath='adaptation/face', subdomain=subdomain))
+
+        url = synthesize_url('products/%d/' % self.product.id)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertFalse([i for i in queries.captured_queries
+                          if 'core_product_gittrees' in i['sql']
+                          or 'core_gittree_packages' in i['sql']])
+        self.assertContains(response, 'alsa-lib</a>, <a')
+        self.assertEqual(['adaptation/face', 'dapt/alsa'], [
+            tree['gitpath'] for tree in response.context['gittrees']])
+
+        # changed trees show up after the graph is rebuilt
+        self.product.gittrees.remove(alsa)
+        self.assertContains(self.client.get(url), 'dapt/alsa')
+        ProductGraph.objects.rebuild(self.product)
+        self.assertNotContains(self.client.get(url), 'dapt/alsa')
+        self.assertEqual(2, ProductGraph.objects.get(
+            product=self.product).version)
+
+    def test_update_product_rebuilds_graph(self):
+        """
+        Saving a product with the form rebuilds its graph.
+        """
+        tree = GitTree.objects.create(
+            gitpath='dapt/alsa', subdomain=SubDomain.objects.create(
+                name='Audio', domain=Domain.objects.create(name='Multimedia')))
+        ProductGraph.objects.rebuild(self.product)
+        login(self.client, username='admin', password='admin')
+        self.client.post(
+            synthesize_url('products/%d/update/' % self.product.id),
+            {'name': self.product.name, 'description': 'IVI',
+             'gittrees': [tree.id]})
+        self.assertEqual(['dapt/alsa'], [
+            i['gitpath'] for i in
+            ProductGraph.objects.load(self.product)['gittrees']])
+
+    def test_changed_objects_rebuild_graph(self):
+        """
+        Objects shown in the graph are changed and deleted in packagedb.
+        """
+        subdomain = SubDomain.objects.create(
+            name='Audio', domain=Domain.objects.create(name='Multimedia'))
+        tree = GitTree.objects.create(gitpath='dapt/alsa', subdomain=subdomain)
+        package = Package.objects.create(name='alsa-lib')
+        tree.packages.add(package)
+        self.product.gittrees.add(tree)
+        ProductGraph.objects.rebuild(self.product)
+        login(self.client, username='admin', password='admin')
+
+        self.client.post(
+            synthesize_url('gittrees/%d/update/' % tree.id),
+            {'gitpath': 'adaptation/alsa', 'subdomain': subdomain.id,
+             'licenses': [License.objects.create(shortname='MIT').id],
+             'packages': [package.id]})
+        trees = ProductGraph.objects.load(self.product)['gittrees']
+        self.assertEqual(['adaptation/alsa'], [i['gitpath'] for i in trees])
+        self.assertEqual(['alsa-lib'], [i['name'] for i in trees[0]['packages']])
+
+        self.client.delete(synthesize_url('packages/%d/delete/' % package.id))
+        self.assertEqual([], ProductGraph.objects.load(
+            self.product)['gittrees'][0]['packages'])
+
+        self.client.delete(synthesize_url(
+            'domains/%d/delete/' % subdomain.domain.id))
+        self.assertEqual([], ProductGraph.objects.load(
+            self.product)['gittrees'])
+
+    def test_rebuild_created_meanwhile(self):
+        """
+        Graph created by another request after it was found missing is
+        replaced instead of failing.
+        """
+        graphs = ProductGraph.objects
+        graphs.create(product=self.product, data='{}',
+                      built_time=timezone.now())
+        # the first lookup of rebuild() misses the graph created meanwhile
+        missed = [graphs.none()]
+        graphs.filter = lambda **kwargs: (
+            missed.pop() if missed else
+            super(type(graphs), graphs).filter(**kwargs))
+        try:
+            ProductGraph.objects.load(self.product)
+        finally:
+            del graphs.filter
+        self.assertFalse(missed)
+        self.assertEqual(2, ProductGraph.objects.get(
+            product=self.product).version)
+        self.assertEqual([], ProductGraph.objects.load(
+            self.product)['gittrees'])
+
     def test_delete_product(self):
         """
         Deletes a single Product object with DELETE.
@@ -471,3 +661,60 @@ class ImageTest(TestCase):
         url = synthesize_url('images/%d/delete/' % self.image.id)
         response = self.client.delete(url)
         self.assertEqual(response.status_code, 200)
+
+
+class ImportedEditTest(TestCase):
+    """
+    Tests for edits of imported objects being overwritten by imports.
+    """
+
+    DATA = u'''
+D: System
+
+T: adaptation/face-engine
+D: System
+'''
+
+    def setUp(self):
+        create_test_user()
+        self.client = Client()
+        login(self.client, username='admin', password='admin')
+        scm.from_unicode(self.DATA, incremental=True)
+
+    def test_edit_reverted_by_next_import(self):
+        """
+        Next incremental import of unchanged data reverts an edit.
+        """
+        domain = Domain.objects.get(name='System')
+        self.client.post(synthesize_url('domains/%d/update/' % domain.id),
+                         {'name': 'Platform'})
+        self.assertEqual('Platform', Domain.objects.get(pk=domain.pk).name)
+
+        self.assertTrue(scm.from_unicode(self.DATA, incremental=True))
+        self.assertTrue(Domain.objects.filter(name='System').exists())
+        self.assertFalse(scm.from_unicode(self.DATA, incremental=True))
+
+    def test_delete_reverted_by_next_import(self):
+        """
+        Next incremental import of unchanged data restores a deletion.
+        """
+        tree = GitTree.objects.get(gitpath='adaptation/face-engine')
+        self.client.delete(synthesize_url('gittrees/%d/delete/' % tree.id))
+        self.assertFalse(GitTree.objects.exists())
+
+        self.assertTrue(scm.from_unicode(self.DATA, incremental=True))
+        self.assertTrue(GitTree.objects.filter(
+            gitpath='adaptation/face-engine').exists())
+
+    def test_admin_edit_reverted_by_next_import(self):
+        """
+        Edits in admin site are reverted as well.
+        """
+        User.objects.filter(username='admin').update(is_staff=True)
+        domain = Domain.objects.get(name='System')
+        response = self.client.post('/admin/core/domain/%d/' % domain.id,
+                                    {'name': 'Platform'})
+        self.assertEqual(302, response.status_code)
+
+        self.assertTrue(scm.from_unicode(self.DATA, incremental=True))
+        self.assertTrue(Domain.objects.filter(name='System').exists())
@@ -18,44 +18,67 @@ Views for deleting items are contained here.
 
 from iris.core.views.common import delete
 from django.contrib.auth.decorators import login_required, permission_required
+from django.shortcuts import get_object_or_404
 
 from iris.core.models import (Domain, SubDomain, License, GitTree, Package,
-        Product, Image)
+        Product, ProductGraph, Image)
+from iris.etl.digest import forget_edited
+from iris.packagedb import exports
+from iris.packagedb.forms import imported_products
+
+
+def delete_shown(request, pkid, model, redirect_url):
+    """
+    Delete like delete(), rebuild graphs of products and discard exported
+    listings that showed the object, and forget digests of imports which
+    loaded it
+    """
+    obj = get_object_or_404(model, id=pkid)
+    products = list(ProductGraph.objects.related(obj).values_list(
+        'pk', flat=True))
+    imported = imported_products(obj)
+    response = delete(request, pkid, model, redirect_url)
+    # a deleted product takes its graph along
+    for product in Product.objects.filter(pk__in=products):
+        ProductGraph.objects.rebuild(product)
+    exports.discard(obj)
+    forget_edited(obj, imported)
+    return response
 
 
 @login_required()
 @permission_required('core.delete_domain', raise_exception=True)
 def domain(request, pkid):
-    return delete(request, pkid, Domain, '/app/packagedb/domains')
+    return delete_shown(request, pkid, Domain, '/app/packagedb/domains')
 
 @login_required()
 @permission_required('core.delete_subdomain', raise_exception=True)
 def subdomain(request, pkid):
     domain = request.GET.get('domain')
-    return delete(request, pkid, SubDomain,
-                  '/app/packagedb/domains/%s/' % (domain,))
+    return delete_shown(request, pkid, SubDomain,
+                        '/app/packagedb/domains/%s/' % (domain,))
 
 @login_required()
 @permission_required('core.delete_license', raise_exception=True)
 def license(request, pkid):
-    return delete(request, pkid, License, '/app/packagedb/licenses')
+    return delete_shown(request, pkid, License, '/app/packagedb/licenses')
 
 @login_required()
 @permission_required('core.delete_gittree', raise_exception=True)
 def gittree(request, pkid):
-    return delete(request, pkid, GitTree, '/app/packagedb/gittrees')
+    return delete_shown(request, pkid, GitTree, '/app/packagedb/gittrees')
 
 @login_required()
 @permission_required('core.delete_package', raise_exception=True)
 def package(request, pkid):
-    return delete(request, pkid, Package, '/app/packagedb/packages')
+    return delete_shown(request, pkid, Package, '/app/packagedb/packages')
 
 @login_required()
 @permission_required('core.delete_product', raise_exception=True)
 def product(request, pkid):
-    return delete(request, pkid, Product, '/app/packagedb/products')
+    return delete_shown(request, pkid, Product, '/app/packagedb/products')
 
 @login_required()
 @permission_required('core.delete_image', raise_exception=True)
 def image(request, pkid):
-    return delete(request, pkid, Image, '/app/packagedb/images')
+    return delete_shown(request, pkid, Image, '/app/packagedb/images')
@@ -20,7 +20,7 @@ from django.shortcuts import render, get_object_or_404
 from django.conf import settings
 
 from iris.core.models import (Domain, SubDomain, License, GitTree, Package,
-        Product, Image)
+        Product, ProductGraph, Image)
 from iris.packagedb.injectors import (inject_domain, inject_subdomain,
         inject_gittree)
 
@@ -50,8 +50,8 @@ def subdomain(request, pkid=None):
 def license(request, pkid=None):
     if pkid:
         _license = get_object_or_404(License, id=pkid)
-        _packages = [p for g in _license.gittree_set.all()
-                      for p in g.packages.all()]
+        _packages = Package.objects.with_license(_license).prefetch_related(
+            'gittree_set__subdomain__domain')
         return render(request, 'packagedb/read/single/license.html',
                 {'license': _license,
                  'packages': _packages})
@@ -81,9 +81,18 @@ def package(request, pkid=None):
         return render(request, 'packagedb/read/single/package.html',
                 {'package': get_object_or_404(Package, id=pkid)})
     else:
-        subdomains = SubDomain.objects.select_related(
-                        'domain'
-                    ).prefetch_related('gittree_set__packages')
+        def subdomains():
+            """
+            Subdomains having packages with their packages. It's called by
+            the template, so nothing is queried when the table is cached.
+            """
+            result = list(SubDomain.objects.package_counts().filter(
+                package_count__gt=0).select_related('domain'))
+            packages = Package.objects.by_subdomain()
+            for _subdomain in result:
+                _subdomain.packages = packages[_subdomain.id]
+            return result
+
         return render(request, 'packagedb/read/multiple/packages.html', {
             'subdomains': subdomains,
             'cache_seconds': settings.CACHE_MIDDLEWARE_SECONDS,
@@ -93,12 +102,12 @@ def package(request, pkid=None):
 def product(request, pkid=None):
     if pkid:
         _product = get_object_or_404(Product, id=pkid)
-        trees = _product.gittrees.select_related(
-            'subdomain', 'subdomain__domain').all()
+        graph = ProductGraph.objects.load(_product)
         return render(request, 'packagedb/read/single/product.html',
-                {'product': _product, 'gittrees': trees})
+                {'product': _product, 'gittrees': graph['gittrees']})
     else:
-        products = Product.objects.all()
+        products = Product.objects.select_related(
+            'latest_snapshot', 'latest_daily', 'latest_weekly')
         return render(request, 'packagedb/read/multiple/products.html',
                       {'products': products})
 
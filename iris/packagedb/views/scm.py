@@ -26,42 +26,72 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 
+from iris.core import keycache
 from iris.etl import scm
-from iris.etl.check import check_scm
+from iris.etl.check import Linter, check_scm
+from iris.packagedb.exports import export_all
 
 log = logging.getLogger(__name__)
 
 
+def read_files(request):
+    """
+    Returns text of uploaded domains and gittrees files, Nones if either
+    of them is missing. Raises UnicodeDecodeError if it isn't UTF-8.
+    """
+    domains = request.FILES.get('domains')
+    gittrees = request.FILES.get('gittrees')
+    if not (domains and gittrees):
+        return None, None
+    return domains.read().decode('utf8'), gittrees.read().decode('utf8')
+
+
+def undecodable(err):
+    """
+    Response to data files which aren't UTF-8
+    """
+    detail = 'Data files must be encoded in UTF-8: %s' % err
+    log.error(detail)
+    return Response({'detail': detail, 'errors': []},
+                    status=status.HTTP_400_BAD_REQUEST)
+
+
 @api_view(['POST'])
 @permission_required('core.scm_update', raise_exception=True)
-@atomic
 def update(request):
     """
-    Importing scm data
+    Importing scm data, listings are exported after it's committed
     """
-    domains = request.FILES.get('domains')
-    gittrees = request.FILES.get('gittrees')
+    try:
+        domains_str, gittrees_str = read_files(request)
+    except UnicodeDecodeError as err:
+        return undecodable(err)
 
-    if domains and gittrees:
-        domains_str, gittrees_str = domains.read(), gittrees.read()
-        detail = check_scm(domains_str, gittrees_str)
-        if not detail:
+    errors = []
+    if domains_str is not None:
+        # data parsed by linter are imported without parsing again
+        linter = Linter()
+        errors = linter.check_scm(domains_str, gittrees_str)
+        if not errors:
             log.info('Importing scm data...')
-            scm_str = ''.join([domains_str, os.linesep, os.linesep,
-                               gittrees_str])
-            scm.from_string(scm_str)
-            cache.clear()
+            scm_str = u''.join([domains_str, os.linesep, os.linesep,
+                                gittrees_str])
+            with atomic():
+                scm.from_unicode(scm_str, rawdata=linter.blocks)
+                cache.clear()
+            keycache.invalidate()
+            export_all()
             detail = 'Successful!'
             code = status.HTTP_200_OK
         else:
             code = status.HTTP_406_NOT_ACCEPTABLE
-            detail = ','.join(detail)
-            log.error(detail)
+            detail = u','.join(unicode(err) for err in errors)
     else:
         detail = 'Can not find data files!'
         code = status.HTTP_406_NOT_ACCEPTABLE
         log.error(detail)
-    content = {'detail': detail}
+    content = {'detail': detail,
+               'errors': [err.as_dict() for err in errors]}
     return Response(content, status=code)
 
 
@@ -71,21 +101,25 @@ def check(request):
     """
     Checking scm data
     """
-    domains = request.FILES.get('domains')
-    gittrees = request.FILES.get('gittrees')
-    if domains and gittrees:
+    try:
+        domains_str, gittrees_str = read_files(request)
+    except UnicodeDecodeError as err:
+        return undecodable(err)
+
+    errors = []
+    if domains_str is not None:
         log.info('Checking scm data...')
-        detail = check_scm(domains.read(), gittrees.read())
-        if not detail:
+        errors = check_scm(domains_str, gittrees_str)
+        if not errors:
             detail = 'Successful!'
             code = status.HTTP_200_OK
         else:
             code = status.HTTP_406_NOT_ACCEPTABLE
-            detail = ','.join(detail)
-            log.error(detail)
+            detail = u','.join(unicode(err) for err in errors)
     else:
         detail = 'Can not find data files!'
         code = status.HTTP_406_NOT_ACCEPTABLE
         log.error(detail)
-    content = {'detail': detail}
+    content = {'detail': detail,
+               'errors': [err.as_dict() for err in errors]}
     return Response(content, status=code)
@@ -20,6 +20,7 @@ from django.conf.urls import patterns, url, include
 
 urlpatterns = patterns(
     'iris.submissions.views.events',
+    url(r'^events/$', 'events_batch_handler', name='submissions_events_batch'),
     url(r'events/(.*?)/', 'events_handler', name='submissions_events'),
     )
 
@@ -0,0 +1,153 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+"""
+Throughput benchmark of submissions events.
+
+Synthetic submissions go through the whole lifecycle:
+
+    submitted -> pre_created -> package_built x (packages*repos*arches)
+    -> (image_building -> image_created) x images -> repa_action
+
+by posting events to the events API with Django test client.
+"""
+import time
+from collections import defaultdict
+
+from django.db import connection
+from django.test.client import Client
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth.models import User, Permission
+
+from iris.core import retry
+from iris.core.models import Domain, SubDomain, GitTree, Product
+from iris.core.profiling import percentile
+
+USERNAME = 'bench'
+PASSWORD = 'bench'
+PRODUCT = 'Bench:Product'
+
+
+def create_data(lifecycles):
+    """
+    Create user, product and git trees needed by the benchmark
+    """
+    user = User.objects.create_user(USERNAME, 'bench@localhost', PASSWORD)
+    user.user_permissions.add(Permission.objects.get(
+        codename='publish_events', content_type__app_label='core'))
+    domain = Domain.objects.create(name='Bench')
+    subdomain = SubDomain.objects.create(name='Bench', domain=domain)
+    GitTree.objects.bulk_create([
+        GitTree(gitpath='bench/tree%d' % i, subdomain=subdomain)
+        for i in range(lifecycles)])
+    Product.objects.create(name=PRODUCT, description='Benchmark')
+
+
+def lifecycle(i, packages, repos, arches, images):
+    """
+    Events of the `i`th synthetic submission, list of (type, data)
+    """
+    gitpath = 'bench/tree%d' % i
+    tag = 'submit/trunk/bench-%d' % i
+    project = 'home:prerelease:bench:submit:trunk:%d' % i
+    events = [
+        ('submitted', {
+            'gitpath': gitpath,
+            'tag': tag,
+            'commit_id': '%040x' % i,
+            'submitter_email': 'bench@localhost',
+            }),
+        ('pre_created', {
+            'gitpath': gitpath,
+            'tag': tag,
+            'product': PRODUCT,
+            'project': project,
+            }),
+        ]
+    for pkg in range(packages):
+        for repo in range(repos):
+            for arch in range(arches):
+                events.append(('package_built', {
+                    'name': 'bench-package%d' % pkg,
+                    'repo': 'repo%d' % repo,
+                    'arch': 'arch%d' % arch,
+                    'project': project,
+                    'status': 'OBS_BUILD_SUCCESS',
+                    'repo_server': 'http://bench.server',
+                    }))
+    for img in range(images):
+        name = 'bench-image%d' % img
+        events.append(('image_building', {
+            'name': name,
+            'project': project,
+            'repo': 'repo0',
+            }))
+        events.append(('image_created', {
+            'name': name,
+            'project': project,
+            'status': 'success',
+            'url': 'http://bench.server/%s.raw' % name,
+            }))
+    events.append(('repa_action', {
+        'project': project,
+        'status': 'accepted',
+        'who': 'bench@localhost',
+        'reason': 'benchmark',
+        }))
+    return events
+
+
+def run(lifecycles=10, packages=5, repos=2, arches=2, images=2):
+    """
+    Post events of `lifecycles` submissions, returns report dict.
+
+    Data needed must have been created by create_data().
+    """
+    client = Client()
+    assert client.login(username=USERNAME, password=PASSWORD)
+
+    latencies = defaultdict(list)
+    queries = defaultdict(list)
+    failures = defaultdict(int)
+    retry.stats.reset()
+    started = time.time()
+    for i in range(lifecycles):
+        for typ, data in lifecycle(i, packages, repos, arches, images):
+            with CaptureQueriesContext(connection) as ctx:
+                begin = time.time()
+                response = client.post('/api/submissions/events/%s/' % typ,
+                                       data)
+                latencies[typ].append(time.time() - begin)
+            queries[typ].append(len(ctx.captured_queries))
+            if response.status_code >= 300:
+                failures[typ] += 1
+    elapsed = time.time() - started
+
+    def summary(typ_latencies, typ_queries):
+        return {
+            'count': len(typ_latencies),
+            'p50_ms': percentile(typ_latencies, 50) * 1000,
+            'p99_ms': percentile(typ_latencies, 99) * 1000,
+            'queries_per_event': float(sum(typ_queries)) / len(typ_queries),
+            }
+
+    all_latencies = sum(latencies.values(), [])
+    report = summary(all_latencies, sum(queries.values(), []))
+    report.update({
+        'lifecycles': lifecycles,
+        'width': {'packages': packages, 'repos': repos, 'arches': arches,
+                  'images': images},
+        'seconds': elapsed,
+        'events_per_second': len(all_latencies) / elapsed,
+        'lifecycles_per_second': lifecycles / elapsed,
+        'failures': dict(failures),
+        'lock_retries': retry.stats.as_dict()['retries'],
+        'events': dict((typ, summary(latencies[typ], queries[typ]))
+                       for typ in latencies),
+        })
+    return report
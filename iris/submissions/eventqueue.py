@@ -0,0 +1,115 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+"""
+Handling of queued submissions events.
+
+When IRIS_EVENTS_QUEUE is on, events views only save events into
+QueuedEvent and the process_events command handles them here.
+"""
+#pylint: disable=broad-except
+
+import json
+import time
+import logging
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+from iris.core.models import QueuedEvent
+from iris.core.retry import retry_atomic
+from iris.submissions.views.events import (
+    split_events, handle_events, journal_events, journal_failed)
+
+logger = logging.getLogger(__name__)
+
+
+def process_queue(limit, pool=None):
+    """
+    Handle at most `limit` pending events in the order they came,
+    returns the number of events handled.
+
+    Events of different pre-release projects are independent of each
+    other, so they are handled by threads of `pool` if it is given.
+    """
+    events = list(QueuedEvent.objects.filter(
+        status='PENDING').order_by('id')[:limit])
+    for stage in split_events([(i.typ, json.loads(i.data)) for i in events]):
+        tasks = [(bucket, dict((idx, events[idx].pk)
+                               for idx, _typ, _data in bucket))
+                 for bucket in stage]
+        if pool is not None and len(tasks) > 1:
+            pool.map(_handle_in_thread, tasks)
+        else:
+            for task in tasks:
+                _handle(task)
+    return len(events)
+
+
+def purge_queue(older_than, batch=500):
+    """
+    Delete DONE events handled more than `older_than` seconds ago, in
+    batches of `batch` rows so that the table isn't locked for long.
+    Failed events are kept for inspection. Returns the number deleted.
+    """
+    before = timezone.now() - timedelta(seconds=older_than)
+    purged = 0
+    while True:
+        pks = list(QueuedEvent.objects.filter(
+            status='DONE', handled__lt=before).values_list(
+                'pk', flat=True)[:batch])
+        if not pks:
+            return purged
+        QueuedEvent.objects.filter(pk__in=pks).delete()
+        purged += len(pks)
+
+
+@retry_atomic()
+def handle_bucket(bucket, pks):
+    """
+    Handle a bucket of events and mark them as handled, returns results
+    of handle_events(). `pks` maps index of event to pk of QueuedEvent.
+    """
+    now = timezone.now()
+    results = handle_events(bucket)
+    for idx, response, _elapsed in results:
+        QueuedEvent.objects.filter(pk=pks[idx]).update(
+            status='DONE' if response.status_code < 300 else 'FAILED',
+            detail=response.data['detail'],
+            handled=now)
+    return results
+
+
+def _handle(task):
+    """
+    Handle one bucket in a transaction, events are marked as FAILED
+    if anything goes wrong
+    """
+    bucket, pks = task
+    received = time.time()
+    try:
+        results = handle_bucket(bucket, pks)
+    except Exception as err:
+        logger.exception('Failed to handle events %s', sorted(pks.values()))
+        QueuedEvent.objects.filter(pk__in=pks.values()).update(
+            status='FAILED', detail=str(err), handled=timezone.now())
+        journal_failed(bucket, received)
+    else:
+        journal_events(bucket, results, received)
+
+
+def _handle_in_thread(task):
+    """
+    Handle one bucket in a thread of pool
+    """
+    try:
+        _handle(task)
+    finally:
+        # Each thread has its own database connection
+        connection.close()
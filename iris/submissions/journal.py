@@ -0,0 +1,97 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+"""
+Append-only journal of handled submissions events.
+
+Each event is written as one line of compact JSON:
+
+    [received_time, type, status_code, elapsed_seconds, data]
+
+Events whose handling raised are written with status code 500.
+
+Journal is written only if IRIS_EVENTS_JOURNAL is set to a file path.
+It can be fed back by the replay_events command.
+"""
+import os
+import ast
+import gzip
+import json
+import time
+import threading
+from datetime import datetime
+
+from django.conf import settings
+
+_lock = threading.Lock()
+
+
+def record(typ, data, status_code, received, elapsed):
+    """
+    Append an event to journal file
+    """
+    path = settings.IRIS_EVENTS_JOURNAL
+    if not path:
+        return
+    line = json.dumps(
+        [round(received, 3), typ, status_code, round(elapsed, 4),
+         dict(data.items())],
+        separators=(',', ':'))
+    with _lock:
+        # One write() per line in append mode, so that lines written by
+        # different processes don't interleave
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0644)
+        try:
+            os.write(fd, line + '\n')
+        finally:
+            os.close(fd)
+
+
+def read(path):
+    """
+    Read events from journal, yield (received, typ, status_code, elapsed,
+    data) tuples. Gzipped journal ends with .gz.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path) as reader:
+        for line in reader:
+            if line.strip():
+                yield tuple(json.loads(line))
+
+
+def read_events_log(path):
+    """
+    Read events from "events|path|params" lines written to Apache error
+    log by events views, yield tuples in the same form as read(). Events
+    of a batch line are yielded one by one, other lines and lines which
+    can't be parsed are skipped.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path) as reader:
+        for line in reader:
+            marker = line.find('events|')
+            if marker < 0:
+                continue
+            head = line[:marker]
+            _, url, param = (line[marker:].rstrip().split('|', 2) +
+                             [''])[:3]
+            try:
+                when = datetime.strptime(
+                    head[head.index('[') + 1:head.index(']')],
+                    '%a %b %d %H:%M:%S.%f %Y')
+                value = ast.literal_eval(param)
+            except (ValueError, SyntaxError):
+                continue
+            received = time.mktime(when.timetuple()) + when.microsecond / 1e6
+            typ = url.rstrip('/').split('/')[-1]
+            if typ == 'events':
+                for event in value:
+                    yield (received, event['type'], None, None,
+                           dict(event['data']))
+            else:
+                yield received, typ, None, None, dict(value)
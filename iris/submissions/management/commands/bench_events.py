@@ -0,0 +1,68 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+"""
+Benchmark throughput of submissions events.
+
+It runs against a test database created from the configured one
+(e.g. test_iris on MySQL) and destroys it afterwards, so production
+data is never touched.
+"""
+
+import json
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from iris.core.profiling import scratch_database
+from iris.submissions import benchmark
+
+
+class Command(BaseCommand):
+    """
+    Benchmark submissions events
+    """
+    help = 'Post synthetic submissions events and report their latency'
+    option_list = BaseCommand.option_list + (
+        make_option('--lifecycles', type='int', default=10,
+                    help='Number of submissions'),
+        make_option('--packages', type='int', default=5,
+                    help='Packages built in each pre-release project'),
+        make_option('--repos', type='int', default=2,
+                    help='Repositories of each pre-release project'),
+        make_option('--arches', type='int', default=2,
+                    help='Architectures of each repository'),
+        make_option('--images', type='int', default=2,
+                    help='Images created in each pre-release project'),
+        make_option('--json', action='store_true', default=False,
+                    help='Print report as JSON'),
+        )
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            benchmark.create_data(options['lifecycles'])
+            report = benchmark.run(
+                options['lifecycles'], options['packages'],
+                options['repos'], options['arches'], options['images'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+            return
+        self.stdout.write(
+            '%(lifecycles)d lifecycles in %(seconds).2fs: '
+            '%(lifecycles_per_second).2f lifecycles/s, '
+            '%(events_per_second).1f events/s, '
+            '%(lock_retries)d lock retries' % report)
+        self.stdout.write('%-16s %6s %9s %9s %9s' % (
+            'event', 'count', 'p50 ms', 'p99 ms', 'queries'))
+        for typ, item in sorted(report['events'].items()) + [('all', report)]:
+            self.stdout.write('%-16s %6d %9.2f %9.2f %9.1f' % (
+                typ, item['count'], item['p50_ms'], item['p99_ms'],
+                item['queries_per_event']))
+        if report['failures']:
+            self.stdout.write('Failures: %s' % report['failures'])
@@ -0,0 +1,73 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+"""
+Handle queued submissions events.
+
+Only one process_events should run at a time, otherwise events of
+the same pre-release project could be handled out of order.
+Use --workers to handle different projects concurrently instead.
+
+Handled events are kept in the queue unless --purge-older-than is given,
+then the ones handled successfully are deleted when the queue is empty,
+at most once every PURGE_INTERVAL seconds.
+"""
+
+import time
+from optparse import make_option
+from multiprocessing.pool import ThreadPool
+
+from django.core.management.base import BaseCommand
+
+from iris.submissions.eventqueue import process_queue, purge_queue
+
+PURGE_INTERVAL = 3600
+
+
+class Command(BaseCommand):
+    """
+    Handle queued submissions events
+    """
+    help = 'Handle events queued when IRIS_EVENTS_QUEUE is on'
+    option_list = BaseCommand.option_list + (
+        make_option('--workers', type='int', default=1,
+                    help='Number of threads handling events concurrently'),
+        make_option('--limit', type='int', default=500,
+                    help='Max number of events fetched at a time'),
+        make_option('--interval', type='float', default=1.0,
+                    help='Seconds to sleep when queue is empty'),
+        make_option('--once', action='store_true', default=False,
+                    help='Exit when queue is empty'),
+        make_option('--purge-older-than', type='float', metavar='DAYS',
+                    help='Delete events handled successfully more than '
+                    'DAYS ago'),
+        )
+
+    def handle(self, *args, **options):
+        pool = ThreadPool(options['workers']) \
+            if options['workers'] > 1 else None
+        purged = 0
+        try:
+            while True:
+                count = process_queue(options['limit'], pool)
+                if count:
+                    self.stdout.write('%d events handled' % count)
+                    continue
+                if options['purge_older_than'] is not None and \
+                        time.time() >= purged + PURGE_INTERVAL:
+                    purged = time.time()
+                    count = purge_queue(options['purge_older_than'] * 86400)
+                    if count:
+                        self.stdout.write('%d events purged' % count)
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
@@ -0,0 +1,85 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+"""
+Feed events in a journal back through submissions events handlers.
+"""
+#pylint: disable=broad-except
+
+import time
+from optparse import make_option
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from iris.submissions import journal
+from iris.submissions.views.events import HANDLERS
+
+
+class Command(BaseCommand):
+    """
+    Replay events in journal
+    """
+    args = '<journal>'
+    help = 'Feed events in journal back through submissions events handlers'
+    option_list = BaseCommand.option_list + (
+        make_option('--speed', type='float', default=0,
+                    help='Replay at N times of the original pace, '
+                    '0 means as fast as possible'),
+        make_option('--format', choices=('journal', 'log'),
+                    default='journal',
+                    help='"log" to read events lines of Apache error log'),
+        make_option('--limit', type='int', default=0,
+                    help='Replay at most N events'),
+        )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Journal file is required')
+        reader = journal.read_events_log if options['format'] == 'log' \
+            else journal.read
+        speed = options['speed']
+
+        statuses = Counter()
+        differs = 0
+        first = None
+        start = time.time()
+        for i, (received, typ, status, _elapsed, data) in \
+                enumerate(reader(args[0])):
+            if options['limit'] and i >= options['limit']:
+                break
+            if first is None:
+                first = received
+            if speed > 0:
+                delay = (received - first) / speed - (time.time() - start)
+                if delay > 0:
+                    time.sleep(delay)
+
+            handler = HANDLERS.get(typ)
+            if handler is None:
+                self.stderr.write('Unknown event type: %s' % typ)
+                statuses['unknown'] += 1
+                continue
+            try:
+                code = handler(data).status_code
+            except Exception as err:
+                self.stderr.write('Event %d %s failed: %s' % (i, typ, err))
+                code = 500
+            statuses[code] += 1
+            if status is not None and code != status:
+                differs += 1
+
+        total = sum(statuses.values())
+        elapsed = time.time() - start
+        self.stdout.write('%d events replayed in %.2fs, %.1f events/s' % (
+            total, elapsed, total / elapsed if elapsed else 0))
+        for code, count in sorted(statuses.items()):
+            self.stdout.write('  %s: %d' % (code, count))
+        if differs:
+            self.stdout.write('%d events got different status from journal'
+                              % differs)
@@ -0,0 +1,144 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+#pylint: disable=no-member,missing-docstring,invalid-name,line-too-long
+#C: 20, 4: Missing method docstring (missing-docstring)
+
+import json
+
+from django.test import TestCase
+
+from iris.core.models import Submission, PackageBuild
+from iris.submissions.views.events import split_events, HANDLERS
+
+
+class BatchEventsTest(TestCase):
+
+    fixtures = ['users', 'domains', 'subdomains', 'gittrees', 'products', 'submissions']
+    url = '/api/submissions/events/'
+
+    tag = 'submit/trunk/batch'
+    gitpath = 'framework/system/dlog'
+    project = 'home:prerelease:tizen:ivi:submit:trunk:batch'
+
+    def login(self, user='robot', pwd='robot'):
+        assert self.client.login(username=user, password=pwd)
+
+    def post(self, events):
+        return self.client.post(self.url, json.dumps(events),
+                                content_type='application/json')
+
+    def package_built(self, name, status):
+        return {'type': 'package_built', 'data': {
+            'name': name,
+            'repo': 'standard',
+            'arch': 'i586',
+            'project': self.project,
+            'status': status,
+            'repo_server': 'http://build.server',
+            }}
+
+    def lifecycle(self):
+        return [
+            {'type': 'submitted', 'data': {
+                'gitpath': self.gitpath,
+                'tag': self.tag,
+                'commit_id': 'sha1',
+                'submitter_email': 'someone@localhost',
+                }},
+            {'type': 'pre_created', 'data': {
+                'gitpath': self.gitpath,
+                'tag': self.tag,
+                'product': 'Tizen:IVI',
+                'project': self.project,
+                }},
+            self.package_built('dlog', 'OBS_BUILD_FAIL'),
+            self.package_built('dlog-api', 'OBS_BUILD_SUCCESS'),
+            self.package_built('dlog', 'OBS_BUILD_SUCCESS'),
+            ]
+
+    def test_login_required(self):
+        r = self.post(self.lifecycle())
+        self.assertEquals(403, r.status_code)
+
+    def test_list_required(self):
+        self.login()
+        r = self.post({'type': 'submitted', 'data': {}})
+        self.assertEquals(406, r.status_code)
+
+    def test_unknown_event_type(self):
+        self.login()
+        r = self.post([{'type': 'unknown', 'data': {}}])
+        self.assertEquals(406, r.status_code)
+
+    def test_lifecycle(self):
+        self.login()
+        r = self.post(self.lifecycle())
+        self.assertEquals(200, r.status_code)
+        self.assertEquals([201, 201, 200, 200, 200],
+                          [i['status'] for i in json.loads(r.content)])
+
+        self.assertEquals(
+            '10_PKGBUILDING',
+            Submission.objects.get(name=self.tag).status)
+        self.assertEquals(
+            2, PackageBuild.objects.filter(group__name=self.project).count())
+
+    def test_bad_event_in_batch(self):
+        self.login()
+        events = self.lifecycle()
+        events.insert(2, {'type': 'package_built', 'data': {
+            'name': 'dlog',
+            'project': 'doesnotexist',
+            }})
+        r = self.post(events)
+        self.assertEquals(200, r.status_code)
+        self.assertEquals([201, 201, 406, 200, 200, 200],
+                          [i['status'] for i in json.loads(r.content)])
+
+    def test_failed_bucket(self):
+        def fail(data, groups=None):
+            if data['name'] == 'broken':
+                raise RuntimeError('broken')
+            return original(data, groups)
+
+        self.login()
+        events = self.lifecycle()
+        other = self.package_built('broken', 'OBS_BUILD_SUCCESS')
+        other['data']['project'] = 'home:prerelease:other'
+        events.insert(2, other)
+        original = HANDLERS['package_built']
+        HANDLERS['package_built'] = fail
+        try:
+            r = self.post(events)
+        finally:
+            HANDLERS['package_built'] = original
+        self.assertEquals(207, r.status_code)
+        results = json.loads(r.content)
+        self.assertEquals([201, 201, 500, 200, 200, 200],
+                          [i['status'] for i in results])
+        self.assertEquals('broken', results[2]['detail'])
+        # events of other transactions are applied
+        self.assertEquals(
+            2, PackageBuild.objects.filter(group__name=self.project).count())
+
+
+class SplitEventsTest(TestCase):
+
+    def test_split(self):
+        events = [
+            ('submitted', {}),
+            ('pre_created', {'project': 'a'}),
+            ('pre_created', {'project': 'b'}),
+            ('package_built', {'project': 'a'}),
+            ('snapshot_start', {'project': 'Tizen:IVI'}),
+            ('repa_action', {'project': 'b'}),
+            ]
+        stages = [[[idx for idx, _typ, _data in bucket] for bucket in stage]
+                  for stage in split_events(events)]
+        self.assertEquals([[[0]], [[1, 3], [2]], [[4]], [[5]]], stages)
@@ -0,0 +1,38 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+#pylint: disable=no-member,missing-docstring,invalid-name
+#C: 20, 4: Missing method docstring (missing-docstring)
+
+from django.test import TestCase
+
+from iris.core.models import BuildGroup
+from iris.core.profiling import percentile
+from iris.submissions import benchmark
+
+
+class EventsBenchmarkTest(TestCase):
+
+    def test_run(self):
+        benchmark.create_data(2)
+        report = benchmark.run(lifecycles=2, packages=2, repos=1, arches=2,
+                               images=1)
+        self.assertEquals({}, report['failures'])
+        # submitted, pre_created, 4 package_built, 2 image, repa_action
+        self.assertEquals(2 * 9, report['count'])
+        self.assertEquals(4 * 2, report['events']['package_built']['count'])
+        self.assertEquals(
+            ['33_ACCEPTED'] * 2,
+            list(BuildGroup.objects.values_list('status', flat=True)))
+
+    def test_percentile(self):
+        values = range(1, 101)
+        self.assertEquals(50, percentile(values, 50))
+        self.assertEquals(99, percentile(values, 99))
+        self.assertEquals(100, percentile(values, 100))
+        self.assertEquals(None, percentile([], 50))
@@ -13,9 +13,16 @@
 #R: 23, 0: Too many public methods (25/20) (too-many-public-methods)
 #C: 12, 0: Line too long (108/100) (line-too-long)
 
+import json
+
 from django.test import TestCase
+from django.test.utils import override_settings
+from django.db.models.signals import post_save
 
-from iris.core.models import Product, Submission, Snapshot, BuildGroup
+from iris.core import keycache
+from iris.core.models import (
+    Product, Submission, Snapshot, BuildGroup, GitTree, Package,
+    PackageBuild, SubmissionBuild)
 
 
 class EventHandlerTest(TestCase):
@@ -254,6 +261,26 @@ class EventHandlerTest(TestCase):
         })
         self.assertEquals(200, r.status_code)
 
+    def test_repa_keeps_counters(self):
+        saved = []
+
+        def record(sender, instance, update_fields=None, **kwargs):
+            saved.append(update_fields)
+        post_save.connect(record, sender=BuildGroup)
+        try:
+            self.login()
+            self.client.post(self.url % 'repa_action', {
+                'project': 'home:prerelease:tizen:ivi:submit:trunk:02',
+                'status': 'accepted',
+                'who': 'someone@tizen.org',
+                'reason': 'Good!',
+            })
+        finally:
+            post_save.disconnect(record, sender=BuildGroup)
+        self.assertEquals(
+            [{'status', 'operator', 'operated_on', 'operate_reason',
+              'updated'}], [set(i) for i in saved])
+
     def test_repa_rejected(self):
         self.login()
         r = self.client.post(self.url % 'repa_action', {
@@ -290,6 +317,7 @@ class EventHandlerTest(TestCase):
         # there are two accepted submissions, but only one submission is
         # operated before this snapshot starts
         self.assertEqual(BuildGroup.objects.filter(snapshot=snap).count(), 1)
+        self.assertEqual(1, json.loads(r.content)['groups'])
 
         r = self.client.post(self.url % 'snapshot_finish', {
             'project': 'Tizen:IVI',
@@ -305,6 +333,20 @@ class EventHandlerTest(TestCase):
         # so here there is still only one submission for the snapshot
         self.assertEqual(BuildGroup.objects.filter(snapshot=snap).count(), 1)
 
+    def test_snapshot_finish_in_one_update(self):
+        self.login()
+        r = self.client.post(self.url % 'snapshot_finish', {
+            'project': 'Tizen:IVI',
+            'buildid': 'tizen-ivi_20141024.5',
+            'finished_time': '2014-10-24 11:30:02',
+            'url': 'http://url.to.snapshot'
+        })
+        self.assertEquals(200, r.status_code)
+        self.assertEqual(2, json.loads(r.content)['groups'])
+        snap = Snapshot.objects.get(product__name='Tizen:IVI',
+                                    buildid='tizen-ivi_20141024.5')
+        self.assertEqual(2, BuildGroup.objects.filter(snapshot=snap).count())
+
     def test_snapshot_release(self):
         self.login()
         r = self.client.post(self.url % 'snapshot_release', {
@@ -329,3 +371,141 @@ class EventHandlerTest(TestCase):
                              buildid='tizen-ivi_20141023.5',
                              daily_url='http://url.to.daily/',
                              weekly_url='http://url.to.weekly/')
+
+    def test_snapshot_start_points_latest(self):
+        self.login()
+        for buildid in ('tizen-ivi_20141107.5', 'tizen-ivi_20141106.1'):
+            r = self.client.post(self.url % 'snapshot_start', {
+                'project': 'Tizen:IVI',
+                'buildid': buildid,
+                'started_time': '2014-10-30 13:34:15'
+            })
+            self.assertEquals(200, r.status_code)
+        # an older build id doesn't replace the newer one
+        self.assertEquals(
+            'tizen-ivi_20141107.5',
+            Product.objects.get(name='Tizen:IVI').latest_snapshot.buildid)
+
+    def test_snapshot_release_points_latest(self):
+        self.login()
+        for buildid, url in (('tizen-ivi_20141024.5', 'http://url.to.daily/24/'),
+                             ('tizen-ivi_20141023.5', 'http://url.to.daily/23/')):
+            r = self.client.post(self.url % 'snapshot_release', {
+                'project': 'Tizen:IVI',
+                'buildid': buildid,
+                'release_type': 'daily',
+                'url': url,
+            })
+            self.assertEquals(200, r.status_code)
+        product = Product.objects.get(name='Tizen:IVI')
+        self.assertEquals('http://url.to.daily/24/', product.latest_daily.daily_url)
+        self.assertEquals(None, product.latest_weekly)
+        self.assertEquals('tizen-ivi_20141024.5',
+                          product.latest_snapshot.buildid)
+
+    def test_delete_latest_snapshot_falls_back(self):
+        self.test_snapshot_release_points_latest()
+        Snapshot.objects.get(buildid='tizen-ivi_20141024.5').delete()
+        product = Product.objects.get(name='Tizen:IVI')
+        self.assertEquals('http://url.to.daily/23/',
+                          product.latest_daily.daily_url)
+        self.assertEquals('tizen-ivi_20141023.5',
+                          product.latest_snapshot.buildid)
+
+
+@override_settings(IRIS_KEY_CACHE_SIZE=1024, IRIS_KEY_CACHE_TTL=300,
+                   IRIS_KEY_CACHE_CHECK=0)
+class KeyCacheEventsTest(TestCase):
+    """
+    Events handled with key caches on, objects they refer to are changed
+    between events
+    """
+
+    fixtures = ['users', 'domains', 'subdomains', 'gittrees', 'products', 'submissions']
+    url = '/api/submissions/events/%s/'
+
+    def setUp(self):
+        # cached pks don't survive rollback of other tests
+        keycache.invalidate()
+        assert self.client.login(username='robot', password='robot')
+
+    def tearDown(self):
+        keycache.invalidate()
+
+    def submitted(self, gitpath, tag):
+        return self.client.post(self.url % 'submitted', {
+            'gitpath': gitpath,
+            'tag': tag,
+            'commit_id': 'sha1',
+            'submitter_email': 'someone@localhost',
+            })
+
+    def pre_created(self, product):
+        return self.client.post(self.url % 'pre_created', {
+            'gitpath': 'framework/system/dlog',
+            'tag': 'submit/trunk/01',
+            'product': product,
+            'project': 'home:prerelease:tizen:ivi:submit:trunk:01',
+            })
+
+    def package_built(self):
+        return self.client.post(self.url % 'package_built', {
+            'name': 'dlog',
+            'repo': 'standard',
+            'arch': 'i586',
+            'project': 'home:prerelease:tizen:ivi:submit:trunk:02',
+            'status': 'OBS_BUILD_SUCCESS',
+            'repo_server': 'http://build.server',
+            })
+
+    def test_deleted_package(self):
+        self.package_built()
+        self.assertEquals(200, self.package_built().status_code)
+        self.assertTrue(keycache.PACKAGES.get_pk('dlog'))
+
+        Package.objects.filter(name='dlog').delete()
+        self.assertEquals(200, self.package_built().status_code)
+        package = Package.objects.get(name='dlog')
+        self.assertEquals([package.pk], [
+            i.package_id for i in PackageBuild.objects.filter(
+                group__name='home:prerelease:tizen:ivi:submit:trunk:02')])
+
+    def test_deleted_product(self):
+        keycache.PRODUCTS.get('Tizen:IVI')
+        with self.assertNumQueries(0):
+            keycache.PRODUCTS.get('Tizen:IVI')
+
+        Product.objects.filter(name='Tizen:IVI').delete()
+        self.assertEquals(201, self.pre_created('Tizen:IVI').status_code)
+        product = Product.objects.get(name='Tizen:IVI')
+        self.assertEquals([product.pk], [
+            i.product_id for i in SubmissionBuild.objects.filter(
+                group__name='home:prerelease:tizen:ivi:submit:trunk:01')])
+
+    def test_renamed_gittree(self):
+        self.assertEquals(201, self.submitted(
+            'framework/system/dlog', 'submit/trunk/cached1').status_code)
+        tree = GitTree.objects.get(gitpath='framework/system/dlog')
+        tree.gitpath = 'framework/system/dlog2'
+        tree.save()
+
+        self.assertEquals(406, self.submitted(
+            'framework/system/dlog', 'submit/trunk/cached2').status_code)
+        self.assertEquals(201, self.submitted(
+            'framework/system/dlog2', 'submit/trunk/cached3').status_code)
+
+    def test_invalidated_after_import(self):
+        self.assertEquals(201, self.submitted(
+            'framework/system/dlog', 'submit/trunk/cached1').status_code)
+        # renamed by an import in another process, no signal is sent here
+        GitTree.objects.filter(gitpath='framework/system/dlog').update(
+            gitpath='framework/system/dlog2')
+        # the stale path is still accepted
+        self.assertEquals(201, self.submitted(
+            'framework/system/dlog', 'submit/trunk/cached2').status_code)
+
+        keycache.invalidate()
+        self.assertEquals(406, self.submitted(
+            'framework/system/dlog', 'submit/trunk/cached3').status_code)
+        self.assertEquals(201, self.submitted(
+            'framework/system/dlog2', 'submit/trunk/cached4').status_code)
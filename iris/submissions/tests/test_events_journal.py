@@ -0,0 +1,130 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+#pylint: disable=no-member,missing-docstring,invalid-name
+#C: 20, 4: Missing method docstring (missing-docstring)
+
+import os
+import shutil
+import tempfile
+from StringIO import StringIO
+
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.core.management import call_command
+
+from iris.core.models import Submission
+from iris.submissions import journal
+from iris.submissions.views.events import HANDLERS
+
+
+class JournalTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'events.journal')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_disabled(self):
+        journal.record('submitted', {'tag': 'x'}, 201, 1.0, 0.1)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_record_and_read(self):
+        with override_settings(IRIS_EVENTS_JOURNAL=self.path):
+            journal.record('submitted', {'tag': 'x'}, 201, 1.0, 0.1)
+            journal.record('pre_created', {'tag': 'x'}, 406, 2.0, 0.2)
+        self.assertEquals([
+            (1.0, 'submitted', 201, 0.1, {'tag': 'x'}),
+            (2.0, 'pre_created', 406, 0.2, {'tag': 'x'}),
+            ], list(journal.read(self.path)))
+
+    def test_read_events_log(self):
+        path = os.path.join(os.path.dirname(__file__), 'events.log')
+        events = list(journal.read_events_log(path))
+        received, typ, status, _elapsed, data = events[0]
+        self.assertEquals('submitted', typ)
+        self.assertEquals(None, status)
+        self.assertEquals('platform/upstream/bluez', data['gitpath'])
+        self.assertTrue(received <= events[1][0])
+
+    def test_read_events_log_skips_other_lines(self):
+        path = os.path.join(self.tmpdir, 'error.log')
+        with open(path, 'w') as writer:
+            writer.write(
+                "[Tue Sep 30 03:30:01.000000 2014] [:error] [pid 1] "
+                "mod_wsgi: Target WSGI script not found\n"
+                "[Tue Sep 30 03:30:02.000000 2014] [:error] [pid 1] "
+                "events|/api/submissions/events/submitted/|"
+                "[(u'tag', u'a|b')]\n"
+                "[Tue Sep 30 03:30:03.000000 2014] [:error] [pid 1] "
+                "events|/api/submissions/events/submitted/|[(u'tag', \n"
+                "[Tue Sep 30 03:30:04.000000 2014] [:error] [pid 1] "
+                "events|/api/submissions/events/|"
+                "[{u'type': u'package_built', u'data': {u'name': u'x'}}, "
+                "{u'type': u'image_building', u'data': {u'name': u'y'}}]\n")
+        self.assertEquals([
+            ('submitted', {'tag': 'a|b'}),
+            ('package_built', {'name': 'x'}),
+            ('image_building', {'name': 'y'}),
+            ], [(typ, data) for _received, typ, _status, _elapsed, data
+                in journal.read_events_log(path)])
+
+
+class ReplayEventsTest(TestCase):
+
+    fixtures = ['users', 'domains', 'subdomains', 'gittrees', 'products']
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'events.journal')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_journal_and_replay(self):
+        assert self.client.login(username='robot', password='robot')
+        data = {
+            'gitpath': 'framework/system/dlog',
+            'tag': 'submit/trunk/replayed',
+            'commit_id': 'sha1',
+            'submitter_email': 'someone@localhost',
+            }
+        with override_settings(IRIS_EVENTS_JOURNAL=self.path):
+            r = self.client.post('/api/submissions/events/submitted/', data)
+        self.assertEquals(201, r.status_code)
+        [(_received, typ, status, _elapsed, logged)] = \
+            journal.read(self.path)
+        self.assertEquals(('submitted', 201, data),
+                          (typ, status, logged))
+
+        Submission.objects.filter(name=data['tag']).delete()
+        out = StringIO()
+        call_command('replay_events', self.path, stdout=out)
+        self.assertTrue(Submission.objects.filter(name=data['tag']).exists())
+        self.assertIn('1 events replayed', out.getvalue())
+
+    def test_journal_failed(self):
+        def fail(_data):
+            raise RuntimeError('failed')
+
+        assert self.client.login(username='robot', password='robot')
+        original = HANDLERS['submitted']
+        HANDLERS['submitted'] = fail
+        try:
+            with override_settings(IRIS_EVENTS_JOURNAL=self.path):
+                self.assertRaises(
+                    RuntimeError, self.client.post,
+                    '/api/submissions/events/submitted/', {'tag': 'x'})
+        finally:
+            HANDLERS['submitted'] = original
+        [(_received, typ, status, _elapsed, logged)] = \
+            journal.read(self.path)
+        self.assertEquals(('submitted', 500, {'tag': 'x'}),
+                          (typ, status, logged))
@@ -0,0 +1,118 @@
+# This file is part of IRIS: Infrastructure and Release Information System
+#
+# Copyright (C) 2013-2015 Intel Corporation
+#
+# IRIS is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# version 2.0 as published by the Free Software Foundation.
+
+#pylint: disable=no-member,missing-docstring,invalid-name
+#C: 20, 4: Missing method docstring (missing-docstring)
+
+import json
+from datetime import timedelta
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from iris.core.models import Submission, QueuedEvent
+from iris.submissions.eventqueue import process_queue, purge_queue
+
+
+@override_settings(IRIS_EVENTS_QUEUE=True)
+class EventsQueueTest(TestCase):
+
+    fixtures = ['users', 'domains', 'subdomains', 'gittrees', 'products', 'submissions']
+
+    tag = 'submit/trunk/queued'
+    gitpath = 'framework/system/dlog'
+    project = 'home:prerelease:tizen:ivi:submit:trunk:queued'
+
+    def setUp(self):
+        assert self.client.login(username='robot', password='robot')
+
+    def submit(self):
+        return self.client.post('/api/submissions/events/submitted/', {
+            'gitpath': self.gitpath,
+            'tag': self.tag,
+            'commit_id': 'sha1',
+            'submitter_email': 'someone@localhost',
+            })
+
+    def pre_create(self):
+        return self.client.post('/api/submissions/events/pre_created/', {
+            'gitpath': self.gitpath,
+            'tag': self.tag,
+            'product': 'Tizen:IVI',
+            'project': self.project,
+            })
+
+    def test_event_queued(self):
+        r = self.submit()
+        self.assertEquals(202, r.status_code)
+        self.assertFalse(Submission.objects.filter(name=self.tag).exists())
+        self.assertEquals(
+            ['PENDING'],
+            list(QueuedEvent.objects.values_list('status', flat=True)))
+
+    def test_invalid_event_not_queued(self):
+        r = self.client.post('/api/submissions/events/submitted/', {
+            'tag': self.tag,
+            })
+        self.assertEquals(406, r.status_code)
+        self.assertFalse(QueuedEvent.objects.exists())
+
+    def test_process_queue(self):
+        self.submit()
+        self.pre_create()
+        self.assertEquals(2, process_queue(10))
+
+        sub = Submission.objects.get(name=self.tag)
+        self.assertEquals('10_PKGBUILDING', sub.status)
+        self.assertEquals(
+            ['DONE', 'DONE'],
+            list(QueuedEvent.objects.order_by('id').values_list(
+                'status', flat=True)))
+        self.assertEquals(0, process_queue(10))
+
+    def test_failed_event(self):
+        self.client.post('/api/submissions/events/', json.dumps([
+            {'type': 'package_built', 'data': {
+                'name': 'dlog',
+                'repo': 'standard',
+                'arch': 'i586',
+                'project': 'doesnotexist',
+                'status': 'OBS_BUILD_SUCCESS',
+                'repo_server': 'http://build.server',
+                }}]), content_type='application/json')
+        process_queue(10)
+        event = QueuedEvent.objects.get()
+        self.assertEquals('FAILED', event.status)
+        self.assertTrue(event.handled)
+
+    def test_purge_queue(self):
+        old = timezone.now() - timedelta(days=10)
+        for status in ('DONE', 'DONE', 'DONE', 'FAILED'):
+            QueuedEvent.objects.create(typ='submitted', data='{}',
+                                       status=status, handled=old)
+        QueuedEvent.objects.create(typ='submitted', data='{}',
+                                   status='DONE', handled=timezone.now())
+        QueuedEvent.objects.create(typ='submitted', data='{}')
+
+        self.assertEquals(3, purge_queue(7 * 86400, batch=2))
+        self.assertEquals(
+            ['DONE', 'FAILED', 'PENDING'],
+            sorted(QueuedEvent.objects.values_list('status', flat=True)))
+
+    def test_command_purges(self):
+        QueuedEvent.objects.create(
+            typ='submitted', data='{}', status='DONE',
+            handled=timezone.now() - timedelta(days=10))
+        out = StringIO()
+        call_command('process_events', once=True, purge_older_than=7,
+                     stdout=out)
+        self.assertIn('1 events purged', out.getvalue())
+        self.assertFalse(QueuedEvent.objects.exists())
@@ -13,7 +13,7 @@
 
 from django.test import TestCase
 
-from iris.core.models import Submission
+from iris.core.models import Submission, BuildGroup
 
 
 class StatusTest(TestCase):
@@ -107,6 +107,12 @@ class StatusTest(TestCase):
             '15_PKGFAILED',
             self.submission(tag=self.tag, gitpath=self.gitpath).status)
 
+    def test_package_failed_touches_updated(self):
+        before = self.submission(tag=self.tag, gitpath=self.gitpath).updated
+        self.package_built('dlog', False)
+        self.assertTrue(
+            self.submission(tag=self.tag, gitpath=self.gitpath).updated > before)
+
     def test_package_two_succeed(self):
         self.package_built('dlog', True)
         self.package_built('dlog-api', True)
@@ -183,6 +189,29 @@ class StatusTest(TestCase):
             '25_IMGFAILED',
             self.submission(tag=self.tag, gitpath=self.gitpath).status)
 
+    def test_image_failed_and_then_rebuilt(self):
+        self.image_building('image1')
+        self.image_created('image1', False)
+        self.image_building('image1')
+        self.image_created('image1', True)
+
+        self.assertEquals(
+            '20_IMGBUILDING',
+            self.submission(tag=self.tag, gitpath=self.gitpath).status)
+
+    def test_build_counters(self):
+        self.package_built('dlog-api', False)
+        self.package_built('dlog', False)
+        self.package_built('dlog', True)
+        self.image_building('image1')
+        self.image_created('image1', True)
+
+        group = BuildGroup.objects.get(name=self.project)
+        self.assertEquals(
+            (1, 1, 1, 0),
+            (group.succeeded_packages, group.failed_packages,
+             group.succeeded_images, group.failed_images))
+
     def test_two_gittree_asubmitted(self):
         self.submitted(self.gitpath, 'tag2')
         self.assertEquals(
@@ -13,10 +13,11 @@ from django.forms import ValidationError
 from django.contrib.auth.models import User
 
 from iris.core.models import (
-    GitTree, Product, Package,
+    GitTree, Product,
     Submission, BuildGroup, ImageBuild, SubmissionBuild,
     Snapshot
     )
+from iris.core.keycache import PACKAGES, PRODUCTS, GITTREES, BUILD_GROUPS
 
 # pylint: disable=C0111,E1101,W0232,E1002,R0903
 # E1101: Instance of 'xx' has no 'cleaned_data' member
@@ -35,7 +36,7 @@ class SubmittedForm(forms.Form):
     def clean_gitpath(self):
         gitpath = self.cleaned_data['gitpath']
         try:
-            return GitTree.objects.get(gitpath=gitpath.strip('/'))
+            return GITTREES.get(gitpath.strip('/'))
         except GitTree.DoesNotExist as err:
             raise forms.ValidationError(err)
 
@@ -56,8 +57,7 @@ class PreCreatedForm(forms.Form):
 
     def clean_product(self):
         product = self.cleaned_data['product']
-        obj, created = Product.objects.get_or_create(name=product)
-        return obj
+        return PRODUCTS.get(product, create=True)
 
     def clean_project(self):
         project = self.cleaned_data['project']
@@ -88,6 +88,13 @@ class PreCreatedForm(forms.Form):
             return data
 
 
+class PreCreatedFailedForm(forms.Form):
+
+    tag = forms.CharField(label="Tag name")
+    gitpath = forms.CharField(label="Git tree path")
+    reason = forms.CharField(label="Why pre-release project creat fail")
+
+
 class PackageBuiltForm(forms.Form):
 
     name = forms.CharField(label="Package name")
@@ -102,13 +109,13 @@ class PackageBuiltForm(forms.Form):
 
     def clean_name(self):
         name = self.cleaned_data['name']
-        pack, _created = Package.objects.get_or_create(name=name)
-        return pack
+        return PACKAGES.get(name, create=True)
 
     def clean_project(self):
         project = self.cleaned_data['project']
+        # Status and counters are loaded by check_packages_status()
         try:
-            return BuildGroup.objects.get(name=project)
+            return BUILD_GROUPS.get(project)
         except BuildGroup.DoesNotExist as err:
             raise ValidationError(str(err))
 
@@ -206,7 +213,7 @@ class SnapshotStartForm(forms.Form):
     def clean_project(self):
         project = self.cleaned_data['project']
         try:
-            return Product.objects.get(name=project)
+            return PRODUCTS.get(project)
         except Product.DoesNotExist as err:
             raise forms.ValidationError(str(err))
 
@@ -220,7 +227,7 @@ class SnapshotFinishedForm(forms.Form):
     def clean_project(self):
         project = self.cleaned_data['project']
         try:
-            return Product.objects.get(name=project)
+            return PRODUCTS.get(project)
         except Product.DoesNotExist as err:
             raise forms.ValidationError(str(err))
 
@@ -248,7 +255,7 @@ class SnapshotReleaseForm(forms.Form):
     def clean_project(self):
         project = self.cleaned_data['project']
         try:
-            return Product.objects.get(name=project)
+            return PRODUCTS.get(project)
         except Product.DoesNotExist as err:
             raise forms.ValidationError(str(err))
 
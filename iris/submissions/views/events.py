@@ -9,28 +9,35 @@
 View functions to handler submission events
 """
 import sys
+import json
+import time
 import urllib
 import logging
+from collections import OrderedDict
 
-from MySQLdb.constants.ER import DUP_ENTRY, LOCK_DEADLOCK
+from MySQLdb.constants.ER import DUP_ENTRY
 
+from django.conf import settings
 from django.utils import timezone
-from django.db import IntegrityError, OperationalError, transaction
+from django.forms import ValidationError
+from django.db import IntegrityError
 from django.contrib.auth.decorators import permission_required
 
 from rest_framework.status import (
     HTTP_200_OK, HTTP_201_CREATED, HTTP_202_ACCEPTED,
-    HTTP_406_NOT_ACCEPTABLE,
+    HTTP_406_NOT_ACCEPTABLE, HTTP_500_INTERNAL_SERVER_ERROR,
     )
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 
+from iris.core.retry import retry_atomic
+from iris.submissions import journal
 from iris.core.models import (
     Submission, SubmissionBuild, ImageBuild, PackageBuild, Snapshot,
-    BuildGroup
+    BuildGroup, QueuedEvent
     )
 from iris.submissions.views.event_forms import (
-    SubmittedForm, PreCreatedForm, PackageBuiltForm,
+    SubmittedForm, PreCreatedForm, PreCreatedFailedForm, PackageBuiltForm,
     ImageBuildingForm, ImageCreatedForm, RepaActionForm,
     SnapshotStartForm, SnapshotFinishedForm, SnapshotReleaseForm)
 
@@ -43,44 +50,208 @@ logger = logging.getLogger(__name__)
 
 PUBLISH_EVENTS_PERM = 'core.publish_events'
 
+# Some events of a batch failed, missing in rest_framework.status
+HTTP_207_MULTI_STATUS = 207
+
+# Events which only touch a single pre-release project (BuildGroup),
+# identified by its `project` parameter
+GROUP_EVENTS = (
+    'pre_created', 'package_built', 'image_building', 'image_created',
+    'repa_action',
+    )
+
+
 @api_view(["POST"])
 @permission_required(PUBLISH_EVENTS_PERM, raise_exception=True)
 def events_handler(request, typ):
     """
     Common event handler for all submissions events
     """
-    handlers = {
-        'submitted': submitted,
-        'pre_created': pre_created,
-        'pre_created_failed': pre_created_failed,
-        'package_built': package_built,
-        'image_building': image_building,
-        'image_created': image_created,
-        'repa_action': repa_action,
-        'snapshot_start': snapshot_start,
-        'snapshot_finish': snapshot_finish,
-        'snapshot_release': snapshot_release,
-        }
     print >> sys.stderr, 'events|%s|%s' % (request.path, request.POST.items())
-    handler = handlers.get(typ)
+    handler = HANDLERS.get(typ)
     if not handler:
         return Response({'detail': 'Unknown event type'},
                         status=HTTP_406_NOT_ACCEPTABLE)
+    if settings.IRIS_EVENTS_QUEUE:
+        return enqueue([(typ, request.POST)])
+    received = time.time()
     try:
-        with transaction.atomic():
-            return handler(request)
-    except OperationalError as err:
-        if err.args[0] != LOCK_DEADLOCK:
-            raise
-        # refs: http://dev.mysql.com/doc/refman/5.5/en/innodb-deadlocks.html
-        # Always be prepared to re-issue a transaction if it fails due to
-        # deadlock. Deadlocks are not dangerous. Just try again.
-        logger.warn("Deadlock found, try again: %s" % str(err))
-        with transaction.atomic():
-            return handler(request)
+        response = handler(request.POST)
+    except Exception:
+        journal_failed([(0, typ, request.POST)], received)
+        raise
+    journal.record(typ, request.POST, response.status_code,
+                   received, time.time() - received)
+    return response
+
+
+@api_view(["POST"])
+@permission_required(PUBLISH_EVENTS_PERM, raise_exception=True)
+def events_batch_handler(request):
+    """
+    Handler for a batch of ordered submissions events
+
+    The request body is a JSON list of events, each of which is an object
+    with event type and its parameters, e.g.
+
+    [{"type": "package_built", "data": {"name": "dlog", ...}}, ...]
 
+    Events of the same pre-release project are applied in one transaction,
+    and status of the project is populated only once for them.
 
-def submitted(request):
+    Response is a list of {"status": ..., "detail": ...} of the events. If
+    handling a transaction raised, its events get status 500 and the
+    others are still applied, the response is 207 then.
+    """
+    events = request.DATA
+    if not isinstance(events, list):
+        return Response({'detail': 'A list of events is required'},
+                        status=HTTP_406_NOT_ACCEPTABLE)
+    for i, event in enumerate(events):
+        if (not isinstance(event, dict) or
+                event.get('type') not in HANDLERS or
+                not isinstance(event.get('data'), dict)):
+            return Response({'detail': 'Bad event at index %d' % i},
+                            status=HTTP_406_NOT_ACCEPTABLE)
+    logger.debug('events|%s|%s', request.path, events)
+    if settings.IRIS_EVENTS_QUEUE:
+        return enqueue([(i['type'], i['data']) for i in events])
+
+    results = [None] * len(events)
+    code = HTTP_200_OK
+    for stage in split_events([(i['type'], i['data']) for i in events]):
+        for bucket in stage:
+            received = time.time()
+            try:
+                handled = handle_events(bucket)
+            except Exception as err:
+                # transactions of earlier buckets are committed already
+                logger.exception('Failed to handle events %s',
+                                 [idx for idx, _typ, _data in bucket])
+                journal_failed(bucket, received)
+                for idx, _typ, _data in bucket:
+                    results[idx] = {'status': HTTP_500_INTERNAL_SERVER_ERROR,
+                                    'detail': str(err)}
+                code = HTTP_207_MULTI_STATUS
+                continue
+            for idx, response, _elapsed in handled:
+                results[idx] = {'status': response.status_code,
+                                'detail': response.data['detail']}
+            journal_events(bucket, handled, received)
+    return Response(results, status=code)
+
+
+def enqueue(events):
+    """
+    Put (type, data) events into queue to be handled by the
+    process_events command, if all of them are valid
+    """
+    for i, (typ, data) in enumerate(events):
+        errors = validate_event(typ, data)
+        if errors:
+            return Response({'detail': 'Event %d: %s' % (i, errors)},
+                            status=HTTP_406_NOT_ACCEPTABLE)
+    QueuedEvent.objects.bulk_create([
+        QueuedEvent(typ=typ,
+                    project=data.get('project', '') if typ in GROUP_EVENTS
+                    else '',
+                    data=json.dumps(dict(data.items())))
+        for typ, data in events])
+    return Response({'detail': '%d events queued' % len(events)},
+                    status=HTTP_202_ACCEPTED)
+
+
+def validate_event(typ, data):
+    """
+    Validate parameters of an event by fields of its form without calling
+    clean_xxx() methods of the form, which look up database.
+    Returns error message or an empty string if it is valid.
+    """
+    errors = []
+    for name, field in FORMS[typ].base_fields.items():
+        try:
+            field.clean(field.widget.value_from_datadict(data, {}, name))
+        except ValidationError as err:
+            errors.append('%s: %s' % (name, ' '.join(err.messages)))
+    return ', '.join(errors)
+
+
+def split_events(events):
+    """
+    Split ordered (type, data) events into stages.
+
+    Each stage is a list of buckets which hold (index, type, data) of
+    events. Events of one pre-release project go to the same bucket with
+    their order kept, so buckets of a stage are independent of each other.
+    Other events (submitted, snapshot_start ...) are barriers, each one
+    forms a stage by itself.
+    """
+    stage = OrderedDict()
+    for idx, (typ, data) in enumerate(events):
+        if typ in GROUP_EVENTS:
+            stage.setdefault(data.get('project'), []).append(
+                (idx, typ, data))
+            continue
+        if stage:
+            yield stage.values()
+            stage = OrderedDict()
+        yield [[(idx, typ, data)]]
+    if stage:
+        yield stage.values()
+
+
+@retry_atomic()
+def handle_events(bucket):
+    """
+    Handle a bucket of events, returns list of (index, response, elapsed)
+
+    Status of each touched build group is populated only once after all
+    events have been handled.
+    """
+    groups = OrderedDict()
+    results = []
+    for idx, typ, data in bucket:
+        started = time.time()
+        response = HANDLERS[typ](data, groups)
+        results.append((idx, response, time.time() - started))
+    for group in groups.values():
+        group.populate_status()
+    return results
+
+
+def journal_events(bucket, results, received):
+    """
+    Write events of a bucket handled by handle_events() into journal
+    """
+    events = dict((idx, (typ, data)) for idx, typ, data in bucket)
+    for idx, response, elapsed in results:
+        typ, data = events[idx]
+        journal.record(typ, data, response.status_code, received, elapsed)
+
+
+def journal_failed(bucket, received):
+    """
+    Write events of a bucket whose handling raised into journal
+    """
+    elapsed = time.time() - received
+    for _idx, typ, data in bucket:
+        journal.record(typ, data, HTTP_500_INTERNAL_SERVER_ERROR,
+                       received, elapsed)
+
+
+def populate(group, groups=None):
+    """
+    Populate status of `group` to its submissions at once, or defer it
+    by putting it into `groups` when handling a batch of events
+    """
+    if groups is None:
+        group.populate_status()
+    else:
+        groups[group.pk] = group
+
+
+@retry_atomic()
+def submitted(data, groups=None):
     """
     Event that occurs when a tag submitted
 
@@ -89,7 +260,7 @@ def submitted(request):
     commit_id -- Commit hash
     submitter_email -- Email of submitter
     """
-    form = SubmittedForm(request.POST)
+    form = SubmittedForm(data)
     if not form.is_valid():
         return Response({'detail': form.errors.as_text()},
                         status=HTTP_406_NOT_ACCEPTABLE)
@@ -112,7 +283,8 @@ def submitted(request):
     return Response({'detail': 'Tag submitted'}, status=HTTP_201_CREATED)
 
 
-def pre_created(request):
+@retry_atomic()
+def pre_created(data, groups=None):
     """
     Event that happens when a pre-release project had been created
 
@@ -121,7 +293,7 @@ def pre_created(request):
     product -- Target product name
     project -- Pre-release project name
     """
-    form = PreCreatedForm(request.POST)
+    form = PreCreatedForm(data)
     if not form.is_valid():
         return Response({'detail': form.errors.as_text()},
                         status=HTTP_406_NOT_ACCEPTABLE)
@@ -140,29 +312,36 @@ def pre_created(request):
             return Response({'detail': str(err)}, status=HTTP_202_ACCEPTED)
         raise
 
-    group.populate_status()
+    populate(group, groups)
     return Response({'detail': 'Pre-release project created'},
                     status=HTTP_201_CREATED)
 
 
-def pre_created_failed(request):
+@retry_atomic()
+def pre_created_failed(data, groups=None):
     """
     Event that happens when a pre-release project failed to create
     tag -- Tag name
     gitpath -- Git tree path
     reason -- Why pre-release project creat fail
     """
+    form = PreCreatedFailedForm(data)
+    if not form.is_valid():
+        return Response({'detail': form.errors.as_text()},
+                        status=HTTP_406_NOT_ACCEPTABLE)
+    data = form.cleaned_data
+
     try:
         sub = Submission.objects.get(
-            name=request.POST['tag'],
-            gittree__gitpath=request.POST['gitpath'].strip('/')
+            name=data['tag'],
+            gittree__gitpath=data['gitpath'].strip('/')
             )
     except Submission.DoesNotExist as err:
         return Response({'detail': 'wrong tag name or gitpath'},
                         status=HTTP_406_NOT_ACCEPTABLE)
     else:
         sub.status = 'ERROR'
-        sub.reason = request.POST['reason']
+        sub.reason = data['reason']
         sub.save()
         return Response(
             {'detail': 'submission status updated'},
@@ -195,7 +374,8 @@ def guess_build_log_url(server, project, package, repo, arch):
         repo)
 
 
-def package_built(request):
+@retry_atomic()
+def package_built(data, groups=None):
     """
     Event that happens when a package was built
 
@@ -206,7 +386,7 @@ def package_built(request):
     status -- Status
     repo_server -- Repository URL
     """
-    form = PackageBuiltForm(request.POST)
+    form = PackageBuiltForm(data)
     if not form.is_valid():
         return Response({'detail': form.errors.as_text()},
                         status=HTTP_406_NOT_ACCEPTABLE)
@@ -245,12 +425,13 @@ def package_built(request):
         pbuild.log = log
         pbuild.save()
 
-    group.populate_status()
+    populate(group, groups)
     msg = {'detail': '%s bulit %s' % (data['name'], data['status'])}
     return Response(msg, status=HTTP_200_OK)
 
 
-def image_building(request):
+@retry_atomic()
+def image_building(data, groups=None):
     """
     Event that happens when a image started to build
 
@@ -259,7 +440,7 @@ def image_building(request):
     repo -- Building repository
     #arch -- Building architecture
     """
-    form = ImageBuildingForm(request.POST)
+    form = ImageBuildingForm(data)
     if not form.is_valid():
         return Response({'detail': form.errors.as_text()},
                         status=HTTP_406_NOT_ACCEPTABLE)
@@ -273,20 +454,26 @@ def image_building(request):
             group=group,
             status='BUILDING'))
 
-    ImageBuild.objects.get_or_create(
+    ibuild, created = ImageBuild.objects.get_or_create(
         name=data['name'],
         group=data['project'],
         defaults={
             'status': 'BUILDING',
             'repo': data['repo'],
             })
+    # image is rebuilding, its old status has been taken out from
+    # the counters of group, so it has to be reset too
+    if not created and ibuild.status != 'BUILDING':
+        ibuild.status = 'BUILDING'
+        ibuild.save()
 
-    group.populate_status()
+    populate(group, groups)
     return Response({'detail': 'Image started to build'},
                     status=HTTP_200_OK)
 
 
-def image_created(request):
+@retry_atomic()
+def image_created(data, groups=None):
     """
     Event that happends when a image created
 
@@ -296,7 +483,7 @@ def image_created(request):
     url -- Image URL
     #log -- Build log
     """
-    form = ImageCreatedForm(request.POST)
+    form = ImageCreatedForm(data)
     if not form.is_valid():
         return Response({'detail': form.errors.as_text()},
                         status=HTTP_406_NOT_ACCEPTABLE)
@@ -310,12 +497,13 @@ def image_created(request):
 
     group.check_images_status(ibuild)
     ibuild.save()
-    group.populate_status()
+    populate(group, groups)
     return Response({'detail': 'Image created %s' % data['status']},
                     status=HTTP_200_OK)
 
 
-def repa_action(request):
+@retry_atomic()
+def repa_action(data, groups=None):
     """
     Event that happens when `repa` operates on some pre-release project
 
@@ -325,7 +513,7 @@ def repa_action(request):
     reason - Explanation
     when - When this happened
     """
-    form = RepaActionForm(request.POST)
+    form = RepaActionForm(data)
     if not form.is_valid():
         return Response({'detail': form.errors.as_text()},
                         status=HTTP_406_NOT_ACCEPTABLE)
@@ -337,41 +525,50 @@ def repa_action(request):
     # since enabled timezone support, here it should get aware datetime
     group.operated_on = timezone.now()
     group.operate_reason = data['reason'].strip()
-    group.save()
-    group.populate_status()
+    # counters may be changed by build events since the group was read,
+    # they must not be overwritten
+    group.save(update_fields=[
+        'status', 'operator', 'operated_on', 'operate_reason', 'updated'])
+    populate(group, groups)
 
     return Response({'detail': 'Action %s received' % data['status']},
                     status=HTTP_200_OK)
 
 
-def snapshot_start(request):
-    form = SnapshotStartForm(request.POST)
+@retry_atomic()
+def snapshot_start(data, groups=None):
+    form = SnapshotStartForm(data)
     if not form.is_valid():
         return Response({'detail': form.errors.as_text()},
                         status=HTTP_406_NOT_ACCEPTABLE)
     data = form.cleaned_data
-    Snapshot.objects.create(buildid=data['buildid'],
-                            started_time=data['started_time'],
-                            product=data['project'])
+    snapshot = Snapshot.objects.create(buildid=data['buildid'],
+                                       started_time=data['started_time'],
+                                       product=data['project'])
+    data['project'].update_latest(snapshot)
 
     return Response({'detail': 'Action snapshot start received'},
                     status=HTTP_200_OK)
 
 
-def snapshot_finish(request):
+@retry_atomic()
+def snapshot_finish(data, groups=None):
 
     def manage_submissions():
-        buildgroups = BuildGroup.objects.filter(
+        """
+        Assign groups accepted before the snapshot started to it by one
+        UPDATE, returns number of the groups
+        """
+        # a group joins products by its builds, so it may be selected
+        # more than once
+        return BuildGroup.objects.filter(
             status="33_ACCEPTED",
             operated_on__lt=snapshot.started_time,
             submissionbuild__product=snapshot.product,
-            snapshot=None)
-
-        for buildgroup in buildgroups:
-            buildgroup.snapshot = snapshot
-            buildgroup.save()
+            snapshot=None).distinct().update(
+                snapshot=snapshot, updated=timezone.now())
 
-    form = SnapshotFinishedForm(request.POST)
+    form = SnapshotFinishedForm(data)
     if not form.is_valid():
         return Response({'detail': form.errors.as_text()},
                         status=HTTP_406_NOT_ACCEPTABLE)
@@ -382,14 +579,17 @@ def snapshot_finish(request):
     snapshot.finished_time = data['finished_time']
     snapshot.url = data['url']
     snapshot.save()
-    manage_submissions()
+    data['project'].update_latest(snapshot)
+    count = manage_submissions()
 
-    return Response({'detail': 'Action snapshot finish received'},
+    return Response({'detail': 'Action snapshot finish received',
+                     'groups': count},
                     status=HTTP_200_OK)
 
 
-def snapshot_release(request):
-    form = SnapshotReleaseForm(request.POST)
+@retry_atomic()
+def snapshot_release(data, groups=None):
+    form = SnapshotReleaseForm(data)
     if not form.is_valid():
         return Response({'detail': form.errors.as_text()},
                         status=HTTP_406_NOT_ACCEPTABLE)
@@ -401,6 +601,34 @@ def snapshot_release(request):
     elif data['release_type'] == 'weekly':
         snapshot.weekly_url = data['url']
     snapshot.save()
+    data['project'].update_latest(snapshot)
 
     return Response({'detail': 'Action snapshot release received'},
                     status=HTTP_200_OK)
+
+
+HANDLERS = {
+    'submitted': submitted,
+    'pre_created': pre_created,
+    'pre_created_failed': pre_created_failed,
+    'package_built': package_built,
+    'image_building': image_building,
+    'image_created': image_created,
+    'repa_action': repa_action,
+    'snapshot_start': snapshot_start,
+    'snapshot_finish': snapshot_finish,
+    'snapshot_release': snapshot_release,
+    }
+
+FORMS = {
+    'submitted': SubmittedForm,
+    'pre_created': PreCreatedForm,
+    'pre_created_failed': PreCreatedFailedForm,
+    'package_built': PackageBuiltForm,
+    'image_building': ImageBuildingForm,
+    'image_created': ImageCreatedForm,
+    'repa_action': RepaActionForm,
+    'snapshot_start': SnapshotStartForm,
+    'snapshot_finish': SnapshotFinishedForm,
+    'snapshot_release': SnapshotReleaseForm,
+    }